@@ -1,12 +1,41 @@
 import os
 import json
 import csv
+import threading
+import time
 from datetime import datetime
 from PIL import Image
+import encoders
 from utils import get_gps_coordinates   # helper for GPS extraction
 
+# Registry name, "<kind>:<model id>" or CLIP checkpoint, see encoders.py
+DEFAULT_BACKBONE = os.getenv("MANGROVE_BACKBONE", "openai/clip-vit-base-patch32")
+
+# Cascade: a small backbone looks at a thumbnail first and answers when it is
+# sure; only the uncertain images go through the full model. Off when empty.
+CASCADE_BACKBONE = os.getenv("MANGROVE_CASCADE_BACKBONE", "")  # e.g. mobileclip-s1
+CASCADE_MIN_CONFIDENCE = float(os.getenv("MANGROVE_CASCADE_MIN_CONFIDENCE", "0.85"))
+CASCADE_MIN_MARGIN = float(os.getenv("MANGROVE_CASCADE_MIN_MARGIN", "0.5"))  # top-1 minus top-2 probability
+CASCADE_THUMBNAIL_SIZE = int(os.getenv("MANGROVE_CASCADE_THUMBNAIL_SIZE", "256"))
+
+
+def _thumbnail(image, size):
+    """Cheap box-filter reduction so the shorter side stays >= size"""
+    factor = min(image.size) // size
+    return image.reduce(factor) if factor > 1 else image
+
+
+def _open_thumbnail(image_path, size):
+    """Decode a photo at reduced size (JPEG DCT scaling via draft) as RGB"""
+    image = Image.open(image_path)
+    image.draft("RGB", (size, size))
+    return _thumbnail(image.convert("RGB"), size)
+
+
 class AIValidator:
-    def __init__(self, labels_file="labels.txt", model_name="openai/clip-vit-base-patch32", results_dir="results"):
+    def __init__(self, labels_file="labels.txt", model_name=DEFAULT_BACKBONE, results_dir="results",
+                 cascade_model=CASCADE_BACKBONE, min_confidence=CASCADE_MIN_CONFIDENCE,
+                 min_margin=CASCADE_MIN_MARGIN, thumbnail_size=CASCADE_THUMBNAIL_SIZE):
         # Load labels from labels.txt (fallback to defaults if missing)
         if os.path.exists(labels_file):
             with open(labels_file, "r") as f:
@@ -21,34 +50,170 @@ class AIValidator:
 
         # Model placeholders (will be loaded later)
         self.model_name = model_name
-        self.model = None
-        self.processor = None
+        self.encoder = None  # encoders.Encoder
+        self.text_features = None  # normalized label embeddings, computed once
+
+        # Optional first stage (see CASCADE_*)
+        self.cascade_model = cascade_model or None
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.thumbnail_size = thumbnail_size
+        self.cascade_encoder = None
+        self.cascade_text_features = None
+        self._cascade_stats = {"images": 0, "escalated": 0, "first_stage_seconds": 0.0, "full_seconds": 0.0}
+        self._stats_lock = threading.Lock()
 
     def load_model(self):
-        """Load the CLIP model and processor (deferred to runtime)"""
-        if self.model is None or self.processor is None:
-            from transformers import CLIPProcessor, CLIPModel
-            print(f"[INFO] Loading CLIP model: {self.model_name} ...")
-            self.model = CLIPModel.from_pretrained(self.model_name)
-            self.processor = CLIPProcessor.from_pretrained(self.model_name)
+        """Load the encoder backbone(s) (deferred to runtime)"""
+        if self.encoder is None:
+            print(f"[INFO] Loading image encoder: {self.model_name} ...")
+            self.encoder = encoders.load_encoder(self.model_name)
             print("[INFO] Model loaded successfully ✅")
+        if self.cascade_model and self.cascade_encoder is None:
+            print(f"[INFO] Loading cascade encoder: {self.cascade_model} ...")
+            self.cascade_encoder = encoders.load_encoder(self.cascade_model)
+
+    def warm_up(self):
+        """
+        Load the model and compute the label embeddings ahead of the first
+        request. Weights are frozen (no grad buffers, never written), so
+        processes forked afterwards share them copy-on-write.
+        """
+        self.load_model()
+        self._get_text_features()
+        if self.cascade_encoder is not None:
+            self._get_cascade_text_features()
+
+    def _get_text_features(self):
+        if self.text_features is None:
+            self.text_features = self.encoder.encode_text(self.labels)
+        return self.text_features
+
+    def _get_cascade_text_features(self):
+        if self.cascade_text_features is None:
+            self.cascade_text_features = self.cascade_encoder.encode_text(self.labels)
+        return self.cascade_text_features
+
+    def _classify(self, images):
+        """(confidences, label indices) tensors for a list of RGB images"""
+        text_features = self._get_text_features()
+        image_features = self.encoder.encode_images(images)
+        # Same logits as the model's forward pass, without re-encoding the labels every call
+        logits = self.encoder.logits(image_features, text_features)
+        return logits.softmax(dim=1).max(dim=1)
+
+    def _classify_cascade(self, count, load_thumbnail, load_full):
+        """
+        [(label index, confidence, stage)] for `count` images. The first stage
+        classifies load_thumbnail(i); an image escalates to the full model
+        (on load_full(i)) unless the first stage's top label clears both
+        min_confidence and min_margin.
+        """
+        start = time.perf_counter()
+        text_features = self._get_cascade_text_features()
+        image_features = self.cascade_encoder.encode_images([load_thumbnail(i) for i in range(count)])
+        probabilities = self.cascade_encoder.logits(image_features, text_features).softmax(dim=1)
+        top = probabilities.topk(min(2, len(self.labels)), dim=1)
+        first_stage_seconds = time.perf_counter() - start
+
+        results, escalate = [None] * count, []
+        for i, (values, indices) in enumerate(zip(top.values.tolist(), top.indices.tolist())):
+            margin = values[0] - (values[1] if len(values) > 1 else 0.0)
+            if values[0] >= self.min_confidence and margin >= self.min_margin:
+                results[i] = (indices[0], values[0], "first")
+            else:
+                escalate.append(i)
+
+        full_seconds = 0.0
+        if escalate:
+            start = time.perf_counter()
+            confidences, indices = self._classify([load_full(i) for i in escalate])
+            full_seconds = time.perf_counter() - start
+            for i, confidence, idx in zip(escalate, confidences.tolist(), indices.tolist()):
+                results[i] = (idx, confidence, "full")
+
+        with self._stats_lock:
+            stats = self._cascade_stats
+            stats["images"] += count
+            stats["escalated"] += len(escalate)
+            stats["first_stage_seconds"] += first_stage_seconds
+            stats["full_seconds"] += full_seconds
+        return results
+
+    def cascade_stats(self):
+        """
+        Escalation rate and time saved so far. The saving is an estimate:
+        images the first stage answered, at the measured full-model cost
+        per escalated image, minus the first-stage time spent on every image.
+        """
+        with self._stats_lock:
+            stats = dict(self._cascade_stats)
+        images, escalated = stats["images"], stats["escalated"]
+        full_per_image = stats["full_seconds"] / escalated if escalated else None
+        saved = None
+        if full_per_image is not None:
+            saved = (images - escalated) * full_per_image - stats["first_stage_seconds"]
+        return {
+            "enabled": self.cascade_model is not None,
+            "cascade_model": self.cascade_model,
+            "full_model": self.model_name,
+            "min_confidence": self.min_confidence,
+            "min_margin": self.min_margin,
+            "thumbnail_size": self.thumbnail_size,
+            "images": images,
+            "escalated": escalated,
+            "escalation_rate": round(escalated / images, 4) if images else None,
+            "first_stage_ms_per_image": round(stats["first_stage_seconds"] / images * 1000, 2) if images else None,
+            "full_ms_per_image": round(full_per_image * 1000, 2) if full_per_image is not None else None,
+            "estimated_saved_seconds": round(saved, 3) if saved is not None else None,
+        }
 
     def analyze_photo(self, image_path):
         """Run classification on a single photo"""
         self.load_model()  # ensure model is loaded
-        image = Image.open(image_path).convert("RGB")
-        inputs = self.processor(text=self.labels, images=image, return_tensors="pt", padding=True)
-        outputs = self.model(**inputs)
-
-        probs = outputs.logits_per_image.softmax(dim=1)
-        confidence, idx = probs.max(dim=1)
+        if self.cascade_encoder is not None:
+            ((idx, confidence, stage),) = self._classify_cascade(
+                1,
+                lambda _: _open_thumbnail(image_path, self.thumbnail_size),
+                lambda _: Image.open(image_path).convert("RGB"),
+            )
+        else:
+            image = Image.open(image_path).convert("RGB")
+            confidence, idx = self._classify([image])
+            stage = None
 
         coords = get_gps_coordinates(image_path)  # returns dict or None
-        return {
-            "label": self.labels[idx],
+        result = {
+            "label": self.labels[int(idx)],
             "confidence": float(confidence),
             "coordinates": coords
         }
+        if stage:
+            result["classifier_stage"] = stage
+        return result
+
+    def analyze_images(self, images):
+        """
+        Classify a batch of PIL images in a single forward pass (per cascade stage).
+        Returns [{"label", "confidence"}, ...] in input order (no coordinates).
+        """
+        if not images:
+            return []
+        self.load_model()  # ensure model is loaded
+
+        images = [image if image.mode == "RGB" else image.convert("RGB") for image in images]
+        if self.cascade_encoder is not None:
+            return [
+                {"label": self.labels[idx], "confidence": float(confidence), "classifier_stage": stage}
+                for idx, confidence, stage in self._classify_cascade(
+                    len(images), lambda i: _thumbnail(images[i], self.thumbnail_size), lambda i: images[i]
+                )
+            ]
+        confidences, indices = self._classify(images)
+        return [
+            {"label": self.labels[idx], "confidence": float(confidence)}
+            for confidence, idx in zip(confidences.tolist(), indices.tolist())
+        ]
 
     def analyze_folder(self, folder_path="Data"):
         """Run classification on all images in folder"""
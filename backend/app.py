@@ -1,72 +1,78 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, Response, stream_with_context
+import io
+import json
 import os
-import full_pipe  # example import, adjust as per your logic
-import ai_validator
-validator = ai_validator.AIValidator()
-import bot_handler
-import utils
-import satelite_check
+import threading
 from satelite_check import get_vegetation_change
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
-import time
 from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
+from datetime import datetime, timedelta, timezone
+import db
+import geocoding
+import profiling
+import watchlist
 
 app = Flask(__name__)
 
 # 2️⃣ Enable CORS after app is defined
-CORS(app, origins=["https://mangrove-watch.vercel.app","http://localhost:5173","http://127.0.0.1:5173"], supports_credentials=True)
+CORS_ORIGINS = ["https://mangrove-watch.vercel.app","http://localhost:5173","http://127.0.0.1:5173"]
+CORS(app, origins=CORS_ORIGINS, supports_credentials=True)
+
+# Opt-in per-request CPU/memory profiling (MANGROVE_PROFILING=1 + X-Profile header)
+profiling.init_profiling(app)
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
-pipeline = full_pipe.Pipeline()  # <-- Add this line
-
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "mangrove_watch.db")
-
-def update_user_reports(user_id):
-    """Update user total reports count"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute(
-            "UPDATE users SET total_reports = total_reports + 1 WHERE id = ?",
-            (user_id,)
-        )
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error updating reports: {e}")
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
-
-def get_user_stats(user_id):
-    """Get user stats"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+# Heavy subsystems (pipeline, CLIP, archive handling) are imported on first
+# use rather than at startup; see benchmarks/import_budget.py
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """The process-wide Pipeline, created on first use"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                import full_pipe
+                # Reuses a recent satellite result from a nearby report instead of re-running Earth Engine
+                _pipeline = full_pipe.Pipeline(satellite_lookup=db.find_recent_satellite_result)
+    return _pipeline
+
+
+def get_validator():
+    """The pipeline's AIValidator (one CLIP instance per process)"""
+    return get_pipeline().validator
+
+
+def apply_browser_coordinates(result, provided_lat, provided_lon):
+    """
+    If coordinates weren't extracted from EXIF but were provided by the
+    browser, use those as fallback. Updates `result` in place.
+    """
+    if result.get("coordinate_source") == "exif":
+        print(f"[INFO] Successfully extracted coordinates from EXIF data")
+        return
+    if not (provided_lat and provided_lon):
+        print(f"[WARNING] No coordinates found in image EXIF data and no browser coordinates provided")
+        return
     try:
-        cursor.execute(
-            "SELECT COUNT(*) FROM workflow_results WHERE user_id = ?",
-            (user_id,)
-        )
-        result = cursor.fetchone()
-        if result:
-            return {
-                "total_reports": result[0]
-            }
-        return None
-    except Exception as e:
-        print(f"Error getting user stats: {e}")
-        return None
-    finally:
-        conn.close()
+        lat = float(provided_lat)
+        lon = float(provided_lon)
+    except (ValueError, TypeError) as e:
+        print(f"[ERROR] Invalid coordinates provided: {e}")
+        return
+    result["latitude"] = lat
+    result["longitude"] = lon
+    result["coordinates"] = [lat, lon]
+    result["coordinate_source"] = "browser_geolocation"  # Override: Mark as browser-provided
+    print(f"[INFO] EXIF coordinates not found. Using browser-provided coordinates ({lat}, {lon}) for vegetation analysis")
+
 
 # Health check
 @app.route('/', methods=['GET'])
@@ -74,23 +80,97 @@ def home():
     return jsonify({"message": "Backend Flask API is running!"})
 
 # Get user stats
+# Served from the materialized user_stats table with ETag/Last-Modified, so a
+# polling frontend gets 304 Not Modified until the user's reports change.
 @app.route('/user/stats', methods=['GET'])
 def get_stats():
     try:
         user_id = request.args.get('user_id')
         if not user_id:
             return jsonify({"status": "error", "message": "user_id is required"}), 400
-        
-        stats_data = get_user_stats(int(user_id))
-        if stats_data:
-            return jsonify({"status": "success", "data": stats_data})
+        user_id = int(user_id)
+
+        version, updated_at = db.get_user_stats_version(user_id)
+        etag = f"stats-{user_id}-{version}"
+        last_modified = None
+        if updated_at:
+            last_modified = datetime.strptime(updated_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
         else:
-            return jsonify({"status": "error", "message": "User not found"}), 404
+            not_modified = (
+                last_modified is not None
+                and request.if_modified_since is not None
+                and last_modified <= request.if_modified_since
+            )
+
+        if not_modified:
+            response = make_response("", 304)
+        else:
+            stats_data = db.get_user_stats(user_id)
+            response = jsonify({"status": "success", "data": stats_data})
+
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+REPORTS_DEFAULT_LIMIT = 50
+REPORTS_MAX_LIMIT = 200
+
+
+def _parse_timestamp(value, end_of_day=False):
+    """Normalize 'YYYY-MM-DD[ HH:MM:SS]' / ISO 8601 input to the created_at text format"""
+    text = value.strip().replace("T", " ").rstrip("Z")
+    try:
+        if len(text) == 10:
+            parsed = datetime.strptime(text, "%Y-%m-%d")
+            if end_of_day:
+                parsed = parsed.replace(hour=23, minute=59, second=59)
+        else:
+            parsed = datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}. Use YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse_report_filters(args):
+    """Pagination and filter query parameters for /user/reports"""
+    filters = {"limit": REPORTS_DEFAULT_LIMIT}
+    if args.get("limit"):
+        try:
+            filters["limit"] = int(args["limit"])
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not 1 <= filters["limit"] <= REPORTS_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {REPORTS_MAX_LIMIT}")
+    if args.get("cursor"):
+        db.decode_cursor(args["cursor"])  # reject malformed cursors up front
+        filters["cursor"] = args["cursor"]
+    for name in ("label", "status", "alert_level", "trend_direction"):
+        if args.get(name):
+            filters[name] = args[name]
+    if args.get("since"):
+        filters["since"] = _parse_timestamp(args["since"])
+    if args.get("until"):
+        filters["until"] = _parse_timestamp(args["until"], end_of_day=True)
+    for name in ("min_confidence", "max_confidence"):
+        if args.get(name):
+            try:
+                filters[name] = float(args[name])
+            except ValueError:
+                raise ValueError(f"{name} must be a number")
+    return filters
+
+
 # Get user reports/workflow results
+# Supports keyset pagination (?cursor=<next_cursor>&limit=) and filters:
+# label, status, since, until, min_confidence, max_confidence, alert_level, trend_direction
 @app.route('/user/reports', methods=['GET'])
 def get_user_reports():
     try:
@@ -98,39 +178,222 @@ def get_user_reports():
         if not user_id:
             return jsonify({"status": "error", "message": "user_id is required"}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, confidence, latitude, longitude, label, satellite_vegetation_change, 
-                   status, created_at
-            FROM workflow_results 
-            WHERE user_id = ? 
-            ORDER BY created_at DESC 
-            LIMIT 50
-        """, (int(user_id),))
-        
-        reports = cursor.fetchall()
-        conn.close()
-        
-        reports_data = []
-        for row in reports:
-            reports_data.append({
-                "id": row[0],
-                "confidence": row[1],
-                "latitude": row[2],
-                "longitude": row[3],
-                "label": row[4],
-                "satellite_vegetation_change": row[5],
-                "status": row[6],
-                "created_at": row[7]
-            })
+        try:
+            filters = _parse_report_filters(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        reports_data, next_cursor = db.get_user_reports(int(user_id), **filters)
         
+        return jsonify({"status": "success", "data": reports_data, "next_cursor": next_cursor})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+SPATIAL_DEFAULT_LIMIT = 200
+SPATIAL_MAX_LIMIT = 1000
+NEARBY_DEFAULT_RADIUS_M = 500
+NEARBY_MAX_RADIUS_M = 50000
+MAP_MAX_ZOOM = 22
+
+
+def _parse_float(args, name, low, high):
+    value = args.get(name)
+    if value is None or value == "":
+        raise ValueError(f"{name} is required")
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+
+def _parse_spatial_filters(args):
+    """limit, label and since query parameters shared by the spatial endpoints"""
+    filters = {"limit": SPATIAL_DEFAULT_LIMIT}
+    if args.get("limit"):
+        try:
+            filters["limit"] = int(args["limit"])
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not 1 <= filters["limit"] <= SPATIAL_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {SPATIAL_MAX_LIMIT}")
+    if args.get("label"):
+        filters["label"] = args["label"]
+    if args.get("since"):
+        filters["since"] = _parse_timestamp(args["since"])
+    return filters
+
+
+# Reports inside a map view: ?min_lat=&min_lon=&max_lat=&max_lon= [&label=&since=&limit=]
+# Newest first, answered from the workflow_results R-tree index
+@app.route('/reports/bbox', methods=['GET'])
+def get_reports_in_bbox():
+    try:
+        try:
+            min_lat = _parse_float(request.args, "min_lat", -90, 90)
+            max_lat = _parse_float(request.args, "max_lat", -90, 90)
+            min_lon = _parse_float(request.args, "min_lon", -180, 180)
+            max_lon = _parse_float(request.args, "max_lon", -180, 180)
+            if min_lat > max_lat or min_lon > max_lon:
+                raise ValueError("min_lat/min_lon must not exceed max_lat/max_lon")
+            filters = _parse_spatial_filters(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        reports_data = db.get_reports_in_bbox(min_lat, min_lon, max_lat, max_lon, **filters)
+        return jsonify({"status": "success", "data": reports_data})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# Reports within a radius: ?lat=&lon= [&radius_m=500&label=&since=&limit=]
+# Nearest first, each with distance_m
+@app.route('/reports/nearby', methods=['GET'])
+def get_reports_nearby():
+    try:
+        try:
+            lat = _parse_float(request.args, "lat", -90, 90)
+            lon = _parse_float(request.args, "lon", -180, 180)
+            radius_m = NEARBY_DEFAULT_RADIUS_M
+            if request.args.get("radius_m"):
+                radius_m = _parse_float(request.args, "radius_m", 1, NEARBY_MAX_RADIUS_M)
+            filters = _parse_spatial_filters(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        reports_data = db.get_reports_nearby(lat, lon, radius_m, **filters)
+        return jsonify({"status": "success", "data": reports_data})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# Map clusters for a viewport: ?min_lat=&min_lon=&max_lat=&max_lon=&zoom= [&label=]
+# Precomputed per zoom level, so the response grows with the viewport, not the report count
+@app.route('/reports/clusters', methods=['GET'])
+def get_report_clusters():
+    try:
+        try:
+            min_lat = _parse_float(request.args, "min_lat", -90, 90)
+            max_lat = _parse_float(request.args, "max_lat", -90, 90)
+            min_lon = _parse_float(request.args, "min_lon", -180, 180)
+            max_lon = _parse_float(request.args, "max_lon", -180, 180)
+            if min_lat > max_lat or min_lon > max_lon:
+                raise ValueError("min_lat/min_lon must not exceed max_lat/max_lon")
+            zoom = _parse_float(request.args, "zoom", 0, MAP_MAX_ZOOM)
+            label = request.args.get("label") or None
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        clusters = db.get_report_clusters(min_lat, min_lon, max_lat, max_lon, int(zoom), label=label)
+        return jsonify({"status": "success", "data": clusters})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# Reports whose satellite check raised an alert, newest first:
+# ?level=critical[,warning] (default both) [&days=30 | &since=] [&trend=decreasing&limit=]
+# Answered from the (alert_level, created_at) index on the generated column
+@app.route('/reports/alerts', methods=['GET'])
+def get_report_alerts():
+    try:
+        try:
+            levels = [level.strip() for level in request.args.get("level", "warning,critical").split(",") if level.strip()]
+            unknown = [level for level in levels if level not in db.ALERT_LEVELS]
+            if not levels or unknown:
+                raise ValueError(f"level must be one or more of {', '.join(db.ALERT_LEVELS)}")
+            since = None
+            if request.args.get("since"):
+                since = _parse_timestamp(request.args["since"])
+            elif request.args.get("days"):
+                days = _parse_float(request.args, "days", 0, 3650)
+                since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+            trend = request.args.get("trend") or None
+            limit = _parse_spatial_filters(request.args)["limit"]
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        reports_data = db.get_satellite_alerts(levels, since=since, trend=trend, limit=limit)
         return jsonify({"status": "success", "data": reports_data})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+# Dashboard aggregates: [?min_lat=&min_lon=&max_lat=&max_lon=] [&since=&until=] (dates, default
+# the last 30 days) [&bucket=day|week&group_by=period|cell&label=]. Read from the per-cell
+# day/week rollup tables, so the cost does not grow with the number of reports.
+@app.route('/analytics/rollups', methods=['GET'])
+def get_analytics_rollups():
+    args = request.args
+    try:
+        try:
+            filters = {}
+            bbox_params = ("min_lat", "min_lon", "max_lat", "max_lon")
+            if any(args.get(name) for name in bbox_params):
+                filters.update(
+                    min_lat=_parse_float(args, "min_lat", -90, 90),
+                    min_lon=_parse_float(args, "min_lon", -180, 180),
+                    max_lat=_parse_float(args, "max_lat", -90, 90),
+                    max_lon=_parse_float(args, "max_lon", -180, 180),
+                )
+                if filters["min_lat"] > filters["max_lat"] or filters["min_lon"] > filters["max_lon"]:
+                    raise ValueError("min_lat/min_lon must not exceed max_lat/max_lon")
+            for name in ("since", "until"):
+                if args.get(name):
+                    filters[name] = _parse_timestamp(args[name])[:10]
+            for name in ("bucket", "group_by", "label"):
+                if args.get(name):
+                    filters[name] = args[name]
+            rollups = db.get_rollups(**filters)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify({"status": "success", "data": rollups})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# Research dump of reports: ?format=csv|geojson|parquet [&gzip=1&user_id=&label=&since=&until=
+# &min_lat=&min_lon=&max_lat=&max_lon=]. Streamed in chunks, so memory stays flat for any size.
+@app.route('/reports/export', methods=['GET'])
+def export_reports():
+    import export
+
+    args = request.args
+    fmt = args.get("format", "csv")
+    compress = args.get("gzip", "").lower() in ("1", "true", "yes")
+    filters = {}
+    try:
+        if args.get("user_id"):
+            try:
+                filters["user_id"] = int(args["user_id"])
+            except ValueError:
+                raise ValueError("user_id must be an integer")
+        if args.get("label"):
+            filters["label"] = args["label"]
+        if args.get("since"):
+            filters["since"] = _parse_timestamp(args["since"])
+        if args.get("until"):
+            filters["until"] = _parse_timestamp(args["until"], end_of_day=True)
+        bbox_params = ("min_lat", "min_lon", "max_lat", "max_lon")
+        if any(args.get(name) for name in bbox_params):
+            filters["bbox"] = (
+                _parse_float(args, "min_lat", -90, 90),
+                _parse_float(args, "min_lon", -180, 180),
+                _parse_float(args, "max_lat", -90, 90),
+                _parse_float(args, "max_lon", -180, 180),
+            )
+        chunks = export.export(fmt, filters, compress)
+    except ValueError as e:  # includes export.ExportError
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    content_type = "application/gzip" if compress else export.FORMATS[fmt][0]
+    response = Response(chunks, mimetype=content_type)
+    response.headers["Content-Disposition"] = f'attachment; filename="{export.filename(fmt, compress)}"'
+    return response
+
+
 # Example: Run full pipeline
 @app.route("/run-pipeline", methods=["POST"])
 def run_pipeline():
@@ -156,53 +419,15 @@ def run_pipeline():
                 provided_lat = request.form.get("latitude")
                 provided_lon = request.form.get("longitude")
                 
-                # Pass image_path to pipeline - this will try to extract EXIF coordinates first
-                result = pipeline.run_on_image(image_path)
-                
-                # If coordinates weren't extracted from EXIF but were provided by browser, use those as fallback
-                if (provided_lat and provided_lon and 
-                    (not result.get("coordinates") or result.get("coordinates") is None)):
-                    try:
-                        lat = float(provided_lat)
-                        lon = float(provided_lon)
-                        result["latitude"] = lat
-                        result["longitude"] = lon
-                        result["coordinates"] = [lat, lon]
-                        result["coordinate_source"] = "browser_geolocation"  # Override: Mark as browser-provided
-                        # Now run satellite check with provided coordinates
-                        veg_change = get_vegetation_change(lat, lon)
-                        result["satellite_vegetation_change"] = veg_change
-                        print(f"[INFO] EXIF coordinates not found. Using browser-provided coordinates ({lat}, {lon}) for vegetation analysis")
-                    except (ValueError, TypeError) as e:
-                        print(f"[ERROR] Invalid coordinates provided: {e}")
-                elif result.get("coordinate_source") == "exif":
-                    print(f"[INFO] Successfully extracted coordinates from EXIF data")
-                elif result.get("coordinate_source") == "none":
-                    print(f"[WARNING] No coordinates found in image EXIF data and no browser coordinates provided")
+                # Classify and read EXIF coordinates first, fall back to the browser's, then check the satellite
+                result = get_pipeline().classify_image(image_path)
+                apply_browser_coordinates(result, provided_lat, provided_lon)
+                get_pipeline().add_satellite_check(result)
                 
                 # Save result to database and update user stats if user_id is provided
                 if user_id:
-                    # Save result to database
-                    conn = sqlite3.connect(DB_PATH)
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO workflow_results 
-                        (user_id, confidence, latitude, longitude, label, satellite_vegetation_change, status)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        int(user_id),
-                        result.get('confidence'),
-                        result.get('latitude'),
-                        result.get('longitude'),
-                        result.get('label'),
-                        result.get('satellite_vegetation_change'),
-                        'completed'
-                    ))
-                    conn.commit()
-                    conn.close()
-                    
-                    # Update user reports count
-                    update_user_reports(int(user_id))
+                    # Result insert and report counter update run as one transaction
+                    db.save_result(int(user_id), result)
                 
                 return jsonify({"status": "success", "result": result})
 
@@ -217,47 +442,28 @@ def run_pipeline():
 
         if mode == "folder":
             folder = data.get("folder", "Data")
-            result = pipeline.run_on_folder(folder)
+            result = get_pipeline().run_on_folder(folder)
         
         elif mode == "image":
             image_path = data.get("image_path")
             if not image_path:
                 return jsonify({"status": "error", "message": "image_path is required"})
-            result = pipeline.run_on_image(image_path)
+            result = get_pipeline().run_on_image(image_path)
 
         elif mode == "coordinates":
             lat = data.get("lat")
             lon = data.get("lon")
             if lat is None or lon is None:
                 return jsonify({"status": "error", "message": "lat and lon are required"})
-            result = pipeline.run_on_coordinates(lat, lon)
+            result = get_pipeline().run_on_coordinates(lat, lon)
 
         else:
             return jsonify({"status": "error", "message": "Invalid mode. Use 'folder', 'image', or 'coordinates'"})
 
         # Save result to database and update user stats if user_id is provided
         if user_id:
-            # Save result to database
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO workflow_results 
-                (user_id, confidence, latitude, longitude, label, satellite_vegetation_change, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                int(user_id),
-                result.get('confidence'),
-                result.get('latitude'),
-                result.get('longitude'),
-                result.get('label'),
-                result.get('satellite_vegetation_change'),
-                'completed'
-            ))
-            conn.commit()
-            conn.close()
-            
-            # Update user reports count
-            update_user_reports(int(user_id))
+            # Result insert and report counter update run as one transaction
+            db.save_result(int(user_id), result)
 
         return jsonify({"status": "success", "result": result})
 
@@ -266,6 +472,54 @@ def run_pipeline():
 
 
 
+# Bulk upload: a zip or tar(.gz/.bz2/.xz) archive of photos, sent either as the
+# raw request body (?user_id=) or as the "archive" field of a multipart form.
+# Responds with newline-delimited JSON: one line per archive entry as it is
+# processed, then a {"event": "done"} summary.
+@app.route("/run-pipeline/bulk", methods=["POST"])
+def run_pipeline_bulk():
+    if request.content_type and request.content_type.startswith("multipart/form-data"):
+        archive = request.files.get("archive")
+        user_id = request.form.get("user_id")
+        if not archive:
+            return jsonify({"status": "error", "message": "archive is required"}), 400
+        # Uploaded files are closed when the view returns, but the archive is
+        # read while the response streams, so take over its spooled stream
+        stream, archive.stream = archive.stream, io.BytesIO()
+    else:
+        user_id = request.args.get("user_id")
+        stream = request.stream
+
+    try:
+        user_id = int(user_id) if user_id else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "user_id must be an integer"}), 400
+
+    import bulk_ingest
+
+    pipeline = get_pipeline()
+
+    def generate():
+        try:
+            for event in bulk_ingest.ingest(pipeline, bulk_ingest.iter_archive(stream), user_id):
+                yield json.dumps(event) + "\n"
+        finally:
+            stream.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# Classification counters for this process: cascade escalation rate and estimated time
+# saved, and how many photos reused a near-duplicate's result (dedup.skip_rate)
+@app.route('/validator/stats', methods=['GET'])
+def validator_stats():
+    try:
+        stats = dict(get_validator().cascade_stats(), dedup=get_pipeline().dedup_stats())
+        return jsonify({"status": "success", "data": stats})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 # Example: Validate AI predictions
 @app.route('/validate', methods=['POST'])
 def validate():
@@ -279,11 +533,11 @@ def validate():
             image_path = data.get("image_path")
             if not image_path:
                 return jsonify({"status": "error", "message": "image_path is required"})
-            result = validator.analyze_photo(image_path)
+            result = get_validator().analyze_photo(image_path)
 
         elif mode == "folder":
             folder_path = data.get("folder_path", "Data")
-            result = validator.analyze_folder(folder_path)
+            result = get_validator().analyze_folder(folder_path)
 
         else:
             return jsonify({"status": "error", "message": "Invalid mode. Use 'image' or 'folder'"})
@@ -317,6 +571,95 @@ def satellite_check():
         return jsonify({"status": "error", "message": str(e)})
 
 
+# --------------------------
+# Watchlist
+# --------------------------
+# Sites re-checked by the scheduler (python watchlist.py run); a site is
+# re-evaluated only when new Sentinel-2 scenes arrived over it
+@app.route("/watchlist", methods=["GET"])
+def get_watchlist():
+    try:
+        return jsonify({"status": "success", "data": watchlist.list_sites()})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# {"name": ..., "lat": ..., "lon": ..., "radius_m": ...} or {"name": ..., "polygon": [[lon, lat], ...]}
+# [+ "interval_hours"]
+@app.route("/watchlist", methods=["POST"])
+def add_watch_site():
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            lat = lon = None
+            if data.get("polygon") is None:
+                lat = _parse_float(data, "lat", -90, 90)
+                lon = _parse_float(data, "lon", -180, 180)
+            site_id = watchlist.add_site(
+                data.get("name"), lat, lon,
+                radius_m=data.get("radius_m"),
+                polygon=data.get("polygon"),
+                interval_hours=data.get("interval_hours", watchlist.DEFAULT_INTERVAL_HOURS),
+            )
+        except (ValueError, TypeError) as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify({"status": "success", "data": watchlist.get_site(site_id)}), 201
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/watchlist/<int:site_id>", methods=["DELETE"])
+def remove_watch_site(site_id):
+    try:
+        if not watchlist.remove_site(site_id):
+            return jsonify({"status": "error", "message": "Site not found"}), 404
+        return jsonify({"status": "success"})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/watchlist/<int:site_id>/history", methods=["GET"])
+def get_watch_site_history(site_id):
+    try:
+        site = watchlist.get_site(site_id)
+        if site is None:
+            return jsonify({"status": "error", "message": "Site not found"}), 404
+        return jsonify({"status": "success", "site": site, "data": watchlist.get_history(site_id)})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# Queue a check at the scheduler's next pass
+@app.route("/watchlist/<int:site_id>/check", methods=["POST"])
+def check_watch_site(site_id):
+    try:
+        if not watchlist.schedule_now(site_id):
+            return jsonify({"status": "error", "message": "Site not found"}), 404
+        return jsonify({"status": "success", "message": "Check scheduled"}), 202
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# Alert-level transitions, newest first: [?open=1]
+@app.route("/watchlist/alerts", methods=["GET"])
+def get_watch_alerts():
+    try:
+        unacknowledged = request.args.get("open") in ("1", "true")
+        return jsonify({"status": "success", "data": watchlist.get_alerts(unacknowledged)})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/watchlist/alerts/<int:alert_id>/acknowledge", methods=["POST"])
+def acknowledge_watch_alert(alert_id):
+    try:
+        if not watchlist.acknowledge_alert(alert_id):
+            return jsonify({"status": "error", "message": "Alert not found"}), 404
+        return jsonify({"status": "success"})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @app.route("/check_location", methods=["POST"])
 def check_location():
     data = request.json
@@ -335,30 +678,15 @@ def check_location():
         except ValueError:
             return jsonify({"error": "Invalid coordinates format. Use: lat, lon"}), 400
 
-    # Case 2: Place name provided
+    # Case 2: Place name provided (cache -> local gazetteer -> Nominatim)
     else:
-        geolocator = Nominatim(user_agent="frontend_api")
-
-        def geocode_with_retry(location_name, retries=3, delay=1):
-            """Retry geocoding in case of timeout or service unavailable"""
-            for attempt in range(retries):
-                try:
-                    loc = geolocator.geocode(location_name, timeout=10)
-                    if loc:
-                        return loc.latitude, loc.longitude
-                    else:
-                        return None, None
-                except (GeocoderTimedOut, GeocoderUnavailable):
-                    time.sleep(delay)  # wait before retry
-            return None, None
-
-        lat, lon = geocode_with_retry(text)
+        lat, lon = geocoding.geocode(text)
         if lat is None or lon is None:
             return jsonify({"error": "Location not found or geocoding service unavailable"}), 503
 
     # Run your pipeline
     try:
-        result = pipeline.run_on_coordinates(lat, lon)
+        result = get_pipeline().run_on_coordinates(lat, lon)
         veg_change = result.get("satellite_vegetation_change", "N/A")
     except Exception as e:
         return jsonify({"error": f"Pipeline error: {str(e)}"}), 500
@@ -383,15 +711,7 @@ def signup():
     password_hash = generate_password_hash(password)
 
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
-            (username, email, password_hash)
-        )
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        user_id = db.create_user(username, email, password_hash)
         return jsonify({
             "status": "success", 
             "message": "User registered successfully",
@@ -400,7 +720,6 @@ def signup():
             "email": email
         })
     except sqlite3.IntegrityError as e:
-        conn.close()
         if "username" in str(e):
             return jsonify({"status": "error", "message": "Username already exists"}), 409
         if "email" in str(e):
@@ -416,11 +735,7 @@ def login():
     if not username or not password:
         return jsonify({"status": "error", "message": "Username and password required"}), 400
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username, email, password_hash FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
-    conn.close()
+    user = db.get_user_by_username(username)
 
     if user and check_password_hash(user[3], password):
         return jsonify({
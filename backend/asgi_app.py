@@ -0,0 +1,389 @@
+"""
+ASGI serving mode for the backend API.
+
+Serves the same routes and JSON contracts as app.py, but the slow endpoints
+are native async handlers so a request waiting on Earth Engine or Nominatim
+doesn't occupy a worker:
+  - I/O-bound calls (Earth Engine, geocoding, SQLite, upload writes) are
+    offloaded to threads under a shared capacity limiter
+  - CPU-bound CLIP work runs on a small dedicated executor so it can't
+    starve the I/O threads or oversubscribe the cores
+
+Every other route (auth, profile pages, admin endpoints) is served by the
+Flask app itself, mounted underneath. /run-pipeline/bulk is native too: the
+WSGI bridge reads a whole request body into memory before Flask sees it, so
+a mounted bulk upload would no longer stream.
+
+Run with:
+    uvicorn asgi_app:app --host 127.0.0.1 --port 5000 --workers 2
+or:
+    python start_backend.py --asgi
+"""
+
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import queue
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import anyio
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse as StarletteJSONResponse
+from fastapi.responses import StreamingResponse
+from werkzeug.utils import secure_filename
+
+import app as flask_app
+import db
+import geocoding
+
+CLIP_WORKERS = int(os.getenv("MANGROVE_CLIP_WORKERS", "1"))
+IO_CONCURRENCY = int(os.getenv("MANGROVE_IO_CONCURRENCY", "256"))
+
+clip_executor = ThreadPoolExecutor(max_workers=CLIP_WORKERS, thread_name_prefix="clip")
+_io_limiter = None
+
+
+class JSONResponse(StarletteJSONResponse):
+    """
+    Rendered by Flask's JSON provider like jsonify (sorted keys, compact,
+    NaN passed through) instead of Starlette's encoder, which raises on NaN
+    """
+
+    def render(self, content):
+        return flask_app.app.json.dumps(content, separators=(",", ":")).encode("utf-8")
+
+
+def _get_io_limiter():
+    # CapacityLimiter must be created inside the running event loop
+    global _io_limiter
+    if _io_limiter is None:
+        _io_limiter = anyio.CapacityLimiter(IO_CONCURRENCY)
+    return _io_limiter
+
+
+async def run_io(fn, *args, **kwargs):
+    """Run a blocking I/O call in a worker thread"""
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=_get_io_limiter())
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run CPU-bound model work on the dedicated CLIP executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(clip_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def get_pipeline():
+    """
+    flask_app.get_pipeline() without blocking the event loop. Once loaded it
+    is returned directly; only the cold load (imports and the model) runs in
+    a worker thread, where the app's lock makes concurrent callers wait for
+    the one load. Neither waits behind queued CLIP work.
+    """
+    if flask_app._pipeline is not None:
+        return flask_app._pipeline
+    return await run_io(flask_app.get_pipeline)
+
+
+def _save_upload(upload, path):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f)
+
+
+async def _json_body(request):
+    # Flask's get_json() returns None for non-JSON bodies; mirror that
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+class _RequestBodyReader:
+    """
+    Blocking file-like view of a request body for code running in a worker
+    thread; the event loop feeds it chunks through a bounded queue, so a
+    slow consumer holds back the upload instead of buffering it
+    """
+
+    def __init__(self, max_chunks=16):
+        self._queue = queue.Queue(max_chunks)
+        self._buffer = bytearray()
+        self._eof = False
+        self._closed = False
+
+    def put(self, chunk):
+        # Blocks while the queue is full; gives up once the reader is closed
+        while not self._closed:
+            try:
+                self._queue.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def read(self, size=-1):
+        while not self._eof and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = self._queue.get()
+            if chunk is None:
+                self._eof = True
+            elif isinstance(chunk, Exception):
+                self._eof = True
+                raise chunk
+            else:
+                self._buffer += chunk
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def close(self):
+        self._closed = True
+        with contextlib.suppress(queue.Empty):
+            while True:
+                self._queue.get_nowait()
+        with contextlib.suppress(queue.Full):
+            self._queue.put_nowait(None)
+
+
+class _UploadStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves receive() to _pump_body: the stock one
+    listens there for a disconnect and would swallow the upload's chunks
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _pump_body(request, reader):
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_io(reader.put, chunk)
+    except Exception as e:
+        await run_io(reader.put, e)
+    else:
+        await run_io(reader.put, None)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    clip_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="Mangrove Watch API", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=flask_app.CORS_ORIGINS,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+@app.post("/run-pipeline")
+async def run_pipeline(request: Request):
+    try:
+        pipeline = await get_pipeline()
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            image_file = form.get("image")
+            mode = form.get("mode")
+            user_id = form.get("user_id")
+
+            if mode != "image":
+                return JSONResponse({"status": "error", "message": "Invalid mode for file upload. Use 'image'."})
+            if not image_file or isinstance(image_file, str):
+                return JSONResponse({"status": "error", "message": "image is required"})
+
+            filename = secure_filename(image_file.filename)
+            image_path = os.path.join(flask_app.app.config["UPLOAD_FOLDER"], filename)
+            await run_io(_save_upload, image_file, image_path)
+
+            result = await run_cpu(pipeline.classify_image, image_path)
+            flask_app.apply_browser_coordinates(result, form.get("latitude"), form.get("longitude"))
+            await run_io(pipeline.add_satellite_check, result)
+
+            if user_id:
+                await run_io(db.save_result, int(user_id), result)
+            return JSONResponse({"status": "success", "result": result})
+
+        data = await _json_body(request)
+        mode = data.get("mode")
+        user_id = data.get("user_id")
+
+        if mode == "folder":
+            # Classification on the CLIP executor; the satellite checks are I/O, on the I/O threads
+            result = await run_cpu(pipeline.classify_folder, data.get("folder", "Data"))
+            await run_io(pipeline.add_satellite_checks, list(result.values()))
+
+        elif mode == "image":
+            image_path = data.get("image_path")
+            if not image_path:
+                return JSONResponse({"status": "error", "message": "image_path is required"})
+            result = await run_cpu(pipeline.classify_image, image_path)
+            await run_io(pipeline.add_satellite_check, result)
+
+        elif mode == "coordinates":
+            lat = data.get("lat")
+            lon = data.get("lon")
+            if lat is None or lon is None:
+                return JSONResponse({"status": "error", "message": "lat and lon are required"})
+            result = await run_io(pipeline.run_on_coordinates, lat, lon)
+
+        else:
+            return JSONResponse({"status": "error", "message": "Invalid mode. Use 'folder', 'image', or 'coordinates'"})
+
+        if user_id:
+            await run_io(db.save_result, int(user_id), result)
+        return JSONResponse({"status": "success", "result": result})
+
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)})
+
+
+@app.post("/run-pipeline/bulk")
+async def run_pipeline_bulk(request: Request):
+    # Same contract as app.py's route: NDJSON progress while the archive is read
+    form = None
+    pump = None
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        # Starlette spools the file part to disk past 1 MB, never all into memory
+        form = await request.form()
+        archive = form.get("archive")
+        user_id = form.get("user_id")
+        if not archive or isinstance(archive, str):
+            await form.close()
+            return JSONResponse({"status": "error", "message": "archive is required"}, status_code=400)
+        stream = archive.file
+    else:
+        user_id = request.query_params.get("user_id")
+        stream = _RequestBodyReader()
+
+    try:
+        user_id = int(user_id) if user_id else None
+    except ValueError:
+        if form is not None:
+            await form.close()
+        return JSONResponse({"status": "error", "message": "user_id must be an integer"}, status_code=400)
+
+    import bulk_ingest
+
+    pipeline = await get_pipeline()
+    if form is None:
+        pump = asyncio.create_task(_pump_body(request, stream))
+
+    async def events():
+        # The ingest generator blocks on the body and on the model, so each step runs in a thread
+        ingest = bulk_ingest.ingest(pipeline, bulk_ingest.iter_archive(stream), user_id)
+        try:
+            while True:
+                event = await run_io(next, ingest, None)
+                if event is None:
+                    break
+                yield json.dumps(event) + "\n"
+        finally:
+            if pump is not None:
+                stream.close()
+                pump.cancel()
+            else:
+                await form.close()
+            with contextlib.suppress(ValueError):  # still executing in its thread after a disconnect
+                ingest.close()
+
+    return _UploadStreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/validate")
+async def validate(request: Request):
+    try:
+        data = await _json_body(request)
+        mode = data.get("mode", "image")
+
+        if mode == "image":
+            image_path = data.get("image_path")
+            if not image_path:
+                return JSONResponse({"status": "error", "message": "image_path is required"})
+            validator = (await get_pipeline()).validator
+            result = await run_cpu(validator.analyze_photo, image_path)
+
+        elif mode == "folder":
+            validator = (await get_pipeline()).validator
+            result = await run_cpu(validator.analyze_folder, data.get("folder_path", "Data"))
+
+        else:
+            return JSONResponse({"status": "error", "message": "Invalid mode. Use 'image' or 'folder'"})
+
+        return JSONResponse({"status": "success", "result": result})
+
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)})
+
+
+@app.post("/satellite-check")
+async def satellite_check(request: Request):
+    try:
+        data = await _json_body(request)
+        lat = data.get("lat")
+        lon = data.get("lon")
+
+        if lat is None or lon is None:
+            return JSONResponse({"status": "error", "message": "lat and lon are required"})
+
+        result = await run_io(flask_app.get_vegetation_change, lat, lon)
+        return JSONResponse({
+            "status": "success",
+            "coordinates": {"lat": lat, "lon": lon},
+            "vegetation_change_percent": result
+        })
+
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)})
+
+
+@app.post("/check_location")
+async def check_location(request: Request):
+    data = await _json_body(request) or {}
+    text = data.get("location", "").strip()
+    if not text:
+        return JSONResponse({"error": "No location provided"}, status_code=400)
+
+    # Case 1: Coordinates provided
+    if "," in text:
+        try:
+            parts = text.split(",")
+            lat = float(parts[0].strip())
+            lon = float(parts[1].strip())
+        except ValueError:
+            return JSONResponse({"error": "Invalid coordinates format. Use: lat, lon"}, status_code=400)
+
+    # Case 2: Place name provided
+    else:
+        lat, lon = await run_io(geocoding.geocode, text)
+        if lat is None or lon is None:
+            return JSONResponse({"error": "Location not found or geocoding service unavailable"}, status_code=503)
+
+    try:
+        pipeline = await get_pipeline()
+        result = await run_io(pipeline.run_on_coordinates, lat, lon)
+        veg_change = result.get("satellite_vegetation_change", "N/A")
+    except Exception as e:
+        return JSONResponse({"error": f"Pipeline error: {str(e)}"}, status_code=500)
+
+    return JSONResponse({
+        "latitude": lat,
+        "longitude": lon,
+        "vegetation_change": veg_change
+    })
+
+
+# Everything else is served by the Flask app (runs in the WSGI threadpool)
+app.mount("/", WSGIMiddleware(flask_app.app))
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Encoder backbone comparison on a labelled local image set.
+
+For each backbone (see encoders.BACKBONES) AIValidator is run over the
+same images and the script reports load time, per-image latency (batch of
+one), batched throughput, peak memory, accuracy against the labels and
+agreement with the first backbone's predictions. Each backbone runs in a
+fresh process, so peak memory is its own and models never pile up.
+
+The image set is either one folder per label, named like the entries of
+labels.txt with anything but letters and digits ignored
+("dumping_trash/" is "dumping/trash"), or any folder with a labels.csv of
+filename,label rows.
+
+Examples (from backend/):
+    python benchmarks/bench_backbones.py --images /data/mangrove-labelled
+    python benchmarks/bench_backbones.py --images /data/mangrove-labelled \\
+        --backbones clip-vit-b32,siglip-b16,mobileclip-s1 --threads 4 --output backbones.json
+
+Checkpoints are downloaded on first use (Hugging Face hub / open_clip);
+open_clip backbones need `pip install open_clip_torch timm`.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from common import BACKEND_DIR, machine_info
+
+DEFAULT_BACKBONES = "clip-vit-b32,clip-vit-b16,siglip-b16,mobileclip-s2,mobileclip-s1"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def _normalize(name):
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def load_labelled_set(folder, labels, limit=None):
+    """[(path, label)] from labels.csv or per-label subfolders; labels must be in `labels`"""
+    by_key = {_normalize(label): label for label in labels}
+    items = []
+    csv_path = os.path.join(folder, "labels.csv")
+    if os.path.exists(csv_path):
+        with open(csv_path, newline="") as f:
+            for row in csv.reader(f):
+                if len(row) < 2 or row[0] == "filename":
+                    continue
+                label = by_key.get(_normalize(row[1]))
+                if label is None:
+                    raise SystemExit(f"[ERROR] labels.csv: {row[1]!r} is not in labels.txt")
+                items.append((os.path.join(folder, row[0]), label))
+    else:
+        for entry in sorted(os.listdir(folder)):
+            path = os.path.join(folder, entry)
+            if not os.path.isdir(path):
+                continue
+            label = by_key.get(_normalize(entry))
+            if label is None:
+                print(f"[WARN] Skipping folder {entry!r}: not a label in labels.txt")
+                continue
+            items.extend(
+                (os.path.join(path, name), label)
+                for name in sorted(os.listdir(path))
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+    if not items:
+        raise SystemExit(f"[ERROR] No labelled images found in {folder}")
+    return items[:limit] if limit else items
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_backbone(spec, paths, labels_file, batch_size, threads):
+    """Benchmark one backbone in this (fresh) process; returns a result dict"""
+    import torch
+    from PIL import Image
+
+    from ai_validator import AIValidator
+
+    if threads:
+        torch.set_num_threads(threads)
+    images = [Image.open(path).convert("RGB") for path in paths]
+    baseline_mb = _peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as results_dir:
+        validator = AIValidator(labels_file=labels_file, model_name=spec, results_dir=results_dir)
+        start = time.perf_counter()
+        validator.warm_up()
+        load_seconds = time.perf_counter() - start
+
+        with torch.inference_mode():
+            validator.analyze_images(images[:1])  # first-call allocations
+            latencies = []
+            for image in images:
+                start = time.perf_counter()
+                validator.analyze_images([image])
+                latencies.append(time.perf_counter() - start)
+
+            predictions = []
+            start = time.perf_counter()
+            for i in range(0, len(images), batch_size):
+                predictions.extend(validator.analyze_images(images[i:i + batch_size]))
+            batch_seconds = time.perf_counter() - start
+
+    return {
+        "backbone": spec,
+        "encoder": repr(validator.encoder),
+        "parameters_m": validator.encoder.parameter_count() / 1e6,
+        "load_seconds": load_seconds,
+        "latency_p50_ms": statistics.median(latencies) * 1000,
+        "latency_p95_ms": _percentile(latencies, 0.95) * 1000,
+        "throughput_per_s": len(images) / batch_seconds,
+        "peak_rss_mb": _peak_rss_mb(),
+        "model_rss_mb": _peak_rss_mb() - baseline_mb,
+        "predictions": [p["label"] for p in predictions],
+        "mean_confidence": statistics.fmean(p["confidence"] for p in predictions),
+    }
+
+
+def _run_isolated(spec, paths, labels_file, batch_size, threads):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_backbone, (spec, paths, labels_file, batch_size, threads))
+
+
+def score(results, truth):
+    """Add accuracy, per-label recall and agreement with the first backbone"""
+    reference = next((r["predictions"] for r in results if "error" not in r), None)
+    for r in results:
+        if "error" in r:
+            continue
+        predictions = r["predictions"]
+        r["accuracy"] = sum(p == t for p, t in zip(predictions, truth)) / len(truth)
+        r["recall"] = {}
+        for label in sorted(set(truth)):
+            hits = [p == t for p, t in zip(predictions, truth) if t == label]
+            r["recall"][label] = sum(hits) / len(hits)
+        r["agreement"] = sum(p == q for p, q in zip(predictions, reference)) / len(truth)
+    return results
+
+
+def print_table(results):
+    print(f"\n{'backbone':<18} {'params':>8} {'load':>7} {'p50':>8} {'p95':>8} {'img/s':>7} "
+          f"{'peak MB':>8} {'acc':>6} {'agree':>6}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['backbone']:<18} failed: {r['error']}")
+            continue
+        print(
+            f"{r['backbone']:<18} {r['parameters_m']:>7.1f}M {r['load_seconds']:>6.1f}s "
+            f"{r['latency_p50_ms']:>6.1f}ms {r['latency_p95_ms']:>6.1f}ms {r['throughput_per_s']:>7.1f} "
+            f"{r['peak_rss_mb']:>8.0f} {r['accuracy']:>6.1%} {r['agreement']:>6.1%}"
+        )
+    print("\nagree = same label as the first backbone; peak MB includes the decoded image set")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare encoder backbones on a labelled image set")
+    parser.add_argument("--images", required=True, help="labelled image folder (per-label subfolders or labels.csv)")
+    parser.add_argument("--backbones", default=DEFAULT_BACKBONES,
+                        help="comma separated registry names or <kind>:<model id>; the first is the agreement reference")
+    parser.add_argument("--labels-file", default=os.path.join(BACKEND_DIR, "labels.txt"))
+    parser.add_argument("--limit", type=int, help="use only the first N images")
+    parser.add_argument("--batch-size", type=int, default=16, help="batch size for the throughput pass")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (default: torch's choice)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with open(args.labels_file) as f:
+        labels = [line.strip() for line in f if line.strip()]
+    items = load_labelled_set(args.images, labels, args.limit)
+    paths, truth = [path for path, _ in items], [label for _, label in items]
+    counts = {label: truth.count(label) for label in sorted(set(truth))}
+    print(f"[BENCH] {len(items)} labelled images: {counts}")
+
+    results = []
+    for spec in [s.strip() for s in args.backbones.split(",") if s.strip()]:
+        print(f"[BENCH] Running {spec}...")
+        try:
+            results.append(_run_isolated(spec, paths, args.labels_file, args.batch_size, args.threads))
+        except Exception as e:
+            print(f"[WARN] {spec} failed: {e}")
+            results.append({"backbone": spec, "error": str(e)})
+
+    print_table(score(results, truth))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"machine": machine_info(), "images": len(items), "labels": counts,
+                       "results": results}, f, indent=2)
+        print(f"[BENCH] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
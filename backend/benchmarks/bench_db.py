@@ -0,0 +1,101 @@
+"""
+/user/reports, /user/stats and spatial report benchmarks against seeded SQLite databases.
+
+Requests go through the Flask test client so routing, JSON encoding and the
+SQLite queries are all included. Each table size gets a fresh database in a
+temporary directory; the production database is never touched.
+"""
+
+import os
+import shutil
+import tempfile
+
+from common import BACKEND_DIR, measure, result, seed_database
+
+
+def _load_app():
+    previous = os.getcwd()
+    os.chdir(BACKEND_DIR)
+    try:
+        import app as app_module
+    finally:
+        os.chdir(previous)
+    return app_module
+
+
+def use_database(path):
+    """Point the shared data-access layer at `path`"""
+    import db
+
+    db.configure(path)
+
+
+def run(args):
+    import db
+
+    app_module = _load_app()
+    client = app_module.app.test_client()
+    original_path = db.DB_PATH
+
+    records = []
+    workdir = tempfile.mkdtemp(prefix="bench_db_")
+    try:
+        for rows in args.rows:
+            db_path = os.path.join(workdir, f"bench_{rows}.db")
+            user_id = seed_database(db_path, rows)
+            use_database(db_path)
+
+            def fetch_reports():
+                response = client.get(f"/user/reports?user_id={user_id}")
+                assert response.status_code == 200, response.data
+
+            def fetch_stats():
+                response = client.get(f"/user/stats?user_id={user_id}")
+                assert response.status_code == 200, response.data
+
+            first_page = client.get(f"/user/reports?user_id={user_id}").get_json()
+            cursor = first_page.get("next_cursor")
+
+            def fetch_next_page():
+                response = client.get(f"/user/reports?user_id={user_id}&cursor={cursor}")
+                assert response.status_code == 200, response.data
+
+            def fetch_filtered():
+                response = client.get(
+                    f"/user/reports?user_id={user_id}&label=healthy%20mangrove&min_confidence=0.8&since=2025-01-02"
+                )
+                assert response.status_code == 200, response.data
+
+            def fetch_bbox():
+                response = client.get("/reports/bbox?min_lat=20.95&max_lat=21.05&min_lon=72.55&max_lon=72.65")
+                assert response.status_code == 200, response.data
+
+            def fetch_nearby():
+                response = client.get("/reports/nearby?lat=21.0&lon=72.6&radius_m=500")
+                assert response.status_code == 200, response.data
+
+            def fetch_clusters():
+                response = client.get("/reports/clusters?min_lat=20&max_lat=22&min_lon=71.6&max_lon=73.6&zoom=8")
+                assert response.status_code == 200, response.data
+
+            etag = client.get(f"/user/stats?user_id={user_id}").headers.get("ETag")
+
+            def fetch_stats_not_modified():
+                response = client.get(f"/user/stats?user_id={user_id}", headers={"If-None-Match": etag})
+                assert response.status_code == 304, response.status_code
+
+            number = 20 if rows <= 100_000 else 3
+            records.append(result("api.user_reports", measure(fetch_reports, repeat=args.repeat, number=number), rows=rows))
+            if cursor:
+                records.append(result("api.user_reports_next_page", measure(fetch_next_page, repeat=args.repeat, number=number), rows=rows))
+            records.append(result("api.user_reports_filtered", measure(fetch_filtered, repeat=args.repeat, number=number), rows=rows))
+            records.append(result("api.reports_bbox", measure(fetch_bbox, repeat=args.repeat, number=number), rows=rows))
+            records.append(result("api.reports_nearby", measure(fetch_nearby, repeat=args.repeat, number=number), rows=rows))
+            records.append(result("api.reports_clusters", measure(fetch_clusters, repeat=args.repeat, number=number), rows=rows))
+            records.append(result("api.user_stats", measure(fetch_stats, repeat=args.repeat, number=number), rows=rows))
+            records.append(result("api.user_stats_304", measure(fetch_stats_not_modified, repeat=args.repeat, number=number), rows=rows))
+            os.remove(db_path)
+    finally:
+        use_database(original_path)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return records
@@ -0,0 +1,47 @@
+"""
+utils.get_gps_coordinates and exif_scan.read_gps benchmarks on tagged,
+untagged and large photos, plus a full exif_scan.build_index folder scan.
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+
+from common import measure, result, sample_images, write_gps_images
+
+
+def run(args):
+    import exif_scan
+    from utils import get_gps_coordinates
+
+    records = []
+    workdir = tempfile.mkdtemp(prefix="bench_gps_")
+    try:
+        cases = {
+            "tagged": write_gps_images(os.path.join(workdir, "small"), 16),
+            "tagged_12mp": write_gps_images(os.path.join(workdir, "large"), 4, size=(4000, 3000)),
+            "untagged": sample_images(limit=16),
+        }
+        for case, paths in cases.items():
+            cycle = itertools.cycle(paths)
+            stats = measure(lambda: get_gps_coordinates(next(cycle)), repeat=args.repeat, number=len(paths) * 4)
+            records.append(result("utils.get_gps_coordinates", stats, case=case))
+            stats = measure(lambda: exif_scan.read_gps(next(cycle)), repeat=args.repeat, number=len(paths) * 4)
+            records.append(result("exif_scan.read_gps", stats, case=case))
+
+        # Cold scan (no saved index) of a folder of tagged photos
+        folder = os.path.join(workdir, "scan")
+        write_gps_images(folder, 500, size=(160, 120))
+        index_path = os.path.join(workdir, "scan_index.tsv")
+
+        def scan():
+            if os.path.exists(index_path):
+                os.remove(index_path)
+            exif_scan.build_index(folder, index_path)
+
+        stats = measure(scan, repeat=args.repeat)
+        records.append(result("exif_scan.build_index", stats, images=500))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return records
@@ -0,0 +1,54 @@
+"""
+Pipeline.run_on_image / run_on_folder / run_on_coordinates benchmarks with
+Earth Engine replaced by a deterministic stand-in (see common.stub_earth_engine).
+"""
+
+import contextlib
+import itertools
+import os
+import shutil
+import tempfile
+
+from bench_validator import make_validator
+from common import measure, result, stub_earth_engine, write_gps_images
+
+
+@contextlib.contextmanager
+def _cwd(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def run(args):
+    import torch
+    import full_pipe
+
+    records = []
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        with _cwd(workdir):
+            pipeline = full_pipe.Pipeline()
+        pipeline.validator = make_validator(os.path.join(workdir, "results"), args.clip_model)
+        images = write_gps_images(os.path.join(workdir, "Data"), 16)
+        cycle = itertools.cycle(images)
+
+        for latency in (0.0, args.ee_latency):
+            with stub_earth_engine(latency=latency), torch.inference_mode():
+                stats = measure(lambda: pipeline.run_on_coordinates(21.17, 72.83), repeat=args.repeat, number=8)
+                records.append(result("pipeline.run_on_coordinates", stats, ee_latency=latency))
+
+                stats = measure(lambda: pipeline.run_on_image(next(cycle)), repeat=args.repeat, number=8)
+                records.append(result("pipeline.run_on_image", stats, ee_latency=latency))
+
+                stats = measure(
+                    lambda: pipeline.run_on_folder(os.path.join(workdir, "Data")),
+                    repeat=max(1, args.repeat // 2),
+                )
+                records.append(result("pipeline.run_on_folder", stats, images=len(images), ee_latency=latency))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return records
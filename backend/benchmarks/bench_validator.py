@@ -0,0 +1,131 @@
+"""
+AIValidator.analyze_photo / analyze_folder benchmarks.
+
+By default the validator runs a random-weight miniature CLIP so the suite
+needs neither network access nor the 600 MB checkpoint. Pass --clip-model
+with a local checkpoint directory to time the real model instead.
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+import zlib
+
+from common import BACKEND_DIR, measure, result, sample_images
+
+
+class OfflineClipProcessor:
+    """
+    Minimal stand-in for CLIPProcessor that needs no tokenizer files.
+    Words are hashed into the miniature model's vocabulary; images go
+    through the real CLIPImageProcessor so preprocessing cost is kept.
+    """
+
+    def __init__(self, image_size, vocab_size, max_length=16):
+        from transformers import CLIPImageProcessor
+
+        self.image_processor = CLIPImageProcessor(
+            size={"shortest_edge": image_size},
+            crop_size={"height": image_size, "width": image_size},
+        )
+        self.vocab_size = vocab_size
+        self.max_length = max_length
+        self.bos_token_id = vocab_size - 2
+        self.eos_token_id = vocab_size - 1
+
+    def _tokenize(self, text):
+        words = text.lower().split()[: self.max_length - 2]
+        ids = [zlib.crc32(w.encode()) % (self.vocab_size - 3) + 1 for w in words]
+        return [self.bos_token_id] + ids + [self.eos_token_id]
+
+    def __call__(self, text=None, images=None, return_tensors="pt", padding=True):
+        import torch
+
+        encoded = {}
+        if text is not None:
+            if isinstance(text, str):
+                text = [text]
+            tokens = [self._tokenize(t) for t in text]
+            width = max(len(t) for t in tokens)
+            encoded["input_ids"] = torch.tensor([t + [0] * (width - len(t)) for t in tokens])
+            encoded["attention_mask"] = torch.tensor(
+                [[1] * len(t) + [0] * (width - len(t)) for t in tokens]
+            )
+        if images is not None:
+            encoded["pixel_values"] = self.image_processor(
+                images=images, return_tensors=return_tensors
+            )["pixel_values"]
+        return encoded
+
+
+def build_random_clip(image_size=224, vocab_size=1024):
+    """A small, randomly initialised CLIP with the same architecture as ViT-B/32"""
+    from transformers import CLIPConfig, CLIPModel
+
+    config = CLIPConfig(
+        text_config={
+            "vocab_size": vocab_size,
+            "hidden_size": 128,
+            "intermediate_size": 256,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 4,
+            "max_position_embeddings": 32,
+            "bos_token_id": vocab_size - 2,
+            "eos_token_id": vocab_size - 1,
+        },
+        vision_config={
+            "image_size": image_size,
+            "patch_size": 32,
+            "hidden_size": 128,
+            "intermediate_size": 256,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 4,
+        },
+        projection_dim=64,
+    )
+    model = CLIPModel(config).eval()
+    return model, OfflineClipProcessor(image_size, vocab_size)
+
+
+def make_validator(results_dir, clip_model=None):
+    """AIValidator wired to either a local checkpoint or the random miniature"""
+    from ai_validator import AIValidator
+    from encoders import ClipEncoder
+
+    labels_file = os.path.join(BACKEND_DIR, "labels.txt")
+    if clip_model:
+        validator = AIValidator(labels_file=labels_file, model_name=clip_model, results_dir=results_dir)
+        validator.load_model()
+    else:
+        validator = AIValidator(labels_file=labels_file, results_dir=results_dir)
+        model, processor = build_random_clip()
+        validator.encoder = ClipEncoder("random-mini", model=model, processor=processor).load()
+    return validator
+
+
+def run(args):
+    import torch
+
+    records = []
+    model_tag = "local" if args.clip_model else "random-mini"
+    workdir = tempfile.mkdtemp(prefix="bench_validator_")
+    try:
+        validator = make_validator(os.path.join(workdir, "results"), args.clip_model)
+        images = sample_images(limit=8)
+        cycle = itertools.cycle(images)
+
+        with torch.inference_mode():
+            stats = measure(lambda: validator.analyze_photo(next(cycle)), repeat=args.repeat, number=len(images))
+            records.append(result("validator.analyze_photo", stats, model=model_tag))
+
+            for count in (8, 32):
+                folder = os.path.join(workdir, f"folder_{count}")
+                os.makedirs(folder)
+                for i, src in zip(range(count), itertools.cycle(images)):
+                    shutil.copy(src, os.path.join(folder, f"{i:04d}{os.path.splitext(src)[1]}"))
+                stats = measure(lambda: validator.analyze_folder(folder), repeat=max(1, args.repeat // 2))
+                records.append(result("validator.analyze_folder", stats, images=count, model=model_tag))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return records
@@ -0,0 +1,277 @@
+"""
+Shared helpers for the offline benchmark suite.
+
+Everything here runs without network access: Earth Engine is replaced by a
+deterministic stand-in, CLIP can be a random-weight miniature, and the
+SQLite benchmarks seed their own throwaway databases.
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+# Benchmarks import the backend modules the same way app.py does
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+# --------------------------
+# Timing
+# --------------------------
+def measure(fn, repeat=5, number=1, warmup=1):
+    """
+    Time `fn` and return summary statistics in seconds per call.
+    `number` calls are averaged into each of the `repeat` samples.
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": max(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def result(name, stats, **params):
+    """Build one benchmark record; `name` plus `params` form its baseline key"""
+    key = name
+    if params:
+        key += "[" + ",".join(f"{k}={params[k]}" for k in sorted(params)) + "]"
+    return {"key": key, "name": name, "params": params, "stats": stats}
+
+
+# --------------------------
+# Baselines
+# --------------------------
+def machine_info():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+    }
+
+
+def save_baseline(records, name):
+    """Write benchmark records to benchmarks/baselines/<name>.json"""
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = baseline_path(name)
+    payload = {
+        "name": name,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "results": {r["key"]: r for r in records},
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    return path
+
+
+def baseline_path(name):
+    if name.endswith(".json") or os.sep in name:
+        return name
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def load_baseline(name):
+    with open(baseline_path(name)) as f:
+        return json.load(f)
+
+
+def compare(records, baseline, threshold=1.2):
+    """
+    Compare median timings against a baseline.
+    Returns a list of rows (key, baseline_median, current_median, ratio, status).
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for r in records:
+        base = base_results.get(r["key"])
+        current = r["stats"]["median"]
+        if base is None:
+            rows.append((r["key"], None, current, None, "new"))
+            continue
+        base_median = base["stats"]["median"]
+        ratio = current / base_median if base_median else float("inf")
+        if ratio > threshold:
+            status = "REGRESSION"
+        elif ratio < 1 / threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((r["key"], base_median, current, ratio, status))
+    return rows
+
+
+def format_seconds(value):
+    if value is None:
+        return "-"
+    if value < 1e-3:
+        return f"{value * 1e6:.1f}us"
+    if value < 1:
+        return f"{value * 1e3:.2f}ms"
+    return f"{value:.3f}s"
+
+
+# --------------------------
+# Earth Engine stand-in
+# --------------------------
+@contextlib.contextmanager
+def stub_earth_engine(latency=0.0, value=4.2):
+    """
+    Replace the Earth Engine backed vegetation check with a deterministic
+    function, optionally sleeping `latency` seconds to mimic a remote call.
+    """
+    import full_pipe
+    import satelite_check
+
+    def fake_get_vegetation_change(latitude, longitude, use_enhanced=False):
+        if latency:
+            time.sleep(latency)
+        return value
+
+    originals = (satelite_check.get_vegetation_change, full_pipe.get_vegetation_change)
+    satelite_check.get_vegetation_change = fake_get_vegetation_change
+    full_pipe.get_vegetation_change = fake_get_vegetation_change
+    try:
+        yield fake_get_vegetation_change
+    finally:
+        satelite_check.get_vegetation_change, full_pipe.get_vegetation_change = originals
+
+
+# --------------------------
+# Images
+# --------------------------
+def sample_images(limit=8):
+    """Paths of the bundled sample photos in backend/Data"""
+    data_dir = os.path.join(BACKEND_DIR, "Data")
+    files = sorted(
+        f for f in os.listdir(data_dir) if f.lower().endswith((".png", ".jpg", ".jpeg"))
+    )
+    return [os.path.join(data_dir, f) for f in files[:limit]]
+
+
+def _to_dms(value):
+    from PIL.TiffImagePlugin import IFDRational
+
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600, 4)
+    return (IFDRational(degrees), IFDRational(minutes), IFDRational(seconds))
+
+
+def make_gps_jpeg(lat, lon, size=(640, 480), seed=0):
+    """Encode a noisy JPEG carrying GPS EXIF tags and return its bytes"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.effect_noise(size, 64).convert("RGB")
+    image.paste((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (0, 0, size[0] // 4, size[1] // 4))
+
+    exif = Image.Exif()
+    exif[0x8825] = {
+        1: "N" if lat >= 0 else "S",
+        2: _to_dms(lat),
+        3: "E" if lon >= 0 else "W",
+        4: _to_dms(lon),
+    }
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85, exif=exif)
+    return buffer.getvalue()
+
+
+def write_gps_images(folder, count, size=(640, 480)):
+    """Write `count` GPS-tagged JPEGs scattered around the Gujarat coast"""
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(42)
+    paths = []
+    for i in range(count):
+        lat = 21.0 + rng.uniform(-0.5, 0.5)
+        lon = 72.6 + rng.uniform(-0.5, 0.5)
+        path = os.path.join(folder, f"gps_{i:05d}.jpg")
+        with open(path, "wb") as f:
+            f.write(make_gps_jpeg(lat, lon, size=size, seed=i))
+        paths.append(path)
+    return paths
+
+
+# --------------------------
+# SQLite
+# --------------------------
+LABELS = ["mangrove cutting", "dumping/trash", "healthy mangrove"]
+
+
+def seed_database(path, rows, users=100, seed=7):
+    """
+    Create a database with the current schema (db.MIGRATIONS) and `rows` workflow results
+    spread evenly over `users` users. Returns the id of the first user.
+    """
+    import db
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    db.init_db(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO users (id, username, password_hash, email, total_reports) VALUES (?, ?, ?, ?, ?)",
+        (
+            (uid, f"user{uid}", "x", f"user{uid}@example.com", rows // users)
+            for uid in range(1, users + 1)
+        ),
+    )
+
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+
+    def generate():
+        for i in range(rows):
+            created = start + timedelta(seconds=i * 30)
+            yield (
+                (i % users) + 1,
+                rng.random(),
+                21.0 + rng.uniform(-1, 1),
+                72.6 + rng.uniform(-1, 1),
+                LABELS[i % len(LABELS)],
+                str(round(rng.uniform(-20, 20), 2)),
+                "completed",
+                created.strftime("%Y-%m-%d %H:%M:%S"),
+            )
+
+    conn.executemany(
+        """
+        INSERT INTO workflow_results
+        (user_id, confidence, latitude, longitude, label, satellite_vegetation_change, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        generate(),
+    )
+    conn.commit()
+    conn.close()
+    return 1
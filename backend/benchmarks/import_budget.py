@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the server entry points.
+
+Each entry module is imported in a fresh interpreter under `-X importtime`
+(so nothing is cached in sys.modules) and checked against BUDGETS:
+  - the median cumulative import time must stay under `max_ms`
+  - none of the `forbidden` packages may be imported at startup; they
+    belong to subsystems that load on first use (CLIP, Earth Engine,
+    the Telegram bot, archive handling, ...)
+
+Exits with status 1 when a budget is exceeded, so it can gate CI:
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --module app --runs 10 --top 15
+
+Also available as the "startup" suite of benchmarks/run.py for baseline
+comparisons.
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+from common import BACKEND_DIR, result
+
+# Generous enough for a slow CI runner; the forbidden lists catch the real regressions
+BUDGETS = {
+    "app": {
+        "max_ms": 600,
+        "forbidden": ["torch", "transformers", "ee", "telegram", "geopy", "PIL", "numpy", "full_pipe", "bulk_ingest"],
+    },
+    "asgi_app": {
+        "max_ms": 1500,
+        "forbidden": ["torch", "transformers", "ee", "telegram", "geopy", "PIL", "numpy", "full_pipe", "bulk_ingest"],
+    },
+}
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_profile(module):
+    """
+    Import `module` in a fresh interpreter. Returns (cumulative_us, entries)
+    where entries are (self_us, cumulative_us, depth, name) per imported module.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            depth = (len(match[3]) - 1) // 2
+            entries.append((int(match[1]), int(match[2]), depth, match[4]))
+
+    # Entries are in post-order: the module's own line follows its subtree,
+    # which starts after the previous top-level entry (e.g. `site`)
+    for end in range(len(entries) - 1, -1, -1):
+        if entries[end][2] == 0 and entries[end][3] == module:
+            break
+    else:
+        raise RuntimeError(f"no importtime entry for {module}")
+    start = end
+    while start > 0 and entries[start - 1][2] > 0:
+        start -= 1
+    return entries[end][1], entries[start:end + 1]
+
+
+def check(module, runs=5, top=10):
+    """Measure one module against its budget; returns (ok, report lines, per-run seconds)"""
+    budget = BUDGETS[module]
+    totals = []
+    entries = []
+    for _ in range(runs):
+        total, entries = import_profile(module)
+        totals.append(total)
+
+    median_ms = statistics.median(totals) / 1000
+    imported = {name for _, _, _, name in entries}
+    forbidden = sorted(
+        pkg for pkg in budget["forbidden"]
+        if pkg in imported or any(name.startswith(pkg + ".") for name in imported)
+    )
+
+    ok = median_ms <= budget["max_ms"] and not forbidden
+    lines = [
+        f"{module}: median {median_ms:.1f} ms over {runs} runs (budget {budget['max_ms']} ms), "
+        f"{len(imported)} modules imported"
+    ]
+    if median_ms > budget["max_ms"]:
+        lines.append(f"  over budget by {median_ms - budget['max_ms']:.1f} ms")
+    for pkg in forbidden:
+        lines.append(f"  forbidden at startup: {pkg}")
+
+    # Heaviest direct and second-level imports of the last run
+    heaviest = sorted((e for e in entries if 1 <= e[2] <= 2), key=lambda e: e[1], reverse=True)[:top]
+    for self_us, cumulative_us, depth, name in heaviest:
+        lines.append(f"    {'  ' * (depth - 1)}{name:<40} {cumulative_us / 1000:8.1f} ms")
+    return ok, lines, [t / 1e6 for t in totals]
+
+
+def run(args):
+    """benchmarks/run.py "startup" suite: cumulative import time per entry module"""
+    records = []
+    for module in BUDGETS:
+        _, _, samples = check(module, runs=args.repeat, top=0)
+        stats = {
+            "repeat": len(samples),
+            "number": 1,
+            "min": min(samples),
+            "median": statistics.median(samples),
+            "mean": statistics.fmean(samples),
+            "max": max(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        }
+        records.append(result("startup.import", stats, module=module))
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check server import time against its budget")
+    parser.add_argument("--module", action="append", choices=sorted(BUDGETS), help="entry module(s) to check (default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.module or list(BUDGETS):
+        ok, lines, _ = check(module, runs=args.runs, top=args.top)
+        print("\n".join(lines))
+        failed |= not ok
+
+    if failed:
+        print("[BUDGET] Import-time budget exceeded ❌")
+        return 1
+    print("[BUDGET] Import-time budget OK ✅")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark runner for the backend hot paths.
+
+Examples (from backend/):
+    python benchmarks/run.py                              # all suites, print results
+    python benchmarks/run.py --suite db --rows 1000,10000
+    python benchmarks/run.py --save-baseline main         # write baselines/main.json
+    python benchmarks/run.py --compare main --fail-on-regression
+"""
+
+import argparse
+import importlib
+import json
+import sys
+
+import common
+
+SUITES = {
+    "validator": "bench_validator",
+    "gps": "bench_gps",
+    "pipeline": "bench_pipeline",
+    "db": "bench_db",
+    "startup": "import_budget",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Mangrove Watch backend benchmarks")
+    parser.add_argument("--suite", default=",".join(SUITES), help="comma separated suites: " + ", ".join(SUITES))
+    parser.add_argument("--rows", default="1000,10000,100000,1000000", help="workflow_results sizes for the db suite")
+    parser.add_argument("--repeat", type=int, default=5, help="timing samples per benchmark")
+    parser.add_argument("--clip-model", default=None, help="local CLIP checkpoint directory (default: random-weight miniature)")
+    parser.add_argument("--ee-latency", type=float, default=0.05, help="simulated Earth Engine latency in seconds")
+    parser.add_argument("--output", help="also write the raw records to this JSON file")
+    parser.add_argument("--save-baseline", metavar="NAME", help="store results as baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baselines/NAME.json (or a path)")
+    parser.add_argument("--threshold", type=float, default=1.2, help="median slowdown ratio counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if any benchmark regressed")
+    args = parser.parse_args(argv)
+    args.suite = [s.strip() for s in args.suite.split(",") if s.strip()]
+    args.rows = [int(r) for r in args.rows.split(",") if r.strip()]
+    unknown = set(args.suite) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    records = []
+    for suite in args.suite:
+        print(f"[BENCH] Running {suite} suite...")
+        module = importlib.import_module(SUITES[suite])
+        suite_records = module.run(args)
+        for r in suite_records:
+            print(f"  {r['key']:<70} median {common.format_seconds(r['stats']['median'])}")
+        records.extend(suite_records)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"machine": common.machine_info(), "results": records}, f, indent=2)
+        print(f"[BENCH] Raw results written to {args.output}")
+
+    if args.save_baseline:
+        path = common.save_baseline(records, args.save_baseline)
+        print(f"[BENCH] Baseline saved to {path}")
+
+    if args.compare:
+        rows = common.compare(records, common.load_baseline(args.compare), args.threshold)
+        print(f"\n{'benchmark':<70} {'baseline':>10} {'current':>10} {'ratio':>7}  status")
+        for key, base, current, ratio, status in rows:
+            ratio_text = f"{ratio:.2f}" if ratio is not None else "-"
+            print(
+                f"{key:<70} {common.format_seconds(base):>10} {common.format_seconds(current):>10} "
+                f"{ratio_text:>7}  {status}"
+            )
+        if args.fail_on_regression and any(row[4] == "REGRESSION" for row in rows):
+            print("[BENCH] Performance regression detected ❌")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Async front end to the pipeline for the Telegram bot.
+
+The pipeline is blocking (Earth Engine round trips take seconds), so the
+bot never calls it on the event loop:
+  - analyses run on a bounded thread pool; when MAX_PENDING distinct
+    analyses are already queued or running, new ones are refused instead
+    of piling up
+  - each user may start RATE_LIMIT requests per RATE_WINDOW seconds
+  - every request waits at most DEADLINE seconds; a request that gives up
+    doesn't cancel the computation, which other requests may be sharing
+  - requests for the same spot (coordinates equal after rounding to
+    COALESCE_DECIMALS, ~110 m) made while an analysis is in flight wait
+    for that analysis instead of starting another
+  - photos are decoded in memory and classified in micro-batches: photos
+    arriving within PHOTO_BATCH_WAIT of each other (up to PHOTO_BATCH_SIZE)
+    share one forward pass of the classifier
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import geocoding
+from bulk_ingest import decode_image
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = int(os.getenv("MANGROVE_BOT_WORKERS", "4"))
+GEOCODE_WORKERS = 2
+MAX_PENDING = int(os.getenv("MANGROVE_BOT_MAX_PENDING", "32"))
+DEADLINE = float(os.getenv("MANGROVE_BOT_DEADLINE", "60"))
+GEOCODE_DEADLINE = 15.0
+RATE_LIMIT = int(os.getenv("MANGROVE_BOT_RATE_LIMIT", "5"))
+RATE_WINDOW = float(os.getenv("MANGROVE_BOT_RATE_WINDOW", "60"))
+COALESCE_DECIMALS = 3
+PHOTO_BATCH_SIZE = int(os.getenv("MANGROVE_BOT_PHOTO_BATCH", "16"))
+PHOTO_BATCH_WAIT = float(os.getenv("MANGROVE_BOT_PHOTO_BATCH_WAIT_MS", "50")) / 1000
+MAX_PENDING_PHOTOS = int(os.getenv("MANGROVE_BOT_MAX_PENDING_PHOTOS", "64"))
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limited, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class Busy(Exception):
+    """Too many analyses already queued"""
+
+
+class RateLimiter:
+    """Sliding-window limit of `limit` events per `window` seconds per key"""
+
+    def __init__(self, limit=RATE_LIMIT, window=RATE_WINDOW, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self._events = defaultdict(deque)
+
+    def check(self, key):
+        """Record an event for `key`; raises RateLimited when over the limit"""
+        if len(self._events) > 10000:
+            self.prune()
+        now = self.clock()
+        events = self._events[key]
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if len(events) >= self.limit:
+            raise RateLimited(events[0] + self.window - now)
+        events.append(now)
+
+    def prune(self):
+        """Forget keys with no events inside the window"""
+        cutoff = self.clock() - self.window
+        for key in [k for k, events in self._events.items() if not events or events[-1] <= cutoff]:
+            del self._events[key]
+
+
+class PhotoBatcher:
+    """
+    Collects photos submitted from concurrent handlers into batches for one
+    classifier call. A batch is flushed when it reaches `batch_size` or
+    `wait` seconds after its first photo; batches run one at a time on a
+    single thread, and photos arriving meanwhile form the next batch.
+    """
+
+    def __init__(self, classify_batch, batch_size=PHOTO_BATCH_SIZE, wait=PHOTO_BATCH_WAIT,
+                 max_pending=MAX_PENDING_PHOTOS):
+        self._classify_batch = classify_batch
+        self.batch_size = batch_size
+        self.wait = wait
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bot-classify")
+        self._batch = []
+        self._timer = None
+        self._pending = 0
+        self.stats = {"photos": 0, "batches": 0}
+
+    async def classify(self, item):
+        """Result of classify_batch for one item; raises Busy when too many photos are waiting"""
+        if self._pending >= self.max_pending:
+            raise Busy()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append((item, future))
+        self._pending += 1
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        self.stats["batches"] += 1
+        self.stats["photos"] += len(batch)
+        task = asyncio.get_running_loop().run_in_executor(
+            self.executor, self._classify_batch, [item for item, _ in batch]
+        )
+        task.add_done_callback(lambda done: self._resolve(batch, done))
+
+    def _resolve(self, batch, done):
+        self._pending -= len(batch)
+        error = asyncio.CancelledError() if done.cancelled() else done.exception()
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue  # caller gave up
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[i])
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AnalysisService:
+    def __init__(self, pipeline_factory, workers=ANALYSIS_WORKERS, max_pending=MAX_PENDING,
+                 deadline=DEADLINE, rate_limiter=None):
+        self._pipeline_factory = pipeline_factory
+        self._pipeline = None
+        self._pipeline_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot-analysis")
+        self.geocode_executor = ThreadPoolExecutor(max_workers=GEOCODE_WORKERS, thread_name_prefix="bot-geocode")
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self._inflight = {}
+        self.photos = PhotoBatcher(self._classify_photos)
+        self.stats = {"requests": 0, "computed": 0, "coalesced": 0, "timeouts": 0, "rejected": 0}
+
+    def get_pipeline(self):
+        if self._pipeline is None:
+            with self._pipeline_lock:
+                if self._pipeline is None:
+                    self._pipeline = self._pipeline_factory()
+        return self._pipeline
+
+    def _run_on_coordinates(self, lat, lon):
+        return self.get_pipeline().run_on_coordinates(lat, lon)
+
+    def _classify_photos(self, decoded):
+        return self.get_pipeline().classify_images(decoded)
+
+    def check_rate(self, user_id):
+        """Count a request against the user's limit; raises RateLimited"""
+        self.rate_limiter.check(user_id)
+
+    async def geocode(self, text):
+        """(lat, lon) or (None, None); raises asyncio.TimeoutError"""
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self.geocode_executor, geocoding.geocode, text), GEOCODE_DEADLINE
+        )
+
+    async def analyze(self, lat, lon):
+        """
+        Pipeline.run_on_coordinates result for (lat, lon), shared with any
+        in-flight analysis of the same spot. Raises Busy when the queue is
+        full and asyncio.TimeoutError after the deadline.
+        """
+        self.stats["requests"] += 1
+        key = (round(lat, COALESCE_DECIMALS), round(lon, COALESCE_DECIMALS))
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            logger.info(f"[BOT] Joining in-flight analysis for {key}")
+        else:
+            if len(self._inflight) >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise Busy()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self._run_on_coordinates, lat, lon)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.stats["computed"] += 1
+
+        try:
+            # shield: one caller timing out must not cancel the shared future
+            return await asyncio.wait_for(asyncio.shield(future), self.deadline)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+
+    async def classify_photo(self, data, coordinates=None):
+        """
+        Classify encoded image bytes, located by their EXIF GPS or else by
+        `coordinates`. Returns a classify_images result (local_vegetation
+        included) before any satellite check. Raises Busy,
+        asyncio.TimeoutError, or the decoder's error for unreadable images.
+        """
+        loop = asyncio.get_running_loop()
+        decoded = await loop.run_in_executor(None, decode_image, data)
+        result = await asyncio.wait_for(self.photos.classify(decoded), self.deadline)
+
+        if result["latitude"] is None and coordinates is not None:
+            result["latitude"], result["longitude"] = coordinates
+            result["coordinate_source"] = "caption"
+        return result
+
+    async def add_satellite_check(self, result):
+        """Fill in satellite_vegetation_change of a located classify_photo result"""
+        if result["latitude"] is not None:
+            analysis = await self.analyze(result["latitude"], result["longitude"])
+            result["satellite_vegetation_change"] = analysis["satellite_vegetation_change"]
+        return result
+
+    async def analyze_photo(self, data, coordinates=None):
+        """classify_photo followed by add_satellite_check"""
+        return await self.add_satellite_check(await self.classify_photo(data, coordinates))
+
+    def shutdown(self):
+        self.photos.shutdown()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.geocode_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,12 +1,13 @@
+import argparse
 import logging
 import os
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from PIL import UnidentifiedImageError
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
-from full_pipe import Pipeline   # <-- use pipeline instead of direct satellite call
+import db
+from bot_analysis import AnalysisService, Busy, RateLimited
+import bot_webhook
 
 # --------------------------
 # Logging
@@ -14,127 +15,274 @@ from full_pipe import Pipeline   # <-- use pipeline instead of direct satellite
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# --------------------------    
+# --------------------------
 # Load BOT TOKEN
 # --------------------------
 # Read token from environment to avoid hardcoding secrets
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8346053747:AAGywqFtXgXcZx3t0eo9uR3PPuIBAqvr2VY")
 
-# Initialize thread pool for blocking calls
-executor = ThreadPoolExecutor(max_workers=4)
-pipeline = None  # Will be initialized lazily
+# Handlers running at once; the rest wait in order (both polling and webhook mode)
+CONCURRENT_UPDATES = int(os.getenv("MANGROVE_BOT_CONCURRENT_UPDATES", "64"))
+
+# Bot API downloads are capped at 20 MB
+MAX_PHOTO_BYTES = 20 * 1024 * 1024
+
+
+def create_pipeline():
+    # Imported here: pulls in the classifier and Earth Engine client
+    from full_pipe import Pipeline
+    return Pipeline(satellite_lookup=db.find_recent_satellite_result)
+
+
+# Bounded offload, per-user rate limits, deadlines and coalescing (see bot_analysis.py)
+analysis = AnalysisService(create_pipeline)
+
+
+# --------------------------
+# Replies
+# --------------------------
+def parse_coordinates(text):
+    """(lat, lon) from 'lat, lon' text; raises ValueError"""
+    parts = text.split(",")
+    if len(parts) != 2:
+        raise ValueError(text)
+    lat, lon = float(parts[0].strip()), float(parts[1].strip())
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(text)
+    return lat, lon
+
+
+def describe_change(veg_change):
+    if veg_change > 10:
+        return "📈 Significant vegetation increase"
+    if veg_change > 0:
+        return "📊 Moderate vegetation increase"
+    if veg_change > -10:
+        return "📉 Moderate vegetation decrease"
+    return "📉 Significant vegetation decrease"
+
+
+def format_result(lat, lon, result):
+    veg_change = result.get("satellite_vegetation_change")
+    if veg_change is None:
+        return (
+            f"📍 Location: {lat}, {lon}\n"
+            "⚠️ No satellite data available for this location right now."
+        )
+    return (
+        f"📍 Location: {lat}, {lon}\n"
+        f"🛰️ Vegetation Change: {veg_change}%\n"
+        f"📊 Status: {describe_change(veg_change)}"
+    )
+
+
+def format_photo_classification(result):
+    lines = [f"🔍 Detected: {result['label']} ({result['confidence'] * 100:.1f}% confidence)"]
+    local = result.get("local_vegetation")
+    if local:
+        index = f"NDVI {local['ndvi']:.2f}" if local["ndvi"] is not None else f"ExG {local['exg']:.2f}"
+        lines.append(f"🌿 Vegetation in photo: {local['canopy_cover'] * 100:.0f}% canopy cover ({index})")
+    return lines
+
+
+def format_photo_result(result):
+    lines = format_photo_classification(result)
+    if result["latitude"] is None:
+        lines.append(
+            "📍 No GPS data in this photo. Send it as a file to keep its location, "
+            "or add coordinates as the caption (e.g., '21.17, 72.83')."
+        )
+    else:
+        lines.append(format_result(result["latitude"], result["longitude"], result))
+    return "\n".join(lines)
+
 
 # --------------------------
-# Start command
+# Handlers
 # --------------------------
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
-        "👋 Hello! I am your Agro Guardian bot.\n\n"
+        "👋 Hello! I am your Mangrove Watch bot.\n\n"
         "You can:\n"
         "📍 Send a location name (e.g., 'Ahmedabad')\n"
-        "📍 Send coordinates (e.g., '21.17, 72.83')\n\n"
+        "📍 Send coordinates (e.g., '21.17, 72.83')\n"
+        "📷 Send a photo (as a file to keep its GPS location)\n\n"
         "I will check 🛰️ satellite vegetation change."
     )
 
-# --------------------------
-# Handle text input (location name / coordinates)
-# --------------------------
+
+async def test(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text("✅ Bot is alive and working!")
+
+
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle text input (location name / coordinates)"""
     if not update.message:
         return
 
     text = (update.message.text or "").strip()
-    logger.info(f"[User Input] {text}")
+    user_id = update.effective_user.id if update.effective_user else update.message.chat_id
+    logger.info(f"[User Input] {user_id}: {text}")
+
+    try:
+        analysis.check_rate(user_id)
+    except RateLimited as e:
+        await update.message.reply_text(
+            f"🐢 You're sending requests too quickly. Please try again in {max(1, round(e.retry_after))}s."
+        )
+        return
 
     # Quick acknowledgement to avoid Telegram spinner
     await update.message.reply_text("⏳ Processing your request... This may take a few seconds.")
 
-    lat, lon = None, None
-
     try:
-        # Add timeout to prevent hanging
-        async def process_request():
-            # Case 1: Coordinates given
-            if "," in text:
-                try:
-                    parts = text.split(",")
-                    lat = float(parts[0].strip())
-                    lon = float(parts[1].strip())
-                except Exception:
-                    await update.message.reply_text("⚠️ Invalid coordinates format. Try: 21.17, 72.83")
-                    return
-
-            # Case 2: Place name (convert via geocoding)
-            else:
-                geolocator = Nominatim(user_agent="mangrove_watch_bot")
-
-                loop = asyncio.get_running_loop()
-                try:
-                    # Geocoding can block; run it in a thread
-                    location = await loop.run_in_executor(
-                        executor, lambda: geolocator.geocode(text, timeout=10)
-                    )
-                except (GeocoderTimedOut, GeocoderUnavailable) as e:
-                    await update.message.reply_text("⚠️ Geocoding service timeout/unavailable. Please try again.")
-                    logger.error(f"Geocoding error: {e}")
-                    return
-
-                if location:
-                    lat, lon = location.latitude, location.longitude
-                else:
-                    await update.message.reply_text("❌ Could not find that location. Try again.")
-                    return
-
-            # For now, provide a mock response to avoid pipeline hanging
-            # TODO: Implement proper satellite analysis
-            await update.message.reply_text("🔧 Initializing satellite analysis system...")
-            
-            # Simulate processing time
-            await asyncio.sleep(2)
-            
-            # Mock vegetation change data (replace with real analysis later)
-            import random
-            veg_change = round(random.uniform(-15, 25), 2)  # Random change between -15% and +25%
-
-            await update.message.reply_text(
-                f"📍 Location: {lat}, {lon}\n🛰️ Vegetation Change: {veg_change}%"
-            )
-
-        # Run with timeout to prevent hanging
-        await asyncio.wait_for(process_request(), timeout=30)
+        # Case 1: Coordinates given
+        if "," in text:
+            try:
+                lat, lon = parse_coordinates(text)
+            except ValueError:
+                await update.message.reply_text("⚠️ Invalid coordinates format. Try: 21.17, 72.83")
+                return
+
+        # Case 2: Place name (cache -> local gazetteer -> Nominatim)
+        else:
+            try:
+                lat, lon = await analysis.geocode(text)
+            except asyncio.TimeoutError:
+                await update.message.reply_text("⏰ Geocoding timed out. Please try again.")
+                return
+            if lat is None or lon is None:
+                await update.message.reply_text("❌ Could not find that location. Try again.")
+                return
 
+        result = await analysis.analyze(lat, lon)
+        await update.message.reply_text(format_result(lat, lon, result))
+
+    except Busy:
+        await update.message.reply_text("🚦 The analysis queue is full right now. Please try again in a minute.")
     except asyncio.TimeoutError:
         await update.message.reply_text("⏰ Analysis timed out. Please try again with a different location.")
-    except Exception as e:
+    except Exception:
         logger.exception("Error handling user message")
         await update.message.reply_text("❌ Sorry, something went wrong while processing your request.")
 
+
+async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle a photo report. Compressed photos lose their EXIF data in
+    Telegram, so images sent as files (which keep it) are accepted too.
+    The image is downloaded into memory; nothing is written to disk.
+    """
+    message = update.message
+    if not message:
+        return
+    attachment = message.photo[-1] if message.photo else message.document  # largest photo size
+    if attachment is None:
+        return
+
+    user_id = update.effective_user.id if update.effective_user else message.chat_id
+    logger.info(f"[User Photo] {user_id}: {attachment.file_unique_id}")
+
+    try:
+        analysis.check_rate(user_id)
+    except RateLimited as e:
+        await message.reply_text(
+            f"🐢 You're sending requests too quickly. Please try again in {max(1, round(e.retry_after))}s."
+        )
+        return
+    if attachment.file_size and attachment.file_size > MAX_PHOTO_BYTES:
+        await message.reply_text("⚠️ That image is too large. Please send one under 20 MB.")
+        return
+
+    coordinates = None
+    if message.caption:
+        try:
+            coordinates = parse_coordinates(message.caption)
+        except ValueError:
+            pass
+
+    await message.reply_text("⏳ Analyzing your photo... This may take a few seconds.")
+
+    try:
+        photo_file = await attachment.get_file()
+        data = bytes(await photo_file.download_as_bytearray())
+        result = await analysis.classify_photo(data, coordinates)
+        if result["latitude"] is None:
+            await message.reply_text(format_photo_result(result))
+            return
+
+        # The classification and the photo's own vegetation indices don't wait for Earth Engine
+        await message.reply_text(
+            "\n".join(format_photo_classification(result) + ["🛰️ Checking satellite data for this location..."])
+        )
+        await analysis.add_satellite_check(result)
+        await message.reply_text(format_result(result["latitude"], result["longitude"], result))
+
+    except Busy:
+        await message.reply_text("🚦 The analysis queue is full right now. Please try again in a minute.")
+    except asyncio.TimeoutError:
+        await message.reply_text("⏰ Analysis timed out. Please try again later.")
+    except (UnidentifiedImageError, OSError):
+        await message.reply_text("⚠️ Could not read that image. Please send a JPEG or PNG photo.")
+    except Exception:
+        logger.exception("Error handling user photo")
+        await message.reply_text("❌ Sorry, something went wrong while processing your photo.")
+
+
 # --------------------------
 # Main
 # --------------------------
-def main():
+def build_application(token=BOT_TOKEN, webhook=False, base_url=None):
+    """
+    The bot with its handlers. Webhook applications have no updater;
+    bot_webhook feeds their update queue. `base_url` points the Bot API
+    client elsewhere (used by the local load test).
+    """
+    builder = Application.builder().token(token).concurrent_updates(
+        bot_webhook.UpdateProcessor(CONCURRENT_UPDATES)
+    )
+    if webhook:
+        builder = builder.updater(None)
+    if base_url:
+        builder = builder.base_url(base_url)
+    app = builder.build()
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("test", test))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    app.add_handler(MessageHandler(filters.PHOTO | filters.Document.IMAGE, handle_photo))
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mangrove Watch Telegram bot")
+    parser.add_argument("--webhook", metavar="URL", default=bot_webhook.WEBHOOK_URL or None,
+                        help="public HTTPS base URL; serve updates by webhook instead of polling "
+                             "(default: MANGROVE_BOT_WEBHOOK_URL)")
+    parser.add_argument("--listen", default=bot_webhook.WEBHOOK_LISTEN, help="webhook listener host:port")
+    args = parser.parse_args(argv)
+
     print("🤖 Starting Mangrove Watch Telegram Bot...")
-    
+
     if not BOT_TOKEN:
         logger.error("TELEGRAM_BOT_TOKEN is not set. Please set the environment variable and restart.")
         raise SystemExit(1)
 
-    print("✅ Bot token found")
-    print("🔧 Building application...")
-    app = Application.builder().token(BOT_TOKEN).build()
+    db.init_db()
+    app = build_application(webhook=bool(args.webhook))
 
-    print("📝 Adding command handlers...")
-    # Commands
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("test", lambda u, c: u.message.reply_text("✅ Bot is alive")))
-
-    print("📝 Adding message handlers...")
-    # Messages
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    try:
+        if args.webhook:
+            logger.info("✅ Telegram bot is running... (webhook)")
+            bot_webhook.run(app, url=args.webhook, listen=args.listen)
+        else:
+            logger.info("✅ Telegram bot is running... (polling)")
+            # run_polling first deletes any webhook registered by webhook mode
+            app.run_polling(close_loop=False)
+    except KeyboardInterrupt:
+        print("Bot stopped by user")
+    finally:
+        analysis.shutdown()
 
-    print("🚀 Starting bot polling...")
-    logger.info("✅ Telegram bot is running... (polling)")
-    app.run_polling(close_loop=False)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,139 @@
+"""
+Webhook serving for the Telegram bot.
+
+With polling the bot keeps a getUpdates long poll open and only sees a
+message when that poll returns; with a webhook Telegram POSTs each update
+as soon as it arrives. The listener here is a small Starlette app served
+by uvicorn on the bot's own event loop, so an update goes from the HTTP
+request straight onto the application's update queue without a thread
+hop. Handlers run concurrently, at most MANGROVE_BOT_CONCURRENT_UPDATES at
+a time (see bot_handler.build_application); when MAX_QUEUED updates are
+already accepted but unfinished the listener answers 503 and Telegram
+redelivers later.
+
+    python bot_handler.py --webhook https://bot.example.org --listen 0.0.0.0:8443
+
+Telegram only delivers to HTTPS on ports 443, 80, 88 or 8443; put the
+listener behind a TLS-terminating proxy.
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import secrets
+
+from telegram import Update
+from telegram.ext import SimpleUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = os.getenv("MANGROVE_BOT_WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("MANGROVE_BOT_WEBHOOK_LISTEN", "0.0.0.0:8443")
+WEBHOOK_PATH = os.getenv("MANGROVE_BOT_WEBHOOK_PATH", "/telegram")
+# Telegram echoes it in X-Telegram-Bot-Api-Secret-Token; random per run if unset
+WEBHOOK_SECRET = os.getenv("MANGROVE_BOT_WEBHOOK_SECRET", "")
+MAX_QUEUED = int(os.getenv("MANGROVE_BOT_WEBHOOK_MAX_QUEUED", "1000"))
+MAX_CONNECTIONS = 40  # parallel deliveries Telegram may open (1-100)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class UpdateProcessor(SimpleUpdateProcessor):
+    """Runs at most max_concurrent_updates handlers at once and counts the updates it holds"""
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self.pending = 0  # waiting for a slot or running
+
+    async def process_update(self, update, coroutine):
+        self.pending += 1
+        try:
+            await super().process_update(update, coroutine)
+        finally:
+            self.pending -= 1
+
+
+def backlog(application):
+    """Updates accepted but not yet handled"""
+    return application.update_queue.qsize() + getattr(application.update_processor, "pending", 0)
+
+
+def create_webhook_app(application, path=WEBHOOK_PATH, secret_token=None, max_queued=MAX_QUEUED):
+    """Starlette app that feeds POSTed updates into `application`'s update queue"""
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+
+    async def receive_update(request):
+        if secret_token and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret_token):
+            return Response(status_code=403)
+        if backlog(application) >= max_queued:
+            # Telegram retries non-2xx deliveries
+            return Response(status_code=503, headers={"Retry-After": "1"})
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception as e:
+            logger.warning(f"[WEBHOOK] Rejected malformed update: {e}")
+            return Response(status_code=400)
+        await application.update_queue.put(update)
+        return Response(status_code=200)
+
+    async def health(request):
+        return JSONResponse({"status": "ok", "backlog": backlog(application)})
+
+    return Starlette(routes=[
+        Route(path, receive_update, methods=["POST"]),
+        Route("/healthz", health, methods=["GET"]),
+    ])
+
+
+def parse_listen(listen):
+    host, _, port = listen.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+async def serve(application, listen=WEBHOOK_LISTEN, url=None, path=WEBHOOK_PATH, secret_token=None,
+                server_ready=None):
+    """
+    Run `application` behind a webhook listener until the server exits
+    (Ctrl+C / SIGTERM). When `url` is given the webhook is registered with
+    Telegram as url + path; otherwise updates are expected from elsewhere
+    (e.g. the local load test). `server_ready`, an optional callback, gets
+    the uvicorn server once it accepts connections.
+    """
+    import uvicorn
+
+    host, port = parse_listen(listen)
+    web = create_webhook_app(application, path, secret_token)
+    server = uvicorn.Server(uvicorn.Config(web, host=host, port=port, log_level="warning", lifespan="off"))
+
+    async with application:
+        if url:
+            await application.bot.set_webhook(
+                url=url.rstrip("/") + path,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=MAX_CONNECTIONS,
+            )
+            logger.info(f"[WEBHOOK] Registered {url.rstrip('/') + path}")
+        await application.start()
+        serving = asyncio.create_task(server.serve())
+        try:
+            if server_ready is not None:
+                while not server.started and not serving.done():
+                    await asyncio.sleep(0.01)
+                server_ready(server)
+            logger.info(f"[WEBHOOK] Listening on {host}:{port}{path}")
+            await serving
+        finally:
+            server.should_exit = True
+            await application.stop()
+
+
+def run(application, url=WEBHOOK_URL, listen=WEBHOOK_LISTEN, path=WEBHOOK_PATH, secret_token=None):
+    secret_token = secret_token or WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    try:
+        asyncio.run(serve(application, listen, url, path, secret_token))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,198 @@
+"""
+Bulk ingestion of photo archives for /run-pipeline/bulk.
+
+A drone survey arrives as one zip or tar stream instead of hundreds of
+separate uploads:
+  - tar archives (plain, .gz, .bz2, .xz) are read as a stream, one entry
+    at a time, straight from the request body
+  - zip archives keep their index at the end, so the body is spooled to a
+    temporary file (in memory up to ZIP_SPOOL_BYTES) and entries are read
+    from it one by one; nothing is extracted to disk either way
+  - images are decoded in memory and classified in batches of BATCH_SIZE,
+    satellite checks are shared by photos taken at the same spot, and each
+    batch is written to workflow_results in a single transaction
+
+ingest() yields one progress event per archive entry plus a final summary,
+which the endpoint streams back as newline-delimited JSON.
+"""
+
+import io
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from collections import namedtuple
+
+from PIL import Image
+
+import db
+from utils import get_gps_coordinates
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+BATCH_SIZE = int(os.getenv("MANGROVE_BULK_BATCH_SIZE", "16"))
+MAX_ENTRY_BYTES = int(os.getenv("MANGROVE_BULK_MAX_ENTRY_MB", "50")) * 1024 * 1024
+ZIP_SPOOL_BYTES = 64 * 1024 * 1024
+# CLIP works on 224px crops; JPEGs are DCT-downscaled to at least this size while decoding
+DECODE_SIZE = (448, 448)
+
+ZIP_MAGIC = b"PK\x03\x04"
+
+# data is None when the entry was skipped, or `failed` when it couldn't be read; `error` says why
+ArchiveEntry = namedtuple("ArchiveEntry", ["name", "data", "error", "failed"], defaults=(False,))
+
+# What a corrupt member raises while it is read or decompressed
+ENTRY_READ_ERRORS = (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError,
+                     RuntimeError, NotImplementedError)
+
+
+class ArchiveError(ValueError):
+    """The upload isn't a readable zip or tar archive"""
+
+
+class _PrefixedStream:
+    """Read-only file object that replays already-consumed bytes before the rest of a stream"""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size=-1):
+        if not self._prefix:
+            return self._stream.read(size)
+        if size is None or size < 0:
+            data, self._prefix = self._prefix + self._stream.read(), b""
+            return data
+        data, self._prefix = self._prefix[:size], self._prefix[size:]
+        if len(data) < size:
+            data += self._stream.read(size - len(data))
+        return data
+
+
+def _entry(name, size, read):
+    if not name.lower().endswith(IMAGE_EXTENSIONS):
+        return ArchiveEntry(name, None, "not an image")
+    if size > MAX_ENTRY_BYTES:
+        return ArchiveEntry(name, None, f"larger than {MAX_ENTRY_BYTES // (1024 * 1024)} MB")
+    try:
+        return ArchiveEntry(name, read(), None)
+    except ENTRY_READ_ERRORS as e:
+        # Bad CRC, truncated or undecompressable data, encrypted or unsupported members
+        logger.warning("[BULK] Could not read archive entry %s: %s", name, e)
+        return ArchiveEntry(name, None, f"Unreadable archive entry: {e}", failed=True)
+
+
+def _iter_tar(stream):
+    try:
+        with tarfile.open(fileobj=stream, mode="r|*") as archive:
+            for member in archive:
+                if member.isfile():
+                    yield _entry(member.name, member.size, lambda: archive.extractfile(member).read())
+    except (tarfile.TarError, zlib.error, EOFError, OSError) as e:
+        # A tar stream can't be resynchronised after corrupt data, unlike a zip's index
+        raise ArchiveError(f"Invalid tar archive: {e}")
+
+
+def _iter_zip(stream):
+    with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_BYTES) as spool:
+        shutil.copyfileobj(stream, spool)
+        try:
+            archive = zipfile.ZipFile(spool)
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f"Invalid zip archive: {e}")
+        with archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield _entry(info.filename, info.file_size, lambda: archive.read(info))
+
+
+def iter_archive(stream):
+    """Yield an ArchiveEntry per regular file in a zip or tar stream, in archive order"""
+    header = stream.read(len(ZIP_MAGIC))
+    if not header:
+        raise ArchiveError("Empty upload")
+    stream = _PrefixedStream(header, stream)
+    if header == ZIP_MAGIC:
+        yield from _iter_zip(stream)
+    else:
+        yield from _iter_tar(stream)
+
+
+def decode_image(data):
+    """(RGB image, EXIF coordinates or None) from encoded image bytes"""
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", DECODE_SIZE)  # no-op for formats without reduced decoding
+    image = image.convert("RGB")
+    return image, get_gps_coordinates(io.BytesIO(data))
+
+
+def _process_batch(pipeline, batch, user_id, satellite_cache):
+    """Classify, satellite-check and store one batch; returns its progress events"""
+    names = [name for name, _ in batch]
+    try:
+        results = pipeline.classify_images([decoded for _, decoded in batch])
+        pipeline.add_satellite_checks(results, satellite_cache)
+        report_ids = db.save_results(user_id, results) if user_id else [None] * len(results)
+    except Exception as e:
+        logger.exception("[BULK] Batch of %d images failed", len(batch))
+        return [{"event": "file", "file": name, "status": "error", "message": str(e)} for name in names]
+
+    return [
+        {"event": "file", "file": name, "status": "success", "report_id": report_id, "result": result}
+        for name, result, report_id in zip(names, results, report_ids)
+    ]
+
+
+def ingest(pipeline, entries, user_id=None, batch_size=BATCH_SIZE):
+    """
+    Run archive entries through the pipeline in batches. Yields a progress
+    event per entry ({"event": "file", "status": "success" | "error" |
+    "skipped", ...}) as soon as its batch finishes, then a "done" summary.
+    """
+    counts = {"success": 0, "error": 0, "skipped": 0}
+    satellite_cache = {}
+    batch = []
+
+    def emit(events):
+        for event in events:
+            counts[event["status"]] += 1
+        return events
+
+    try:
+        for entry in entries:
+            if entry.data is None:
+                status = "error" if entry.failed else "skipped"
+                yield from emit([{"event": "file", "file": entry.name, "status": status, "message": entry.error}])
+                continue
+            try:
+                decoded = decode_image(entry.data)
+            except Exception as e:
+                yield from emit([{"event": "file", "file": entry.name, "status": "error", "message": f"Unreadable image: {e}"}])
+                continue
+            batch.append((entry.name, decoded))
+            if len(batch) >= batch_size:
+                yield from emit(_process_batch(pipeline, batch, user_id, satellite_cache))
+                batch = []
+    except ArchiveError as e:
+        yield {"event": "error", "status": "error", "message": str(e)}
+    except Exception as e:
+        # Still finish the stream with the entries done so far and a summary
+        logger.exception("[BULK] Reading the archive failed")
+        yield {"event": "error", "status": "error", "message": f"Archive read failed: {e}"}
+
+    if batch:
+        yield from emit(_process_batch(pipeline, batch, user_id, satellite_cache))
+
+    logger.info("[BULK] Ingest finished: %s", counts)
+    yield {
+        "event": "done",
+        "status": "success",
+        "processed": counts["success"],
+        "failed": counts["error"],
+        "skipped": counts["skipped"],
+        "satellite_checks": len(satellite_cache),
+    }
@@ -0,0 +1,1439 @@
+"""
+Shared SQLite data access for the backend.
+
+All database work goes through this module instead of ad-hoc
+sqlite3.connect() calls:
+  - connections are pooled and reused; a thread holds one connection for
+    the duration of a `connection()` / `transaction()` block, and nested
+    blocks on the same thread share it
+  - every connection runs in WAL mode with tuned pragmas, so readers never
+    block the writer and writers wait on a busy timeout instead of failing
+  - SQL lives in module constants so sqlite3's per-connection statement
+    cache reuses the prepared statements
+  - schema changes are versioned migrations tracked in PRAGMA user_version
+"""
+
+import ast
+import base64
+import contextlib
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.getenv("MANGROVE_DB_PATH", os.path.join(BASE_DIR, "database", "mangrove_watch.db"))
+
+POOL_SIZE = int(os.getenv("MANGROVE_DB_POOL_SIZE", "16"))
+# A satellite result from a report this close and this recent is reused instead of recomputed
+SATELLITE_REUSE_RADIUS_M = float(os.getenv("MANGROVE_SATELLITE_REUSE_RADIUS_M", "500"))
+SATELLITE_REUSE_MAX_AGE_HOURS = float(os.getenv("MANGROVE_SATELLITE_REUSE_MAX_AGE_HOURS", "24"))
+BUSY_TIMEOUT_SECONDS = 10.0
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",  # durable across app crashes, fsync only at checkpoints
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",  # 16 MB page cache per connection
+    "PRAGMA mmap_size = 134217728",  # 128 MB memory-mapped reads
+)
+
+
+# --------------------------
+# Connection pool
+# --------------------------
+class ConnectionPool:
+    """A bounded LIFO pool of configured connections to one database file"""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            isolation_level=None,  # transactions are explicit, see transaction()
+            check_same_thread=False,  # a connection moves between threads via the pool
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            # Nested use on the same thread shares the outer connection
+            yield held
+            return
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._release(conn)
+
+    def _release(self, conn):
+        if self._closed:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            with self._lock:
+                if conn in self._all:
+                    self._all.remove(conn)
+            conn.close()
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            connections, self._all = self._all, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # still in use on another thread; closed when released
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                init_db(DB_PATH)
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def configure(path):
+    """Point the module at another database file (benchmarks, load tests, scripts)"""
+    global DB_PATH, _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+        DB_PATH = path
+
+
+def reset_after_fork():
+    """
+    Drop the pool inherited from a parent process without closing it; those
+    connections belong to the parent. The child opens its own on first use.
+    """
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+def connection():
+    """Context manager yielding a pooled connection in autocommit mode"""
+    return get_pool().connection()
+
+
+@contextlib.contextmanager
+def transaction():
+    """
+    Context manager yielding a pooled connection inside BEGIN IMMEDIATE.
+    The write lock is taken up front so concurrent writers queue on the
+    busy timeout instead of failing mid-transaction; commits on success,
+    rolls back on error.
+    """
+    with connection() as conn:
+        if conn.in_transaction:
+            # Already inside an outer transaction on this thread
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+
+# --------------------------
+# Schema migrations
+# --------------------------
+def _migration_base_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            total_reports INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS workflow_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            confidence REAL,
+            latitude REAL,
+            longitude REAL,
+            label TEXT,
+            satellite_vegetation_change TEXT,
+            status TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    # Older databases predate these columns
+    for table, column in (("users", "total_reports INTEGER DEFAULT 0"), ("workflow_results", "confidence REAL")):
+        try:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+
+
+def _migration_report_indexes(conn):
+    # Newest-first listing per user, optionally narrowed to one label; id breaks created_at ties
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_workflow_results_user_created
+        ON workflow_results (user_id, created_at DESC, id DESC)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_workflow_results_user_label_created
+        ON workflow_results (user_id, label, created_at DESC, id DESC)
+    """)
+
+
+def _migration_user_stats(conn):
+    # Per-user aggregates kept current by triggers, so stats reads never touch workflow_results.
+    # `version` bumps on every change and backs the /user/stats ETag.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_reports INTEGER NOT NULL DEFAULT 0,
+            confidence_sum REAL NOT NULL DEFAULT 0,
+            confidence_count INTEGER NOT NULL DEFAULT 0,
+            last_report_at TIMESTAMP,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_label_counts (
+            user_id INTEGER NOT NULL,
+            label TEXT NOT NULL,
+            report_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, label)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_insert
+        AFTER INSERT ON workflow_results
+        WHEN NEW.user_id IS NOT NULL
+        BEGIN
+            INSERT INTO user_stats
+                (user_id, total_reports, confidence_sum, confidence_count, last_report_at, version, updated_at)
+            VALUES
+                (NEW.user_id, 1, COALESCE(NEW.confidence, 0), NEW.confidence IS NOT NULL,
+                 NEW.created_at, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_reports = total_reports + 1,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                confidence_count = confidence_count + excluded.confidence_count,
+                last_report_at = MAX(COALESCE(last_report_at, ''), excluded.last_report_at),
+                version = version + 1,
+                updated_at = CURRENT_TIMESTAMP;
+
+            INSERT INTO user_label_counts (user_id, label, report_count)
+            SELECT NEW.user_id, NEW.label, 1 WHERE NEW.label IS NOT NULL
+            ON CONFLICT (user_id, label) DO UPDATE SET report_count = report_count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_delete
+        AFTER DELETE ON workflow_results
+        WHEN OLD.user_id IS NOT NULL
+        BEGIN
+            UPDATE user_stats SET
+                total_reports = total_reports - 1,
+                confidence_sum = confidence_sum - COALESCE(OLD.confidence, 0),
+                confidence_count = confidence_count - (OLD.confidence IS NOT NULL),
+                last_report_at = (SELECT MAX(created_at) FROM workflow_results WHERE user_id = OLD.user_id),
+                version = version + 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = OLD.user_id;
+
+            UPDATE user_label_counts SET report_count = report_count - 1
+            WHERE user_id = OLD.user_id AND label = OLD.label;
+        END
+    """)
+    # An update is a delete of the old row followed by an insert of the new one
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_update
+        AFTER UPDATE OF user_id, label, confidence, created_at ON workflow_results
+        BEGIN
+            UPDATE user_stats SET
+                total_reports = total_reports - 1,
+                confidence_sum = confidence_sum - COALESCE(OLD.confidence, 0),
+                confidence_count = confidence_count - (OLD.confidence IS NOT NULL),
+                version = version + 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = OLD.user_id;
+
+            UPDATE user_label_counts SET report_count = report_count - 1
+            WHERE user_id = OLD.user_id AND label = OLD.label;
+
+            INSERT INTO user_stats
+                (user_id, total_reports, confidence_sum, confidence_count, last_report_at, version, updated_at)
+            SELECT NEW.user_id, 1, COALESCE(NEW.confidence, 0), NEW.confidence IS NOT NULL,
+                   NEW.created_at, 1, CURRENT_TIMESTAMP
+            WHERE NEW.user_id IS NOT NULL
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_reports = total_reports + 1,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                confidence_count = confidence_count + excluded.confidence_count,
+                version = version + 1,
+                updated_at = CURRENT_TIMESTAMP;
+
+            INSERT INTO user_label_counts (user_id, label, report_count)
+            SELECT NEW.user_id, NEW.label, 1 WHERE NEW.user_id IS NOT NULL AND NEW.label IS NOT NULL
+            ON CONFLICT (user_id, label) DO UPDATE SET report_count = report_count + 1;
+
+            UPDATE user_stats
+            SET last_report_at = (SELECT MAX(created_at) FROM workflow_results WHERE user_id = user_stats.user_id)
+            WHERE user_id IN (OLD.user_id, NEW.user_id);
+        END
+    """)
+
+    # Backfill from existing rows
+    conn.execute("""
+        INSERT OR REPLACE INTO user_stats
+            (user_id, total_reports, confidence_sum, confidence_count, last_report_at, version, updated_at)
+        SELECT user_id, COUNT(*), COALESCE(SUM(confidence), 0), COUNT(confidence),
+               MAX(created_at), 1, CURRENT_TIMESTAMP
+        FROM workflow_results
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO user_label_counts (user_id, label, report_count)
+        SELECT user_id, label, COUNT(*)
+        FROM workflow_results
+        WHERE user_id IS NOT NULL AND label IS NOT NULL
+        GROUP BY user_id, label
+    """)
+
+
+def _migration_geocode_cache(conn):
+    # Normalized place-name query -> coordinates; NULL coordinates cache a miss (see geocoding.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            query TEXT PRIMARY KEY,
+            latitude REAL,
+            longitude REAL,
+            source TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    """)
+
+
+def _migration_report_rtree(conn):
+    # Spatial index over report coordinates, kept in sync by triggers. R-tree
+    # coordinates are 32-bit floats rounded outwards, so queries use it for
+    # candidates and re-check the exact REAL columns.
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS workflow_results_rtree
+        USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_workflow_results_rtree_insert
+        AFTER INSERT ON workflow_results
+        WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+        BEGIN
+            INSERT INTO workflow_results_rtree (id, min_lat, max_lat, min_lon, max_lon)
+            VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_workflow_results_rtree_delete
+        AFTER DELETE ON workflow_results
+        BEGIN
+            DELETE FROM workflow_results_rtree WHERE id = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_workflow_results_rtree_update
+        AFTER UPDATE OF id, latitude, longitude ON workflow_results
+        BEGIN
+            DELETE FROM workflow_results_rtree WHERE id = OLD.id;
+            INSERT INTO workflow_results_rtree (id, min_lat, max_lat, min_lon, max_lon)
+            SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+            WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+        END
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO workflow_results_rtree (id, min_lat, max_lat, min_lon, max_lon)
+        SELECT id, latitude, latitude, longitude, longitude
+        FROM workflow_results
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """)
+
+
+def _migration_watchlist(conn):
+    # Monitored sites, their evaluation history and alert-level transitions (see watchlist.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS watch_sites (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            radius_m REAL,
+            polygon TEXT,
+            check_interval_hours REAL NOT NULL DEFAULT 24,
+            active INTEGER NOT NULL DEFAULT 1,
+            scene_fingerprint TEXT,
+            latest_scene_at TIMESTAMP,
+            alert_level TEXT,
+            last_checked_at TIMESTAMP,
+            next_check_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_watch_sites_due
+        ON watch_sites(next_check_at) WHERE active = 1
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS watch_evaluations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            site_id INTEGER NOT NULL,
+            scene_fingerprint TEXT,
+            scene_count INTEGER,
+            latest_scene_at TIMESTAMP,
+            ndvi_before REAL,
+            ndvi_after REAL,
+            vegetation_change REAL,
+            alert_level TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (site_id) REFERENCES watch_sites (id)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_watch_evaluations_site
+        ON watch_evaluations(site_id, id)
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS watch_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            site_id INTEGER NOT NULL,
+            evaluation_id INTEGER NOT NULL,
+            previous_level TEXT,
+            alert_level TEXT NOT NULL,
+            vegetation_change REAL,
+            acknowledged INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (site_id) REFERENCES watch_sites (id),
+            FOREIGN KEY (evaluation_id) REFERENCES watch_evaluations (id)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_watch_alerts_site
+        ON watch_alerts(site_id, id)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_watch_alerts_open
+        ON watch_alerts(id) WHERE acknowledged = 0
+    """)
+
+
+def _migration_satellite_json(conn):
+    # Satellite results as a JSON document (see satellite_record) with generated
+    # columns for the fields dashboards filter on. ALTER TABLE can only add
+    # VIRTUAL generated columns; they are computed on read and indexable.
+    for column in (
+        "satellite_json TEXT",
+        "alert_level TEXT GENERATED ALWAYS AS (json_extract(satellite_json, '$.alert_level')) VIRTUAL",
+        "trend_direction TEXT GENERATED ALWAYS AS (json_extract(satellite_json, '$.trend_direction')) VIRTUAL",
+        "vegetation_change REAL GENERATED ALWAYS AS (json_extract(satellite_json, '$.vegetation_change')) VIRTUAL",
+    ):
+        try:
+            conn.execute(f"ALTER TABLE workflow_results ADD COLUMN {column}")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+
+    # Backfill from the text column in id order, a chunk at a time; indexes
+    # come after, built once instead of updated row by row
+    last_id = 0
+    while True:
+        rows = conn.execute("""
+            SELECT id, satellite_vegetation_change FROM workflow_results
+            WHERE id > ? AND satellite_vegetation_change IS NOT NULL AND satellite_json IS NULL
+            ORDER BY id LIMIT 5000
+        """, (last_id,)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for report_id, value in rows:
+            document = satellite_record(value)[1]
+            if document is not None:
+                updates.append((document, report_id))
+        conn.executemany("UPDATE workflow_results SET satellite_json = ? WHERE id = ?", updates)
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_workflow_results_alert_created
+        ON workflow_results (alert_level, created_at DESC, id DESC) WHERE alert_level IS NOT NULL
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_workflow_results_trend_created
+        ON workflow_results (trend_direction, created_at DESC, id DESC) WHERE trend_direction IS NOT NULL
+    """)
+
+
+def _rollup_upsert_sql(table, row):
+    # Adds one workflow_results row (NEW/OLD) to its cell/period/label bucket
+    return f"""
+            INSERT INTO {table}
+                (period, cell_lat, cell_lon, label, report_count,
+                 confidence_sum, confidence_count, vegetation_sum, vegetation_count)
+            SELECT {ROLLUP_PERIODS[table].format(row=row)}, {_rollup_cell_sql(row)}, COALESCE({row}.label, ''), 1,
+                   COALESCE({row}.confidence, 0), {row}.confidence IS NOT NULL,
+                   COALESCE({row}.vegetation_change, 0), {row}.vegetation_change IS NOT NULL
+            WHERE {row}.latitude IS NOT NULL AND {row}.longitude IS NOT NULL AND {row}.created_at IS NOT NULL
+            ON CONFLICT (period, cell_lat, cell_lon, label) DO UPDATE SET
+                report_count = report_count + 1,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                confidence_count = confidence_count + excluded.confidence_count,
+                vegetation_sum = vegetation_sum + excluded.vegetation_sum,
+                vegetation_count = vegetation_count + excluded.vegetation_count;"""
+
+
+def _rollup_remove_sql(table, row):
+    # Takes one workflow_results row back out of its bucket, dropping buckets that empty
+    key = (f"period = {ROLLUP_PERIODS[table].format(row=row)}"
+           f" AND (cell_lat, cell_lon) = ({_rollup_cell_sql(row)})"
+           f" AND label = COALESCE({row}.label, '')")
+    return f"""
+            UPDATE {table} SET
+                report_count = report_count - 1,
+                confidence_sum = confidence_sum - COALESCE({row}.confidence, 0),
+                confidence_count = confidence_count - ({row}.confidence IS NOT NULL),
+                vegetation_sum = vegetation_sum - COALESCE({row}.vegetation_change, 0),
+                vegetation_count = vegetation_count - ({row}.vegetation_change IS NOT NULL)
+            WHERE {key};
+            DELETE FROM {table} WHERE {key} AND report_count <= 0;"""
+
+
+def _migration_report_rollups(conn):
+    # Per grid cell, per day and per week aggregates of workflow_results (see
+    # get_rollups), kept current by triggers like user_stats. Sums and counts
+    # rather than means, so buckets add up across cells and periods.
+    for table in ROLLUP_PERIODS:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                period TEXT NOT NULL,
+                cell_lat INTEGER NOT NULL,
+                cell_lon INTEGER NOT NULL,
+                label TEXT NOT NULL,
+                report_count INTEGER NOT NULL DEFAULT 0,
+                confidence_sum REAL NOT NULL DEFAULT 0,
+                confidence_count INTEGER NOT NULL DEFAULT 0,
+                vegetation_sum REAL NOT NULL DEFAULT 0,
+                vegetation_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (period, cell_lat, cell_lon, label)
+            ) WITHOUT ROWID
+        """)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_report_rollups_insert
+        AFTER INSERT ON workflow_results
+        BEGIN{"".join(_rollup_upsert_sql(table, "NEW") for table in ROLLUP_PERIODS)}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_report_rollups_delete
+        AFTER DELETE ON workflow_results
+        BEGIN{"".join(_rollup_remove_sql(table, "OLD") for table in ROLLUP_PERIODS)}
+        END
+    """)
+    # An update is a delete of the old row followed by an insert of the new one
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_report_rollups_update
+        AFTER UPDATE OF latitude, longitude, label, confidence, satellite_json, created_at ON workflow_results
+        BEGIN{"".join(_rollup_remove_sql(table, "OLD") + _rollup_upsert_sql(table, "NEW")
+                      for table in ROLLUP_PERIODS)}
+        END
+    """)
+
+    # Backfill from existing rows
+    for table, period in ROLLUP_PERIODS.items():
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {table}
+                (period, cell_lat, cell_lon, label, report_count,
+                 confidence_sum, confidence_count, vegetation_sum, vegetation_count)
+            SELECT {period.format(row="workflow_results")}, {_rollup_cell_sql("workflow_results")},
+                   COALESCE(label, ''), COUNT(*), COALESCE(SUM(confidence), 0), COUNT(confidence),
+                   COALESCE(SUM(vegetation_change), 0), COUNT(vegetation_change)
+            FROM workflow_results
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL AND created_at IS NOT NULL
+            GROUP BY 1, 2, 3, 4
+        """)
+
+
+def _migration_report_clusters(conn):
+    # Map clusters: report counts and coordinate sums per zoom level, grid cell
+    # and label (see get_report_clusters), kept current by triggers. Cells halve
+    # at each zoom level, so every cell nests inside one cell of the level above.
+    # cluster_zooms lists the levels for the triggers to fan out over (trigger
+    # bodies can't use a recursive CTE).
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cluster_zooms (
+            zoom INTEGER PRIMARY KEY,
+            cell_degrees REAL NOT NULL
+        )
+    """)
+    conn.executemany(
+        "INSERT OR REPLACE INTO cluster_zooms (zoom, cell_degrees) VALUES (?, ?)",
+        [(zoom, cluster_cell_degrees(zoom)) for zoom in range(CLUSTER_MAX_ZOOM + 1)],
+    )
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS report_clusters (
+            zoom INTEGER NOT NULL,
+            cell_lat INTEGER NOT NULL,
+            cell_lon INTEGER NOT NULL,
+            label TEXT NOT NULL,
+            report_count INTEGER NOT NULL DEFAULT 0,
+            latitude_sum REAL NOT NULL DEFAULT 0,
+            longitude_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (zoom, cell_lat, cell_lon, label)
+        ) WITHOUT ROWID
+    """)
+
+    def upsert(row):
+        return f"""
+            INSERT INTO report_clusters (zoom, cell_lat, cell_lon, label, report_count, latitude_sum, longitude_sum)
+            SELECT z.zoom, CAST(({row}.latitude + 90) / z.cell_degrees AS INTEGER),
+                   CAST(({row}.longitude + 180) / z.cell_degrees AS INTEGER),
+                   COALESCE({row}.label, ''), 1, {row}.latitude, {row}.longitude
+            FROM cluster_zooms z
+            WHERE {row}.latitude IS NOT NULL AND {row}.longitude IS NOT NULL
+            ON CONFLICT (zoom, cell_lat, cell_lon, label) DO UPDATE SET
+                report_count = report_count + 1,
+                latitude_sum = latitude_sum + excluded.latitude_sum,
+                longitude_sum = longitude_sum + excluded.longitude_sum;"""
+
+    def remove(row):
+        key = f"""(zoom, cell_lat, cell_lon, label) IN (
+                SELECT z.zoom, CAST(({row}.latitude + 90) / z.cell_degrees AS INTEGER),
+                       CAST(({row}.longitude + 180) / z.cell_degrees AS INTEGER), COALESCE({row}.label, '')
+                FROM cluster_zooms z
+                WHERE {row}.latitude IS NOT NULL AND {row}.longitude IS NOT NULL)"""
+        return f"""
+            UPDATE report_clusters SET
+                report_count = report_count - 1,
+                latitude_sum = latitude_sum - {row}.latitude,
+                longitude_sum = longitude_sum - {row}.longitude
+            WHERE {key};
+            DELETE FROM report_clusters WHERE {key} AND report_count <= 0;"""
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_report_clusters_insert
+        AFTER INSERT ON workflow_results
+        BEGIN{upsert("NEW")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_report_clusters_delete
+        AFTER DELETE ON workflow_results
+        BEGIN{remove("OLD")}
+        END
+    """)
+    # An update is a delete of the old row followed by an insert of the new one
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_report_clusters_update
+        AFTER UPDATE OF latitude, longitude, label ON workflow_results
+        BEGIN{remove("OLD")}{upsert("NEW")}
+        END
+    """)
+
+    # Backfill the finest level from existing rows, then each coarser level from
+    # the one below it: a cell's parent is (cell_lat / 2, cell_lon / 2)
+    conn.execute("""
+        INSERT OR REPLACE INTO report_clusters
+            (zoom, cell_lat, cell_lon, label, report_count, latitude_sum, longitude_sum)
+        SELECT z.zoom, CAST((w.latitude + 90) / z.cell_degrees AS INTEGER),
+               CAST((w.longitude + 180) / z.cell_degrees AS INTEGER),
+               COALESCE(w.label, ''), COUNT(*), SUM(w.latitude), SUM(w.longitude)
+        FROM workflow_results w, cluster_zooms z
+        WHERE z.zoom = ? AND w.latitude IS NOT NULL AND w.longitude IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """, (CLUSTER_MAX_ZOOM,))
+    for zoom in range(CLUSTER_MAX_ZOOM - 1, -1, -1):
+        conn.execute("""
+            INSERT OR REPLACE INTO report_clusters
+                (zoom, cell_lat, cell_lon, label, report_count, latitude_sum, longitude_sum)
+            SELECT ?, cell_lat / 2, cell_lon / 2, label, SUM(report_count), SUM(latitude_sum), SUM(longitude_sum)
+            FROM report_clusters
+            WHERE zoom = ?
+            GROUP BY 2, 3, 4
+        """, (zoom, zoom + 1))
+
+
+# Applied in order; a database at user_version N has run the first N entries
+MIGRATIONS = [
+    _migration_base_schema,
+    _migration_report_indexes,
+    _migration_user_stats,
+    _migration_geocode_cache,
+    _migration_report_rtree,
+    _migration_watchlist,
+    _migration_satellite_json,
+    _migration_report_rollups,
+    _migration_report_clusters,
+]
+
+
+def init_db(path=None):
+    """Bring the database at `path` (default DB_PATH) up to the latest schema version"""
+    conn = sqlite3.connect(path or DB_PATH, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                logger.info("[DB] Applying migration %d: %s", number, migration.__name__)
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.close()
+
+
+# --------------------------
+# Satellite results
+# --------------------------
+# Fields of enhanced_vegetation_analysis results kept in satellite_json
+SATELLITE_FIELDS = (
+    "vegetation_change", "short_term_change", "medium_term_change", "long_term_change",
+    "trend_direction", "alert_level", "baseline_comparison", "analysis_type",
+)
+ALERT_LEVELS = ("normal", "warning", "critical")
+
+
+def vegetation_trend(change):
+    """Trend of a short-term NDVI change in percent (enhanced_vegetation_analysis thresholds)"""
+    if change > 10:
+        return "increasing"
+    if change < -10:
+        return "decreasing"
+    return "stable"
+
+
+def vegetation_alert_level(change):
+    """Alert level of a short-term NDVI change in percent (enhanced_vegetation_analysis thresholds)"""
+    if change < -30:
+        return "critical"
+    if change < -15 or change > 50:
+        return "warning"
+    return "normal"
+
+
+def _parse_satellite_text(value):
+    """Number or dict from a stored satellite_vegetation_change string; None if it is neither"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(value)  # str() of an enhanced result dict
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+
+def satellite_record(value):
+    """
+    (satellite_vegetation_change, satellite_json) column values for a
+    pipeline satellite result: a percentage, an enhanced result dict, None,
+    or a string holding any of those (stored rows). The text column keeps
+    the plain percentage; the JSON document carries every enhanced field,
+    with trend_direction and alert_level derived from the percentage for
+    simple results. Unparseable strings (error messages) are kept as text
+    with no document.
+    """
+    parsed = _parse_satellite_text(value) if isinstance(value, str) else value
+    if isinstance(parsed, bool) or parsed is None:
+        return value, None
+    if isinstance(parsed, (int, float)):
+        if not math.isfinite(parsed):
+            return value, None
+        # The common case, formatted directly (same document json.dumps would give)
+        change = float(parsed)
+        document = (
+            f'{{"vegetation_change":{change!r},"analysis_type":"simple",'
+            f'"trend_direction":"{vegetation_trend(change)}","alert_level":"{vegetation_alert_level(change)}"}}'
+        )
+        return (value if isinstance(value, str) else parsed), document
+    if isinstance(parsed, dict):
+        document = {key: parsed[key] for key in SATELLITE_FIELDS if parsed.get(key) is not None}
+        if "vegetation_change" not in document and "short_term_change" in document:
+            document["vegetation_change"] = document["short_term_change"]
+    else:
+        return value, None
+
+    change = document.get("vegetation_change")
+    if isinstance(change, (int, float)) and not isinstance(change, bool):
+        document.setdefault("trend_direction", vegetation_trend(change))
+        document.setdefault("alert_level", vegetation_alert_level(change))
+    else:
+        change = None
+    text = value if isinstance(value, str) else change
+    return text, json.dumps(document, separators=(",", ":"))
+
+
+# --------------------------
+# Users
+# --------------------------
+INSERT_USER_SQL = "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)"
+SELECT_USER_BY_USERNAME_SQL = "SELECT id, username, email, password_hash FROM users WHERE username = ?"
+INCREMENT_USER_REPORTS_SQL = "UPDATE users SET total_reports = total_reports + ? WHERE id = ?"
+
+
+def create_user(username, email, password_hash):
+    """Insert a user and return its id; raises sqlite3.IntegrityError on duplicates"""
+    with transaction() as conn:
+        return conn.execute(INSERT_USER_SQL, (username, email, password_hash)).lastrowid
+
+
+def get_user_by_username(username):
+    with connection() as conn:
+        return conn.execute(SELECT_USER_BY_USERNAME_SQL, (username,)).fetchone()
+
+
+# --------------------------
+# Workflow results
+# --------------------------
+INSERT_RESULT_SQL = """
+    INSERT INTO workflow_results
+    (user_id, confidence, latitude, longitude, label, satellite_vegetation_change, satellite_json, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SELECT_USER_STATS_SQL = """
+    SELECT total_reports, confidence_sum, confidence_count, last_report_at, version, updated_at
+    FROM user_stats WHERE user_id = ?
+"""
+SELECT_USER_STATS_VERSION_SQL = "SELECT version, updated_at FROM user_stats WHERE user_id = ?"
+SELECT_USER_LABEL_COUNTS_SQL = """
+    SELECT label, report_count FROM user_label_counts
+    WHERE user_id = ? AND report_count > 0
+    ORDER BY label
+"""
+REPORT_COLUMNS = """
+    id, confidence, latitude, longitude, label, satellite_vegetation_change,
+    alert_level, trend_direction, status, created_at
+"""
+
+
+def _result_row(user_id, result, status):
+    satellite_text, satellite_json = satellite_record(result.get("satellite_vegetation_change"))
+    reused_from = result.get("satellite_reused_from")
+    local_vegetation = result.get("local_vegetation")
+    if (reused_from and satellite_json is not None) or local_vegetation:
+        document = json.loads(satellite_json) if satellite_json is not None else {}
+        if reused_from and satellite_json is not None:
+            # Provenance of a value copied from a nearby report (see find_recent_satellite_result)
+            document["reused_from"] = reused_from["report_id"]
+            document["computed_at"] = reused_from["computed_at"]
+        if local_vegetation:
+            # The photo's own indices (vegetation_index.py), kept with or without a satellite value
+            document["local_vegetation"] = local_vegetation
+        satellite_json = json.dumps(document, separators=(",", ":"))
+    return (
+        user_id,
+        result.get("confidence"),
+        result.get("latitude"),
+        result.get("longitude"),
+        result.get("label"),
+        satellite_text,
+        satellite_json,
+        status,
+    )
+
+
+def save_result(user_id, result, status="completed"):
+    """
+    Store a pipeline result and bump the user's report counter in a single
+    transaction. Returns the new workflow_results id.
+    """
+    with transaction() as conn:
+        report_id = conn.execute(INSERT_RESULT_SQL, _result_row(user_id, result, status)).lastrowid
+        conn.execute(INCREMENT_USER_REPORTS_SQL, (1, user_id))
+    return report_id
+
+
+def save_results(user_id, results, status="completed"):
+    """
+    Bulk save_result: all rows and the report counter update commit in one
+    transaction. Returns the new ids in input order.
+    """
+    with transaction() as conn:
+        report_ids = [
+            conn.execute(INSERT_RESULT_SQL, _result_row(user_id, result, status)).lastrowid
+            for result in results
+        ]
+        if report_ids:
+            conn.execute(INCREMENT_USER_REPORTS_SQL, (len(report_ids), user_id))
+    return report_ids
+
+
+def get_user_stats_version(user_id):
+    """
+    (version, updated_at) of a user's materialized stats; (0, None) if the
+    user has no reports yet. Cheap enough to run before every stats read.
+    """
+    with connection() as conn:
+        row = conn.execute(SELECT_USER_STATS_VERSION_SQL, (user_id,)).fetchone()
+    return (row["version"], row["updated_at"]) if row else (0, None)
+
+
+def get_user_stats(user_id):
+    """Materialized per-user aggregates (maintained by the user_stats triggers)"""
+    with connection() as conn:
+        row = conn.execute(SELECT_USER_STATS_SQL, (user_id,)).fetchone()
+        label_rows = conn.execute(SELECT_USER_LABEL_COUNTS_SQL, (user_id,)).fetchall()
+
+    if row is None:
+        return {"total_reports": 0, "label_counts": {}, "mean_confidence": None, "last_report_at": None}
+    mean_confidence = None
+    if row["confidence_count"]:
+        mean_confidence = round(row["confidence_sum"] / row["confidence_count"], 4)
+    return {
+        "total_reports": row["total_reports"],
+        "label_counts": {r["label"]: r["report_count"] for r in label_rows},
+        "mean_confidence": mean_confidence,
+        "last_report_at": row["last_report_at"],
+    }
+
+
+def encode_cursor(created_at, report_id):
+    """Opaque keyset cursor for the row after which the next page starts"""
+    raw = json.dumps([created_at, report_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, report_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(report_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, report_id
+
+
+def get_user_reports(user_id, limit=50, cursor=None, label=None, status=None,
+                     since=None, until=None, min_confidence=None, max_confidence=None,
+                     alert_level=None, trend_direction=None):
+    """
+    Newest-first page of a user's reports using keyset pagination.
+    Returns (reports, next_cursor); next_cursor is None on the last page.
+    `since`/`until` are inclusive 'YYYY-MM-DD HH:MM:SS' bounds on created_at.
+    """
+    clauses = ["user_id = ?"]
+    params = [user_id]
+    if label is not None:
+        clauses.append("label = ?")
+        params.append(label)
+    if status is not None:
+        clauses.append("status = ?")
+        params.append(status)
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("created_at <= ?")
+        params.append(until)
+    if min_confidence is not None:
+        clauses.append("confidence >= ?")
+        params.append(min_confidence)
+    if max_confidence is not None:
+        clauses.append("confidence <= ?")
+        params.append(max_confidence)
+    if alert_level is not None:
+        clauses.append("alert_level = ?")
+        params.append(alert_level)
+    if trend_direction is not None:
+        clauses.append("trend_direction = ?")
+        params.append(trend_direction)
+    if cursor is not None:
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+
+    sql = (
+        f"SELECT {REPORT_COLUMNS} FROM workflow_results WHERE {' AND '.join(clauses)} "
+        "ORDER BY created_at DESC, id DESC LIMIT ?"
+    )
+    params.append(limit + 1)  # one extra row tells us whether another page exists
+
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    reports = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = reports[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return reports, next_cursor
+
+
+SELECT_ALERTS_SQL = f"""
+    SELECT {REPORT_COLUMNS} FROM workflow_results
+    WHERE alert_level = ? AND created_at >= ?
+"""
+
+
+def get_satellite_alerts(levels=("warning", "critical"), since=None, trend=None, limit=200):
+    """
+    Newest-first reports whose satellite result has one of `levels`, created
+    at or after `since`. Each level is one range scan of the
+    (alert_level, created_at) index; the per-level pages are merged here.
+    """
+    sql = SELECT_ALERTS_SQL
+    if trend is not None:
+        sql += " AND trend_direction = ?"
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+
+    reports = []
+    with connection() as conn:
+        for level in dict.fromkeys(levels):
+            params = [level, since or ""]
+            if trend is not None:
+                params.append(trend)
+            params.append(limit)
+            reports.extend(dict(row) for row in conn.execute(sql, params))
+    reports.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+    return reports[:limit]
+
+
+# --------------------------
+# Spatial queries
+# --------------------------
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE_LAT = 111320.0
+
+SELECT_REPORTS_IN_BOX_SQL = f"""
+    SELECT {", ".join("w." + c.strip() for c in REPORT_COLUMNS.split(","))}
+    FROM workflow_results_rtree r
+    JOIN workflow_results w ON w.id = r.id
+    WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+      AND w.latitude BETWEEN ? AND ? AND w.longitude BETWEEN ? AND ?
+"""
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _radius_box(lat, lon, radius_m):
+    """(min_lat, min_lon, max_lat, max_lon) enclosing a circle; clamped to valid ranges"""
+    dlat = radius_m / METERS_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(lat))
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+    return max(-90.0, lat - dlat), max(-180.0, lon - dlon), min(90.0, lat + dlat), min(180.0, lon + dlon)
+
+
+def _box_query(min_lat, min_lon, max_lat, max_lon, label=None, since=None):
+    sql = SELECT_REPORTS_IN_BOX_SQL
+    params = [min_lat, max_lat, min_lon, max_lon, min_lat, max_lat, min_lon, max_lon]
+    if label is not None:
+        sql += " AND w.label = ?"
+        params.append(label)
+    if since is not None:
+        sql += " AND w.created_at >= ?"
+        params.append(since)
+    return sql, params
+
+
+def get_reports_in_bbox(min_lat, min_lon, max_lat, max_lon, limit=500, label=None, since=None):
+    """Newest-first reports inside a lat/lon bounding box (inclusive), via the R-tree"""
+    sql, params = _box_query(min_lat, min_lon, max_lat, max_lon, label, since)
+    sql += " ORDER BY w.created_at DESC, w.id DESC LIMIT ?"
+    params.append(limit)
+    with connection() as conn:
+        return [dict(row) for row in conn.execute(sql, params)]
+
+
+def get_reports_nearby(lat, lon, radius_m, limit=100, label=None, since=None):
+    """
+    Reports within `radius_m` meters of (lat, lon), nearest first, each with
+    a `distance_m` field. The R-tree narrows candidates to the enclosing box.
+    """
+    sql, params = _box_query(*_radius_box(lat, lon, radius_m), label, since)
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    reports = []
+    for row in rows:
+        distance = haversine_m(lat, lon, row["latitude"], row["longitude"])
+        if distance <= radius_m:
+            report = dict(row)
+            report["distance_m"] = round(distance, 1)
+            reports.append(report)
+    reports.sort(key=lambda r: (r["distance_m"], -r["id"]))
+    return reports[:limit]
+
+
+def find_recent_satellite_result(lat, lon, radius_m=None, max_age_hours=None):
+    """
+    {"vegetation_change", "report_id", "computed_at"} of the nearest report
+    within `radius_m` meters whose satellite check ran in the last
+    `max_age_hours` hours, or None. Used by the pipeline to skip an Earth
+    Engine computation for a spot that was just analysed. Only reports that
+    computed their own value qualify: a reused value (satellite_json
+    reused_from) is never handed on again, so it can't drift hop by hop.
+    """
+    radius_m = SATELLITE_REUSE_RADIUS_M if radius_m is None else radius_m
+    max_age_hours = SATELLITE_REUSE_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+    if radius_m <= 0 or max_age_hours <= 0:
+        return None
+
+    sql, params = _box_query(*_radius_box(lat, lon, radius_m))
+    sql += (" AND w.created_at >= datetime('now', ?) AND w.satellite_vegetation_change IS NOT NULL"
+            " AND json_extract(w.satellite_json, '$.reused_from') IS NULL")
+    params.append(f"-{max_age_hours} hours")
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    best = None
+    for row in rows:
+        try:
+            value = float(row["satellite_vegetation_change"])
+        except (TypeError, ValueError):
+            continue  # error strings from failed checks aren't worth reusing
+        distance = haversine_m(lat, lon, row["latitude"], row["longitude"])
+        if distance <= radius_m and (best is None or distance < best[0]):
+            best = (distance, {"vegetation_change": value, "report_id": row["id"], "computed_at": row["created_at"]})
+    return best[1] if best else None
+
+
+# --------------------------
+# Analytics rollups
+# --------------------------
+# Grid cells are 1/ROLLUP_CELLS_PER_DEGREE degrees (0.01, about 1.1 km) on a
+# side, numbered from the south-west corner of the globe. Stored rollups are
+# keyed by cell number, so changing this needs the rollup tables rebuilt.
+ROLLUP_CELLS_PER_DEGREE = 100
+# Rollup table -> SQL for a row's period: its day, or the Monday of its week
+ROLLUP_PERIODS = {
+    "report_rollup_day": "date({row}.created_at)",
+    "report_rollup_week": "date({row}.created_at, 'weekday 0', '-6 days')",
+}
+ROLLUP_BUCKETS = ("day", "week")
+ROLLUP_MAX_DAILY_DAYS = 92  # longer ranges are answered from the weekly rollup by default
+ROLLUP_MAX_RANGE_DAYS = 3660  # about ten years; every period in the range is probed
+
+
+def _rollup_cell_sql(row):
+    # Truncation equals floor here: both offsets make the value non-negative
+    return (f"CAST(({row}.latitude + 90) * {ROLLUP_CELLS_PER_DEGREE} AS INTEGER), "
+            f"CAST(({row}.longitude + 180) * {ROLLUP_CELLS_PER_DEGREE} AS INTEGER)")
+
+
+def _rollup_cell(lat, lon):
+    # Same arithmetic as _rollup_cell_sql, so Python and SQLite agree on edges
+    return int((lat + 90) * ROLLUP_CELLS_PER_DEGREE), int((lon + 180) * ROLLUP_CELLS_PER_DEGREE)
+
+
+def _week_start(day):
+    # Monday of the week, matching the weekly rollup's period
+    parsed = date.fromisoformat(day)
+    return (parsed - timedelta(days=parsed.weekday())).isoformat()
+
+
+SELECT_ROLLUPS_SQL = """
+    SELECT {group}, label, SUM(report_count), SUM(confidence_sum), SUM(confidence_count),
+           SUM(vegetation_sum), SUM(vegetation_count)
+    FROM {table}
+    WHERE period IN (SELECT value FROM json_each(?))
+      AND cell_lat BETWEEN ? AND ? AND cell_lon BETWEEN ? AND ?{label_filter}
+    GROUP BY {group}, label
+    ORDER BY {group}
+"""
+
+
+def _rollup_summary(buckets):
+    """Fold [(label, count, confidence sum/count, vegetation sum/count)] into one summary"""
+    labels = {}
+    count = confidence_sum = confidence_count = vegetation_sum = vegetation_count = 0
+    for label, n, c_sum, c_count, v_sum, v_count in buckets:
+        label = label or "unlabelled"
+        labels[label] = labels.get(label, 0) + n
+        count += n
+        confidence_sum += c_sum
+        confidence_count += c_count
+        vegetation_sum += v_sum
+        vegetation_count += v_count
+    return {
+        "report_count": count,
+        "label_counts": labels,
+        "mean_confidence": round(confidence_sum / confidence_count, 4) if confidence_count else None,
+        "mean_vegetation_change": round(vegetation_sum / vegetation_count, 2) if vegetation_count else None,
+    }
+
+
+def get_rollups(min_lat=-90.0, min_lon=-180.0, max_lat=90.0, max_lon=180.0, since=None, until=None,
+                bucket=None, label=None, group_by="period"):
+    """
+    Report aggregates for a bounding box and date range ('YYYY-MM-DD',
+    inclusive; default the last 30 days), read from the day or week rollups
+    rather than workflow_results. Work depends on the cells and periods
+    covered, not on how many reports there are. The box snaps outwards to
+    whole grid cells and a weekly range to whole weeks.
+
+    bucket: "day" | "week" | None (day for ranges up to ROLLUP_MAX_DAILY_DAYS)
+    group_by: "period" for a time series, "cell" for per-cell totals (heatmaps)
+
+    Raises ValueError for ranges longer than ROLLUP_MAX_RANGE_DAYS.
+    """
+    until = until or datetime.now(timezone.utc).date().isoformat()
+    since = since or (date.fromisoformat(until) - timedelta(days=29)).isoformat()
+    if since > until:
+        raise ValueError("since must not be after until")
+    days = (date.fromisoformat(until) - date.fromisoformat(since)).days + 1
+    if days > ROLLUP_MAX_RANGE_DAYS:
+        raise ValueError(f"date range must not exceed {ROLLUP_MAX_RANGE_DAYS} days")
+    if bucket is None:
+        bucket = "day" if days <= ROLLUP_MAX_DAILY_DAYS else "week"
+    if bucket not in ROLLUP_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(ROLLUP_BUCKETS)}")
+    if group_by not in ("period", "cell"):
+        raise ValueError("group_by must be period or cell")
+    if bucket == "week":
+        since, until = _week_start(since), _week_start(until)
+
+    cell_min_lat, cell_min_lon = _rollup_cell(min_lat, min_lon)
+    cell_max_lat, cell_max_lon = _rollup_cell(max_lat, max_lon)
+    sql = SELECT_ROLLUPS_SQL.format(
+        table=f"report_rollup_{bucket}",
+        group="period" if group_by == "period" else "cell_lat, cell_lon",
+        label_filter=" AND label = ?" if label is not None else "",
+    )
+    # Each period is an equality probe into the (period, cell_lat, ...) key with a
+    # cell_lat range inside it, instead of one scan over every cell in the range
+    step = timedelta(days=7 if bucket == "week" else 1)
+    first, last = date.fromisoformat(since), date.fromisoformat(until)
+    periods = [(first + step * i).isoformat() for i in range((last - first) // step + 1)]
+    params = [json.dumps(periods), cell_min_lat, cell_max_lat, cell_min_lon, cell_max_lon]
+    if label is not None:
+        params.append(label)
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    groups = {}
+    for row in rows:
+        key = row[:1] if group_by == "period" else row[:2]
+        groups.setdefault(key, []).append(row[len(key):])
+    size = 1 / ROLLUP_CELLS_PER_DEGREE
+    result = {
+        "bucket": bucket,
+        "since": since,
+        "until": until,
+        "cell_degrees": size,
+        "totals": _rollup_summary(bucket_row for buckets in groups.values() for bucket_row in buckets),
+    }
+    if group_by == "period":
+        result["series"] = [{"period": key[0], **_rollup_summary(buckets)} for key, buckets in groups.items()]
+    else:
+        result["cells"] = [
+            {
+                "min_lat": round(key[0] * size - 90, 6),
+                "min_lon": round(key[1] * size - 180, 6),
+                "max_lat": round((key[0] + 1) * size - 90, 6),
+                "max_lon": round((key[1] + 1) * size - 180, 6),
+                **_rollup_summary(buckets),
+            }
+            for key, buckets in groups.items()
+        ]
+    return result
+
+
+# --------------------------
+# Map clusters
+# --------------------------
+# A cluster cell is about CLUSTER_CELL_PX screen pixels wide at its zoom level
+# (256 px web map tiles), measured in degrees on both axes. Past
+# CLUSTER_MAX_ZOOM a viewport is small enough to show reports individually.
+CLUSTER_MAX_ZOOM = 14
+CLUSTER_CELL_PX = 64
+CLUSTER_MAX_POINTS = 1000
+
+
+def cluster_cell_degrees(zoom):
+    """Cell size at a zoom level; halves per level (90 degrees at zoom 0)"""
+    return 360.0 * CLUSTER_CELL_PX / (256 * 2 ** zoom)
+
+
+SELECT_CLUSTERS_SQL = """
+    SELECT cell_lat, cell_lon, label, report_count, latitude_sum, longitude_sum
+    FROM report_clusters
+    WHERE zoom = ? AND cell_lat BETWEEN ? AND ? AND cell_lon BETWEEN ? AND ?
+"""
+
+
+def get_report_clusters(min_lat, min_lon, max_lat, max_lon, zoom, label=None):
+    """
+    Clusters of reports in a map viewport at a zoom level, each with its
+    centroid, report count, label histogram and cell bounds. Read from
+    report_clusters, so the size and cost depend on the viewport, not on how
+    many reports there are. Past CLUSTER_MAX_ZOOM, reports come back one per
+    cluster (with id), at most CLUSTER_MAX_POINTS.
+    """
+    if zoom > CLUSTER_MAX_ZOOM:
+        reports = get_reports_in_bbox(min_lat, min_lon, max_lat, max_lon, limit=CLUSTER_MAX_POINTS, label=label)
+        return {
+            "zoom": zoom,
+            "cell_degrees": None,
+            "clusters": [
+                {"id": r["id"], "latitude": r["latitude"], "longitude": r["longitude"], "count": 1,
+                 "label_counts": {r["label"] or "unlabelled": 1}}
+                for r in reports
+            ],
+        }
+
+    size = cluster_cell_degrees(zoom)
+    bounds = (
+        int((min_lat + 90) / size), int((max_lat + 90) / size),
+        int((min_lon + 180) / size), int((max_lon + 180) / size),
+    )
+    sql, params = SELECT_CLUSTERS_SQL, [zoom, *bounds]
+    if label is not None:
+        sql += " AND label = ?"
+        params.append(label)
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    cells = {}
+    for cell_lat, cell_lon, row_label, count, lat_sum, lon_sum in rows:
+        cell = cells.setdefault((cell_lat, cell_lon), {"count": 0, "lat_sum": 0.0, "lon_sum": 0.0, "labels": {}})
+        cell["count"] += count
+        cell["lat_sum"] += lat_sum
+        cell["lon_sum"] += lon_sum
+        cell["labels"][row_label or "unlabelled"] = count
+    return {
+        "zoom": zoom,
+        "cell_degrees": size,
+        "clusters": [
+            {
+                "latitude": round(cell["lat_sum"] / cell["count"], 6),
+                "longitude": round(cell["lon_sum"] / cell["count"], 6),
+                "count": cell["count"],
+                "label_counts": cell["labels"],
+                "bounds": [
+                    round(cell_lat * size - 90, 6), round(cell_lon * size - 180, 6),
+                    round((cell_lat + 1) * size - 90, 6), round((cell_lon + 1) * size - 180, 6),
+                ],
+            }
+            for (cell_lat, cell_lon), cell in cells.items()
+        ],
+    }
+
+
+# --------------------------
+# Export
+# --------------------------
+EXPORT_COLUMNS = (
+    "id", "user_id", "label", "confidence", "latitude", "longitude",
+    "satellite_vegetation_change", "alert_level", "trend_direction", "status", "created_at",
+)
+EXPORT_CHUNK_SIZE = 5000
+
+
+def iter_reports(user_id=None, label=None, since=None, until=None, bbox=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of up to `chunk_size` report tuples (EXPORT_COLUMNS order)
+    matching the filters. Rows are streamed with fetchmany in index order,
+    never sorted or collected, so memory stays flat however many match.
+    `bbox` is (min_lat, min_lon, max_lat, max_lon) and uses the R-tree.
+    """
+    columns = ", ".join(f"w.{c}" for c in EXPORT_COLUMNS)
+    clauses = []
+    params = []
+    if bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        sql = (
+            f"SELECT {columns} FROM workflow_results_rtree r JOIN workflow_results w ON w.id = r.id"
+        )
+        clauses.append("r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?")
+        clauses.append("w.latitude BETWEEN ? AND ? AND w.longitude BETWEEN ? AND ?")
+        params.extend([min_lat, max_lat, min_lon, max_lon, min_lat, max_lat, min_lon, max_lon])
+    else:
+        sql = f"SELECT {columns} FROM workflow_results w"
+    if user_id is not None:
+        clauses.append("w.user_id = ?")
+        params.append(user_id)
+    if label is not None:
+        clauses.append("w.label = ?")
+        params.append(label)
+    if since is not None:
+        clauses.append("w.created_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("w.created_at <= ?")
+        params.append(until)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None  # plain tuples, no per-row Row objects
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
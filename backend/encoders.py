@@ -0,0 +1,191 @@
+"""
+Zero-shot image/text encoder backbones for AIValidator.
+
+Every backbone turns images and label prompts into unit-norm embeddings
+and knows how to scale their cosine similarities into logits, so the
+validator classifies the same way whichever model is behind it:
+
+    clip       transformers CLIPModel checkpoints (the original default)
+    siglip     transformers SigLIP / SigLIP 2 checkpoints
+    open_clip  open_clip models, including the mobile-class MobileCLIP
+
+A backbone is chosen by registry name ("mobileclip-s1"), by
+"<kind>:<model id>" ("open_clip:ViT-B-32:laion2b_s34b_b79k"), or by a bare
+Hugging Face CLIP id / local checkpoint directory, which keeps existing
+model_name values working. benchmarks/bench_backbones.py compares them.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Encoder:
+    """A loaded zero-shot backbone; subclasses implement load/_encode_images/_encode_text"""
+
+    kind = None
+
+    def __init__(self, model_id):
+        self.model_id = model_id
+        self.model = None
+
+    def load(self):
+        """Load weights once; returns self"""
+        if self.model is None:
+            self._load()
+            # Frozen (no grad buffers, never written): forked workers share the weights copy-on-write
+            self.model.eval()
+            self.model.requires_grad_(False)
+        return self
+
+    def _load(self):
+        raise NotImplementedError
+
+    def encode_images(self, images):
+        """Unit-norm embeddings (N, D) for a list of RGB PIL images"""
+        import torch
+
+        with torch.no_grad():
+            features = self._encode_images(images)
+        return features / features.norm(dim=-1, keepdim=True)
+
+    def encode_text(self, texts):
+        """Unit-norm embeddings (N, D) for a list of prompts"""
+        import torch
+
+        with torch.no_grad():
+            features = self._encode_text(texts)
+        return features / features.norm(dim=-1, keepdim=True)
+
+    def logits(self, image_features, text_features):
+        """Per-label logits, as the model's own forward pass would compute them"""
+        return self.model.logit_scale.exp() * image_features @ text_features.T
+
+    def parameter_count(self):
+        return sum(p.numel() for p in self.model.parameters())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.model_id!r})"
+
+
+class ClipEncoder(Encoder):
+    """transformers CLIPModel + CLIPProcessor"""
+
+    kind = "clip"
+
+    def __init__(self, model_id, model=None, processor=None):
+        super().__init__(model_id)
+        self.processor = processor
+        if model is not None:
+            self.model = model
+
+    def _load(self):
+        from transformers import CLIPModel, CLIPProcessor
+
+        self.model = CLIPModel.from_pretrained(self.model_id)
+        self.processor = CLIPProcessor.from_pretrained(self.model_id)
+
+    def _encode_images(self, images):
+        inputs = self.processor(images=images, return_tensors="pt")
+        return self.model.get_image_features(pixel_values=inputs["pixel_values"])
+
+    def _encode_text(self, texts):
+        inputs = self.processor(text=texts, return_tensors="pt", padding=True)
+        return self.model.get_text_features(**inputs)
+
+
+class SiglipEncoder(ClipEncoder):
+    """transformers SigLIP / SigLIP 2 (sigmoid-trained, so logits carry a bias)"""
+
+    kind = "siglip"
+
+    def _load(self):
+        from transformers import AutoModel, AutoProcessor
+
+        self.model = AutoModel.from_pretrained(self.model_id)
+        self.processor = AutoProcessor.from_pretrained(self.model_id)
+
+    def _encode_text(self, texts):
+        # SigLIP's text tower was trained on max_length padding only
+        inputs = self.processor(text=texts, return_tensors="pt", padding="max_length")
+        return self.model.get_text_features(input_ids=inputs["input_ids"])
+
+    def logits(self, image_features, text_features):
+        return super().logits(image_features, text_features) + self.model.logit_bias
+
+
+class OpenClipEncoder(Encoder):
+    """open_clip models, model_id "<architecture>:<pretrained tag>" (e.g. "MobileCLIP-S1:datacompdr")"""
+
+    kind = "open_clip"
+
+    def _load(self):
+        import open_clip
+
+        architecture, _, pretrained = self.model_id.partition(":")
+        model, _, self.preprocess = open_clip.create_model_and_transforms(architecture, pretrained=pretrained or None)
+        self.tokenizer = open_clip.get_tokenizer(architecture)
+        if architecture.startswith("MobileCLIP"):
+            # Fold MobileOne's train-time branches into single convolutions
+            try:
+                from timm.utils import reparameterize_model
+
+                model = reparameterize_model(model.eval())
+            except ImportError:
+                logger.warning("[ENCODER] timm.utils.reparameterize_model unavailable; MobileCLIP runs unfused")
+        self.model = model
+
+    def _encode_images(self, images):
+        import torch
+
+        return self.model.encode_image(torch.stack([self.preprocess(image) for image in images]))
+
+    def _encode_text(self, texts):
+        return self.model.encode_text(self.tokenizer(texts))
+
+    def logits(self, image_features, text_features):
+        logits = super().logits(image_features, text_features)
+        bias = getattr(self.model, "logit_bias", None)  # SigLIP models served through open_clip
+        return logits + bias if bias is not None else logits
+
+
+ENCODER_KINDS = {cls.kind: cls for cls in (ClipEncoder, SiglipEncoder, OpenClipEncoder)}
+
+# Named backbones, smallest last. Any other checkpoint works through "<kind>:<model id>".
+BACKBONES = {
+    "clip-vit-b32": ("clip", "openai/clip-vit-base-patch32"),
+    "clip-vit-b16": ("clip", "openai/clip-vit-base-patch16"),
+    "clip-vit-l14": ("clip", "openai/clip-vit-large-patch14"),
+    "siglip-b16": ("siglip", "google/siglip-base-patch16-224"),
+    "siglip2-b16": ("siglip", "google/siglip2-base-patch16-224"),
+    "openclip-vit-b32": ("open_clip", "ViT-B-32:laion2b_s34b_b79k"),
+    "mobileclip-b": ("open_clip", "MobileCLIP-B:datacompdr"),
+    "mobileclip-s2": ("open_clip", "MobileCLIP-S2:datacompdr"),
+    "mobileclip-s1": ("open_clip", "MobileCLIP-S1:datacompdr"),
+}
+
+
+def register_backbone(name, kind, model_id):
+    if kind not in ENCODER_KINDS:
+        raise ValueError(f"Unknown encoder kind {kind!r} (expected one of {', '.join(ENCODER_KINDS)})")
+    BACKBONES[name] = (kind, model_id)
+
+
+def resolve(spec):
+    """(kind, model id) for a registry name, "<kind>:<model id>" or a bare CLIP checkpoint"""
+    if spec in BACKBONES:
+        return BACKBONES[spec]
+    kind, sep, model_id = spec.partition(":")
+    if sep and kind in ENCODER_KINDS:
+        return kind, model_id
+    return "clip", spec
+
+
+def get_encoder(spec):
+    """An unloaded Encoder for `spec` (see resolve)"""
+    kind, model_id = resolve(spec)
+    return ENCODER_KINDS[kind](model_id)
+
+
+def load_encoder(spec):
+    return get_encoder(spec).load()
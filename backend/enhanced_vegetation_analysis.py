@@ -176,9 +176,9 @@ def get_vegetation_change_enhanced(latitude, longitude):
         
         # Create comprehensive result
         enhanced_result = {
-            "short_term_change": results.get("short_term", {}).get("change_percent"),
-            "medium_term_change": results.get("medium_term", {}).get("change_percent"),
-            "long_term_change": results.get("long_term", {}).get("change_percent"),
+            "short_term_change": (results.get("short_term") or {}).get("change_percent"),
+            "medium_term_change": (results.get("medium_term") or {}).get("change_percent"),
+            "long_term_change": (results.get("long_term") or {}).get("change_percent"),
             "trend_direction": trend_direction,
             "alert_level": alert_level,
             "baseline_comparison": baseline_comparison,
@@ -186,7 +186,7 @@ def get_vegetation_change_enhanced(latitude, longitude):
         }
         
         # For backward compatibility, include the simple change value
-        enhanced_result["vegetation_change"] = results.get("short_term", {}).get("change_percent")
+        enhanced_result["vegetation_change"] = (results.get("short_term") or {}).get("change_percent")
         
         return enhanced_result
         
@@ -0,0 +1,327 @@
+"""
+Header-only EXIF GPS scanner for large photo folders.
+
+utils.get_gps_coordinates opens every photo with PIL and decodes its whole
+EXIF block; to triage tens of thousands of photos by location only the
+GPS tags are needed. read_gps() reads the JPEG markers at the start of the
+file up to the APP1/EXIF segment (usually the first few KB), parses the
+TIFF structure in it directly and stops there. PNGs, which rarely carry
+EXIF, go through utils.get_gps_coordinates.
+
+build_index() scans a folder with a thread pool and keeps a compact
+tab-separated index (relative path, lat, lon, timestamp, size, mtime) in
+MANGROVE_EXIF_INDEX_DIR, one file per folder and recursion mode, so
+rescans only read new or changed files and the photo folders themselves
+are never written to (they may be read-only):
+
+    python exif_scan.py index Data --workers 16
+    python exif_scan.py groups Data
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_DIR = os.getenv("MANGROVE_EXIF_INDEX_DIR", os.path.join(BASE_DIR, "database", "exif_index"))
+INDEX_HEADER = "# path\tlat\tlon\ttimestamp\tsize\tmtime_ns\n"
+SCAN_WORKERS = int(os.getenv("MANGROVE_EXIF_SCAN_WORKERS", "8"))
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+JPEG_EXTENSIONS = (".jpg", ".jpeg")
+
+# Bytes per component of each TIFF field type
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+_TAG_DATETIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_TAG_GPS_IFD = 0x8825
+_TAG_DATETIME_ORIGINAL = 0x9003
+_GPS_LAT_REF, _GPS_LAT, _GPS_LON_REF, _GPS_LON = 1, 2, 3, 4
+_GPS_TIME, _GPS_DATE = 7, 29
+
+
+# --------------------------
+# JPEG / TIFF parsing
+# --------------------------
+def _read_app1(f):
+    """TIFF payload of the first APP1 Exif segment, or None"""
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        kind = marker[1]
+        if kind == 0xFF:  # fill byte
+            f.seek(-3, 1)
+            continue
+        if kind in (0xD9, 0xDA):  # end of image / start of scan: no EXIF
+            return None
+        length = struct.unpack(">H", marker[2:])[0] - 2
+        if length < 0:  # the length counts its own two bytes
+            return None
+        if kind == 0xE1:
+            segment = f.read(length)
+            if segment[:6] == b"Exif\x00\x00":
+                return segment[6:]
+        else:
+            f.seek(length, 1)
+
+
+class _Tiff:
+    def __init__(self, data):
+        if data[:2] == b"II":
+            self.order = "<"
+        elif data[:2] == b"MM":
+            self.order = ">"
+        else:
+            raise ValueError("not a TIFF header")
+        self.data = data
+
+    def unpack(self, fmt, offset):
+        return struct.unpack_from(self.order + fmt, self.data, offset)
+
+    def first_ifd(self):
+        return self.unpack("I", 4)[0]
+
+    def entries(self, offset):
+        """{tag: (type, count, value offset)} of the IFD at `offset`"""
+        (count,) = self.unpack("H", offset)
+        entries = {}
+        for i in range(count):
+            tag, kind, n = self.unpack("HHI", offset + 2 + 12 * i)
+            value_offset = offset + 2 + 12 * i + 8
+            if _TYPE_SIZES.get(kind, 1) * n > 4:
+                (value_offset,) = self.unpack("I", value_offset)
+            entries[tag] = (kind, n, value_offset)
+        return entries
+
+    def value(self, entry):
+        kind, n, offset = entry
+        if offset + _TYPE_SIZES.get(kind, 1) * n > len(self.data):
+            raise ValueError("value past the end of the EXIF data")
+        if kind == 2:  # ASCII
+            return self.data[offset:offset + n].split(b"\x00", 1)[0].decode("ascii", "replace")
+        if kind in (3, 4):  # SHORT, LONG
+            values = self.unpack(("H" if kind == 3 else "I") * n, offset)
+            return values[0] if n == 1 else values
+        if kind in (5, 10):  # RATIONAL, SRATIONAL
+            raw = self.unpack(("II" if kind == 5 else "ii") * n, offset)
+            return tuple(num / den if den else None for num, den in zip(raw[::2], raw[1::2]))
+        return None
+
+
+def _degrees(dms, ref):
+    if not dms or len(dms) != 3 or None in dms:
+        return None
+    value = dms[0] + dms[1] / 60.0 + dms[2] / 3600.0
+    return -value if ref in ("S", "W") else value
+
+
+def _timestamp(text):
+    """'YYYY:MM:DD HH:MM:SS' -> 'YYYY-MM-DD HH:MM:SS' (the database's format), else None"""
+    text = (text or "").strip()
+    if len(text) < 19 or text.startswith("0000"):
+        return None
+    return text[:4] + "-" + text[5:7] + "-" + text[8:10] + text[10:19]
+
+
+def parse_exif(data):
+    """(lat, lon, timestamp) from a TIFF/EXIF payload; parts that are missing are None"""
+    tiff = _Tiff(data)
+    ifd0 = tiff.entries(tiff.first_ifd())
+
+    lat = lon = timestamp = None
+    if _TAG_GPS_IFD in ifd0:
+        gps = tiff.entries(tiff.value(ifd0[_TAG_GPS_IFD]))
+        if _GPS_LAT in gps and _GPS_LON in gps:
+            lat = _degrees(tiff.value(gps[_GPS_LAT]), tiff.value(gps[_GPS_LAT_REF]) if _GPS_LAT_REF in gps else "N")
+            lon = _degrees(tiff.value(gps[_GPS_LON]), tiff.value(gps[_GPS_LON_REF]) if _GPS_LON_REF in gps else "E")
+            if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                lat = lon = None
+        if _GPS_DATE in gps and _GPS_TIME in gps:
+            hms = tiff.value(gps[_GPS_TIME])
+            if hms and None not in hms:
+                timestamp = _timestamp(f"{tiff.value(gps[_GPS_DATE])} {int(hms[0]):02d}:{int(hms[1]):02d}:{int(hms[2]):02d}")
+
+    # Camera clock when the photo was taken beats the GPS fix time
+    if _TAG_EXIF_IFD in ifd0:
+        exif = tiff.entries(tiff.value(ifd0[_TAG_EXIF_IFD]))
+        if _TAG_DATETIME_ORIGINAL in exif:
+            timestamp = _timestamp(tiff.value(exif[_TAG_DATETIME_ORIGINAL])) or timestamp
+    if timestamp is None and _TAG_DATETIME in ifd0:
+        timestamp = _timestamp(tiff.value(ifd0[_TAG_DATETIME]))
+
+    if lat is not None:
+        lat, lon = round(lat, 6), round(lon, 6)
+    return lat, lon, timestamp
+
+
+def read_gps(path):
+    """(lat, lon, timestamp) of a photo; (None, None, None) when it has no readable EXIF"""
+    if not path.lower().endswith(JPEG_EXTENSIONS):
+        from utils import get_gps_coordinates
+
+        coords = get_gps_coordinates(path)
+        return (coords[0], coords[1], None) if coords else (None, None, None)
+    try:
+        with open(path, "rb") as f:
+            data = _read_app1(f)
+        if data is None:
+            return None, None, None
+        return parse_exif(data)
+    except (OSError, ValueError, struct.error, TypeError) as e:
+        logger.debug(f"[EXIF] Unreadable EXIF in {path}: {e}")
+        return None, None, None
+
+
+# --------------------------
+# Folder index
+# --------------------------
+def iter_images(folder, recursive=True):
+    """Relative paths of the images under `folder`, sorted"""
+    found = []
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        with os.scandir(os.path.join(folder, relative)) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                path = os.path.join(relative, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    found.append(path)
+    return sorted(found)
+
+
+def load_index(index_path):
+    """{relative path: (lat, lon, timestamp, size, mtime_ns)}; empty when the index is missing"""
+    index = {}
+    if not os.path.exists(index_path):
+        return index
+    with open(index_path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            try:
+                path, lat, lon, timestamp, size, mtime_ns = line.rstrip("\n").split("\t")
+                index[path] = (
+                    float(lat) if lat else None,
+                    float(lon) if lon else None,
+                    timestamp or None,
+                    int(size),
+                    int(mtime_ns),
+                )
+            except ValueError:
+                continue  # damaged line: the file is rescanned
+    return index
+
+
+def index_path_for(folder, recursive=True):
+    """Default index file of a folder: keyed by its real path and the recursion mode"""
+    key = hashlib.sha1(os.path.realpath(folder).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INDEX_DIR, f"{key}{'-r' if recursive else ''}.tsv")
+
+
+def write_index(index_path, index):
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(INDEX_HEADER)
+        for path in sorted(index):
+            lat, lon, timestamp, size, mtime_ns = index[path]
+            f.write(
+                f"{path}\t{'' if lat is None else lat}\t{'' if lon is None else lon}\t"
+                f"{timestamp or ''}\t{size}\t{mtime_ns}\n"
+            )
+    os.replace(tmp_path, index_path)
+
+
+def build_index(folder, index_path=None, recursive=True, workers=SCAN_WORKERS):
+    """
+    {relative path: (lat, lon, timestamp)} for every image under `folder`.
+    Files whose size and mtime match the saved index are not read again;
+    the refreshed index is written back (skipped when that fails).
+    """
+    index_path = index_path or index_path_for(folder, recursive)
+    saved = load_index(index_path)
+    started = time.perf_counter()
+
+    index, stale = {}, []
+    for path in iter_images(folder, recursive):
+        try:
+            st = os.stat(os.path.join(folder, path))
+        except OSError:
+            continue
+        entry = saved.get(path)
+        if entry is not None and entry[3] == st.st_size and entry[4] == st.st_mtime_ns:
+            index[path] = entry
+        else:
+            stale.append((path, st.st_size, st.st_mtime_ns))
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(stale)))) as executor:
+            found = executor.map(lambda item: read_gps(os.path.join(folder, item[0])), stale, chunksize=64)
+            for (path, size, mtime_ns), (lat, lon, timestamp) in zip(stale, found):
+                index[path] = (lat, lon, timestamp, size, mtime_ns)
+
+    if stale or len(index) != len(saved):
+        try:
+            write_index(index_path, index)
+        except OSError as e:
+            logger.warning(f"[EXIF] Could not write index {index_path}: {e}")
+
+    logger.info(
+        f"[EXIF] Indexed {len(index)} images in {folder} ({len(stale)} read) "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return {path: entry[:3] for path, entry in index.items()}
+
+
+def group_by_location(index, decimals=4):
+    """
+    {(lat, lon) rounded to `decimals`: [paths]} with photos without GPS
+    under the key None. Groups and their paths are sorted.
+    """
+    groups = {}
+    for path, (lat, lon, _) in index.items():
+        key = None if lat is None or lon is None else (round(lat, decimals), round(lon, decimals))
+        groups.setdefault(key, []).append(path)
+    located = sorted(k for k in groups if k is not None)
+    ordered = {key: sorted(groups[key]) for key in located}
+    if None in groups:
+        ordered[None] = sorted(groups[None])
+    return ordered
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Header-only EXIF GPS scanner")
+    parser.add_argument("command", choices=("index", "groups"), help="refresh the index / list photos per location")
+    parser.add_argument("folder")
+    parser.add_argument("--index", help=f"index file (default: one per folder in {INDEX_DIR})")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    parser.add_argument("--no-recursive", action="store_true")
+    parser.add_argument("--decimals", type=int, default=4, help="grouping precision (4 = ~11 m)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        print(f"[ERROR] Folder not found: {args.folder}")
+        sys.exit(1)
+    index = build_index(args.folder, args.index, recursive=not args.no_recursive, workers=args.workers)
+    located = sum(1 for lat, _, _ in index.values() if lat is not None)
+    print(f"[INFO] {len(index)} images, {located} with GPS")
+    if args.command == "groups":
+        for key, paths in group_by_location(index, args.decimals).items():
+            label = "no GPS" if key is None else f"{key[0]}, {key[1]}"
+            print(f"{label:<24} {len(paths):>6}  {paths[0]}{' ...' if len(paths) > 1 else ''}")
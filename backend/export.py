@@ -0,0 +1,245 @@
+"""
+Streaming export of workflow_results for research dumps.
+
+Rows are read with db.iter_reports in fetchmany chunks, and each chunk is
+encoded and handed on before the next one is read, so exports of millions
+of rows run in constant memory:
+  - csv      a header plus one line per report
+  - geojson  a FeatureCollection with one Point feature per report
+  - parquet  one zstd-compressed row group per chunk (needs pyarrow)
+CSV and GeoJSON can also be gzip-compressed on the fly.
+
+Used by GET /reports/export and from the command line:
+    python export.py --output reports.csv.gz --since 2025-01-01
+    python export.py --output reports.parquet --bbox 21.0,72.5,21.5,73.0 --label "mangrove cutting"
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import zlib
+
+import db
+
+FORMATS = {
+    # format: (content type, file extension)
+    "csv": ("text/csv", ".csv"),
+    "geojson": ("application/geo+json", ".geojson"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+GZIP_LEVEL = 6
+
+
+class ExportError(ValueError):
+    """Unsupported format/option combination"""
+
+
+# --------------------------
+# Encoders (chunks of row tuples -> bytes)
+# --------------------------
+def _encode_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(db.EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # header only: nothing matched
+
+
+def _encode_geojson(chunks):
+    columns = db.EXPORT_COLUMNS
+    yield b'{"type":"FeatureCollection","features":['
+    separator = ""
+    for rows in chunks:
+        features = []
+        for row in rows:
+            properties = dict(zip(columns, row))
+            lat = properties.pop("latitude")
+            lon = properties.pop("longitude")
+            geometry = {"type": "Point", "coordinates": [lon, lat]} if lat is not None and lon is not None else None
+            features.append(json.dumps(
+                {"type": "Feature", "id": properties["id"], "geometry": geometry, "properties": properties},
+                separators=(",", ":"),
+            ))
+        yield (separator + ",".join(features)).encode()
+        separator = ","
+    yield b"]}"
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every row group"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("label", pa.string()),
+        ("confidence", pa.float64()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("satellite_vegetation_change", pa.string()),
+        ("alert_level", pa.string()),
+        ("trend_direction", pa.string()),
+        ("status", pa.string()),
+        ("created_at", pa.timestamp("s")),
+    ])
+
+
+def _encode_parquet(chunks):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in chunks:
+            arrays = []
+            for field, values in zip(schema, zip(*rows)):
+                if pa.types.is_timestamp(field.type):
+                    # created_at is stored as 'YYYY-MM-DD HH:MM:SS' text
+                    arrays.append(pc.strptime(pa.array(values, pa.string()), format="%Y-%m-%d %H:%M:%S",
+                                              unit="s", error_is_null=True))
+                else:
+                    arrays.append(pa.array(values, type=field.type, from_pandas=False))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+ENCODERS = {"csv": _encode_csv, "geojson": _encode_geojson, "parquet": _encode_parquet}
+
+
+# --------------------------
+# Public API
+# --------------------------
+def export(fmt, filters=None, compress=False, chunk_size=db.EXPORT_CHUNK_SIZE):
+    """
+    Iterator of encoded bytes for the reports matching `filters` (keyword
+    arguments of db.iter_reports). Options are validated here, before any
+    row is read, so callers can still report errors up front.
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"Unsupported format: {fmt}. Use one of: {', '.join(FORMATS)}")
+    if fmt == "parquet":
+        if compress:
+            raise ExportError("Parquet output is already compressed; drop gzip")
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    chunks = db.iter_reports(chunk_size=chunk_size, **(filters or {}))
+    encoded = ENCODERS[fmt](chunks)
+    return _gzip(encoded) if compress else encoded
+
+
+def filename(fmt, compress=False, stem="mangrove_reports"):
+    return stem + FORMATS[fmt][1] + (".gz" if compress else "")
+
+
+def write_file(path, fmt, filters=None, compress=False, chunk_size=db.EXPORT_CHUNK_SIZE):
+    """Export to `path` (written to a temporary file, then moved into place); returns bytes written"""
+    chunks = export(fmt, filters, compress, chunk_size)
+    tmp_path = path + ".tmp"
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
+
+
+def _format_from_path(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    for fmt, (_, extension) in FORMATS.items():
+        if name.endswith(extension):
+            return fmt
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export workflow_results to CSV, GeoJSON or Parquet")
+    parser.add_argument("--output", required=True, help="output file; format and gzip are inferred from the extension")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="override the format inferred from --output")
+    parser.add_argument("--gzip", action="store_true", help="gzip CSV/GeoJSON output (implied by a .gz extension)")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--label")
+    parser.add_argument("--since", help="YYYY-MM-DD[ HH:MM:SS], inclusive")
+    parser.add_argument("--until", help="YYYY-MM-DD[ HH:MM:SS], inclusive")
+    parser.add_argument("--bbox", help="MIN_LAT,MIN_LON,MAX_LAT,MAX_LON")
+    parser.add_argument("--chunk-size", type=int, default=db.EXPORT_CHUNK_SIZE)
+    parser.add_argument("--db", help="database path (default: MANGROVE_DB_PATH)")
+    args = parser.parse_args()
+
+    fmt = args.format or _format_from_path(args.output)
+    if fmt is None:
+        parser.error("cannot infer the format from --output; pass --format")
+    compress = args.gzip or args.output.endswith(".gz")
+
+    filters = {"user_id": args.user_id, "label": args.label, "since": args.since, "until": args.until}
+    if args.until and len(args.until) == 10:
+        filters["until"] = args.until + " 23:59:59"  # whole day
+    if args.bbox:
+        try:
+            filters["bbox"] = tuple(float(v) for v in args.bbox.split(","))
+        except ValueError:
+            parser.error("--bbox must be four numbers")
+        if len(filters["bbox"]) != 4:
+            parser.error("--bbox must be MIN_LAT,MIN_LON,MAX_LAT,MAX_LON")
+    if args.db:
+        db.configure(args.db)
+
+    try:
+        size = write_file(args.output, fmt, filters, compress, args.chunk_size)
+    except ExportError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    print(f"[INFO] Exported reports to {args.output} ({size / 1024 / 1024:.1f} MB)")
@@ -1,6 +1,12 @@
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import phash
 from ai_validator import AIValidator
 from satelite_check import get_vegetation_change
+from utils import get_gps_coordinates
 
 # --------------------------
 # Logging
@@ -8,69 +14,310 @@ from satelite_check import get_vegetation_change
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Batched satellite checks: results rounded to the same ~11 m cell share one lookup
+SATELLITE_DEDUP_DECIMALS = 4
+SATELLITE_WORKERS = int(os.getenv("MANGROVE_SATELLITE_WORKERS", "4"))
+# run_on_folder: images per forward pass, and the JPEG draft size (CLIP works on 224px crops)
+FOLDER_BATCH_SIZE = 16
+FOLDER_DECODE_SIZE = (448, 448)
+# Local NDVI / RGB vegetation indices from the photo itself (see vegetation_index.py)
+LOCAL_VEGETATION = os.getenv("MANGROVE_LOCAL_VEGETATION", "1") != "0"
+# Near-duplicate photos (bursts, re-encoded copies) reuse an earlier photo's
+# classification instead of another model pass; see phash.py. Opt-in: the index
+# is shared by every user of the process, so a match can hand one user's label
+# to another's photo, and hashing changes how every upload is decoded
+PHASH_DEDUP = os.getenv("MANGROVE_PHASH_DEDUP", "0") == "1"
+PHASH_MAX_DISTANCE = int(os.getenv("MANGROVE_PHASH_MAX_DISTANCE", "6"))  # differing bits of 64
+PHASH_RADIUS_M = os.getenv("MANGROVE_PHASH_RADIUS_M", "")  # also require GPS this close; empty = off
+PHASH_INDEX_SIZE = int(os.getenv("MANGROVE_PHASH_INDEX_SIZE", "10000"))
+# Fields of a classification result that a near-duplicate reuses
+REUSED_FIELDS = ("label", "confidence", "classifier_stage", "local_vegetation")
+
 class Pipeline:
-    def __init__(self):
+    def __init__(self, satellite_lookup=None):
+        """
+        satellite_lookup: optional callable (lat, lon) -> {"vegetation_change",
+        "report_id", "computed_at"} or None, consulted before Earth Engine so a
+        recent result for a nearby spot can be reused (see
+        db.find_recent_satellite_result). Results that reuse one carry
+        satellite_reused_from: {"report_id", "computed_at"}.
+        """
         self.validator = AIValidator()
+        self.satellite_lookup = satellite_lookup
+        self.duplicates = None
+        if PHASH_DEDUP:
+            self.duplicates = phash.HashIndex(
+                max_distance=PHASH_MAX_DISTANCE,
+                radius_m=float(PHASH_RADIUS_M) if PHASH_RADIUS_M else None,
+                max_entries=PHASH_INDEX_SIZE,
+            )
+        self._dedup_stats = {"images": 0, "reused": 0}
+        self._stats_lock = threading.Lock()
+
+    def vegetation_change(self, lat, lon):
+        """Satellite vegetation change for a point, reusing a recent nearby result when available"""
+        return self._satellite_result(lat, lon)[0]
+
+    def _satellite_result(self, lat, lon):
+        """(vegetation change, {"report_id", "computed_at"} of the reused result or None)"""
+        if self.satellite_lookup is not None:
+            try:
+                reused = self.satellite_lookup(lat, lon)
+            except Exception as e:
+                logger.warning(f"[PIPELINE] Satellite result lookup failed, computing instead: {e}")
+                reused = None
+            if reused is not None:
+                logger.info(
+                    f"[PIPELINE] Reusing satellite result of report {reused['report_id']} "
+                    f"for ({lat}, {lon}): {reused['vegetation_change']}"
+                )
+                return reused["vegetation_change"], {"report_id": reused["report_id"], "computed_at": reused["computed_at"]}
+        return get_vegetation_change(lat, lon), None
 
     def run_on_folder(self, data_folder="Data"):
         """
-        Run full pipeline on a folder of images
+        Run full pipeline on a folder of images. Photos are first grouped by
+        location from a header-only EXIF scan (see exif_scan.py), then
+        classified in batches group by group; each location gets one
+        satellite check.
         """
+        results = self.classify_folder(data_folder)
+        self.add_satellite_checks(list(results.values()))
+        logger.info("[PIPELINE] Full folder processing completed ✅")
+        return results
+
+    def classify_folder(self, data_folder="Data"):
+        """
+        CPU-bound half of run_on_folder: classification and EXIF coordinates
+        for every image, keyed by filename (satellite checks not yet run)
+        """
+        import exif_scan
+
         logger.info(f"[PIPELINE] Starting full pipeline on folder {data_folder}...")
-        results = self.validator.analyze_folder(data_folder)
-
-        for filename, info in results.items():
-            coords = info.get("coordinates")
-            if coords and coords[0] is not None and coords[1] is not None:
-                lat, lon = coords
-                logger.info(f"[PIPELINE] Running satellite check for {filename} at ({lat}, {lon})...")
-                veg_change = get_vegetation_change(lat, lon)
-                info["satellite_vegetation_change"] = veg_change
-            else:
-                info["satellite_vegetation_change"] = None
+        index = exif_scan.build_index(data_folder, recursive=False)
+        groups = exif_scan.group_by_location(index, SATELLITE_DEDUP_DECIMALS)
+        logger.info(
+            f"[PIPELINE] {len(index)} images at {len(groups) - (None in groups)} locations, "
+            f"{len(groups.get(None, []))} without GPS"
+        )
 
-        logger.info("[PIPELINE] Full folder processing completed ✅")
+        results = {}
+        paths = [path for group in groups.values() for path in group]
+        for start in range(0, len(paths), FOLDER_BATCH_SIZE):
+            batch = paths[start:start + FOLDER_BATCH_SIZE]
+            images = [self._load_image(os.path.join(data_folder, path)) for path in batch]
+            coords = [[index[path][0], index[path][1]] if index[path][0] is not None else None for path in batch]
+            for path, prediction, point in zip(batch, self._classify_deduplicated(images, coords), coords):
+                result = dict(prediction, coordinates=point, taken_at=index[path][2])
+                self._apply_exif_coordinates(result)
+                results[path] = result
         return results
 
+    @staticmethod
+    def _load_image(path):
+        with Image.open(path) as image:
+            image.draft("RGB", FOLDER_DECODE_SIZE)  # DCT-downscaled JPEG decode
+            return image.convert("RGB")
+
     def run_on_image(self, image_path):
         """
         Run full pipeline on a single image
         """
         logger.info(f"[PIPELINE] Running pipeline on single image: {image_path}")
+        result = self.classify_image(image_path)
+        return self.add_satellite_check(result)
+
+    def classify_image(self, image_path):
+        """
+        CPU-bound half of run_on_image: classification and EXIF coordinates
+        """
+        if self.duplicates is not None:
+            # One reduced decode serves the hash and, unless it is a near-duplicate, the model
+            coords = get_gps_coordinates(image_path)
+            (prediction,) = self._classify_deduplicated([self._load_image(image_path)], [coords], [image_path])
+            result = dict(prediction, coordinates=coords)
+            self._apply_exif_coordinates(result)
+            return result
+
         result = self.validator.analyze_photo(image_path)
+        self._apply_exif_coordinates(result)
+        self._add_local_vegetation(result, image_path)
+        return result
 
+    def classify_images(self, images):
+        """
+        Batched classify_image for in-memory photos. `images` is a list of
+        (PIL image, EXIF coordinates or None); results keep the input order.
+        """
+        coords = [coords for _, coords in images]
+        predictions = self._classify_deduplicated([image for image, _ in images], coords)
+        results = []
+        for prediction, point in zip(predictions, coords):
+            result = dict(prediction, coordinates=point)
+            self._apply_exif_coordinates(result)
+            results.append(result)
+        return results
+
+    def _classify_deduplicated(self, images, coords, vegetation_sources=None):
+        """
+        Classification and local vegetation for PIL images (coords: EXIF
+        [lat, lon] or None each). A near-duplicate of an earlier photo, or of
+        one earlier in the same batch, reuses that photo's result and gets a
+        "duplicate_of" entry ({"phash", "distance"}); only the rest go through
+        the model, in one batch. `vegetation_sources` overrides what local
+        vegetation is computed from (e.g. the file path, for NIR bands).
+        """
+        vegetation_sources = vegetation_sources or images
+        points = [(point[0], point[1]) if point else (None, None) for point in coords]
+        hashes = [None] * len(images)
+        outputs = [None] * len(images)
+        fresh, aliases = [], {}
+        batch_index = None
+        if self.duplicates is not None:
+            batch_index = phash.HashIndex(self.duplicates.max_distance, self.duplicates.radius_m, len(images))
+            for i, image in enumerate(images):
+                try:
+                    hashes[i] = phash.compute(image)
+                except Exception as e:
+                    logger.warning(f"[PIPELINE] Perceptual hash failed: {e}")
+                    fresh.append(i)
+                    continue
+                match = self.duplicates.find(hashes[i], *points[i])
+                if match is not None:
+                    value, matched_hash, distance = match
+                    outputs[i] = dict(value, duplicate_of={"phash": phash.to_hex(matched_hash), "distance": distance})
+                    continue
+                match = batch_index.find(hashes[i], *points[i])
+                if match is not None:
+                    aliases[i] = match
+                else:
+                    batch_index.add(hashes[i], i, *points[i])
+                    fresh.append(i)
+        else:
+            fresh = list(range(len(images)))
+
+        for i, prediction in zip(fresh, self.validator.analyze_images([images[i] for i in fresh])):
+            self._add_local_vegetation(prediction, vegetation_sources[i])
+            outputs[i] = prediction
+            if hashes[i] is not None:
+                self.duplicates.add(hashes[i], {k: prediction[k] for k in REUSED_FIELDS if k in prediction}, *points[i])
+        for i, (j, matched_hash, distance) in aliases.items():
+            value = {k: outputs[j][k] for k in REUSED_FIELDS if k in outputs[j]}
+            outputs[i] = dict(value, duplicate_of={"phash": phash.to_hex(matched_hash), "distance": distance})
+
+        if self.duplicates is not None:
+            reused = len(images) - len(fresh)
+            with self._stats_lock:
+                self._dedup_stats["images"] += len(images)
+                self._dedup_stats["reused"] += reused
+            if reused:
+                logger.info(f"[PIPELINE] {reused} of {len(images)} photos were near-duplicates, results reused")
+        return outputs
+
+    def dedup_stats(self):
+        """Near-duplicate reuse so far: photos seen, classifications skipped and the skip rate"""
+        with self._stats_lock:
+            stats = dict(self._dedup_stats)
+        images = stats["images"]
+        return {
+            "enabled": self.duplicates is not None,
+            "max_distance": self.duplicates.max_distance if self.duplicates is not None else None,
+            "radius_m": self.duplicates.radius_m if self.duplicates is not None else None,
+            "indexed": len(self.duplicates) if self.duplicates is not None else 0,
+            "images": images,
+            "reused": stats["reused"],
+            "skip_rate": round(stats["reused"] / images, 4) if images else None,
+        }
+
+    @staticmethod
+    def _add_local_vegetation(result, image):
+        """
+        Vegetation indices of the photo itself (a path or PIL image), available
+        before (or without) the satellite check
+        """
+        result["local_vegetation"] = None
+        if not LOCAL_VEGETATION:
+            return
+        import vegetation_index
+
+        try:
+            if isinstance(image, str):
+                result["local_vegetation"] = vegetation_index.analyze_path(image)
+            else:
+                result["local_vegetation"] = vegetation_index.compute(image)
+        except Exception as e:
+            logger.warning(f"[PIPELINE] Local vegetation index failed: {e}")
+
+    def _apply_exif_coordinates(self, result):
         coords = result.get("coordinates")
         if coords and isinstance(coords, list) and len(coords) >= 2 and coords[0] is not None and coords[1] is not None:
-            lat, lon = coords[0], coords[1]
-            
             # Add latitude and longitude to result for database compatibility
-            result["latitude"] = lat
-            result["longitude"] = lon
+            result["latitude"] = coords[0]
+            result["longitude"] = coords[1]
             result["coordinate_source"] = "exif"  # Mark as EXIF-extracted
-            
-            logger.info(f"[PIPELINE] Running satellite check for ({lat}, {lon})...")
-            veg_change = get_vegetation_change(lat, lon)
-            result["satellite_vegetation_change"] = veg_change
-            logger.info(f"[PIPELINE] Vegetation change calculated: {veg_change}")
         else:
             logger.warning(f"[PIPELINE] No valid coordinates found in image. Coordinates: {coords}")
             result["latitude"] = None
             result["longitude"] = None
-            result["satellite_vegetation_change"] = None
             result["coordinate_source"] = "none"  # Mark as no coordinates available
 
+        result["satellite_vegetation_change"] = None
+        result["satellite_reused_from"] = None
+
+    def add_satellite_check(self, result):
+        """
+        I/O-bound half of run_on_image: satellite check for the result's coordinates
+        """
+        lat, lon = result.get("latitude"), result.get("longitude")
+        if lat is not None and lon is not None:
+            logger.info(f"[PIPELINE] Running satellite check for ({lat}, {lon})...")
+            veg_change, result["satellite_reused_from"] = self._satellite_result(lat, lon)
+            result["satellite_vegetation_change"] = veg_change
+            logger.info(f"[PIPELINE] Vegetation change calculated: {veg_change}")
         return result
 
+    def add_satellite_checks(self, results, cache=None):
+        """
+        add_satellite_check for a batch of results. Each distinct location is
+        looked up once, with lookups for different locations run concurrently.
+        `cache` (a dict) can be shared across batches of the same upload.
+        """
+        cache = {} if cache is None else cache
+        pending = {}
+        for result in results:
+            lat, lon = result.get("latitude"), result.get("longitude")
+            if lat is None or lon is None:
+                continue
+            key = (round(lat, SATELLITE_DEDUP_DECIMALS), round(lon, SATELLITE_DEDUP_DECIMALS))
+            if key not in cache:
+                pending.setdefault(key, (lat, lon))
+
+        if pending:
+            logger.info(f"[PIPELINE] Running {len(pending)} satellite checks for {len(results)} results...")
+            with ThreadPoolExecutor(max_workers=min(SATELLITE_WORKERS, len(pending))) as executor:
+                values = executor.map(lambda point: self._satellite_result(*point), pending.values())
+                cache.update(zip(pending.keys(), values))
+
+        for result in results:
+            lat, lon = result.get("latitude"), result.get("longitude")
+            if lat is not None and lon is not None:
+                key = (round(lat, SATELLITE_DEDUP_DECIMALS), round(lon, SATELLITE_DEDUP_DECIMALS))
+                result["satellite_vegetation_change"], result["satellite_reused_from"] = cache[key]
+        return results
+
     def run_on_coordinates(self, lat, lon):
         """
         Run pipeline only on coordinates (no image required)
         """
         logger.info(f"[PIPELINE] Running pipeline on coordinates: ({lat}, {lon})")
-        veg_change = get_vegetation_change(lat, lon)
+        veg_change, reused_from = self._satellite_result(lat, lon)
 
         result = {
             "coordinates": (lat, lon),
-            "satellite_vegetation_change": veg_change
+            "latitude": lat,  # for database compatibility
+            "longitude": lon,
+            "satellite_vegetation_change": veg_change,
+            "satellite_reused_from": reused_from,
         }
 
         return result
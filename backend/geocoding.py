@@ -0,0 +1,344 @@
+"""
+Place-name geocoding for /check_location and the Telegram bots.
+
+Lookups go through three tiers, stopping at the first hit:
+  1. a persistent cache of normalized queries (geocode_cache table in the
+     main database), including short-lived entries for names that weren't
+     found
+  2. an optional local gazetteer: a GeoNames dump loaded into an indexed
+     SQLite database (exact name/alternate-name lookups plus an FTS5 table
+     over names, state/province and country for multi-word queries)
+  3. the remote Nominatim geocoder, rate limited to its usage policy and
+     retried on timeouts, only when both of the above miss
+
+Build the gazetteer once from a GeoNames export, e.g.:
+    python geocoding.py load-geonames cities15000.txt
+
+admin1CodesASCII.txt and countryInfo.txt from the same export are picked up
+from the dump's directory (or given with --admin1/--countries) so queries
+like "surat gujarat" or "surat india" match.
+"""
+
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import db
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GAZETTEER_PATH = os.getenv("MANGROVE_GAZETTEER_PATH", os.path.join(BASE_DIR, "database", "gazetteer.db"))
+
+USER_AGENT = "mangrove_watch"
+CACHE_TTL_DAYS = 90
+NEGATIVE_CACHE_TTL_HOURS = 24
+REMOTE_RETRIES = 3
+REMOTE_RETRY_DELAY = 1.0
+REMOTE_TIMEOUT = 10
+# Nominatim's usage policy allows at most one request per second
+REMOTE_MIN_INTERVAL = float(os.getenv("MANGROVE_NOMINATIM_MIN_INTERVAL", "1.0"))
+
+_remote = None
+_remote_lock = threading.Lock()
+_last_remote_call = 0.0
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def normalize_query(text):
+    """Case-, accent-, punctuation- and whitespace-insensitive cache key"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text.casefold())
+    return " ".join(text.split())
+
+
+# --------------------------
+# Persistent cache
+# --------------------------
+SELECT_CACHE_SQL = """
+    SELECT latitude, longitude, source FROM geocode_cache
+    WHERE query = ?
+      AND created_at >= datetime('now', CASE WHEN latitude IS NULL THEN ? ELSE ? END)
+"""
+UPSERT_CACHE_SQL = """
+    INSERT INTO geocode_cache (query, latitude, longitude, source, created_at)
+    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (query) DO UPDATE SET
+        latitude = excluded.latitude,
+        longitude = excluded.longitude,
+        source = excluded.source,
+        created_at = excluded.created_at
+"""
+
+
+def _cache_get(query):
+    with db.connection() as conn:
+        return conn.execute(
+            SELECT_CACHE_SQL,
+            (query, f"-{NEGATIVE_CACHE_TTL_HOURS} hours", f"-{CACHE_TTL_DAYS} days"),
+        ).fetchone()
+
+
+def _cache_put(query, lat, lon, source):
+    with db.transaction() as conn:
+        conn.execute(UPSERT_CACHE_SQL, (query, lat, lon, source))
+
+
+# --------------------------
+# Local gazetteer
+# --------------------------
+class Gazetteer:
+    """Read-only lookups against a GeoNames-derived SQLite database"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            self.has_fts = bool(conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'place_fts'"
+            ).fetchone())
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def lookup(self, query):
+        """(lat, lon) of the most populous place matching a normalized query, or None"""
+        conn = self._conn()
+        row = conn.execute("""
+            SELECT p.latitude, p.longitude FROM place_names n
+            JOIN places p ON p.id = n.place_id
+            WHERE n.name = ?
+            ORDER BY p.population DESC LIMIT 1
+        """, (query,)).fetchone()
+        if row is None and self.has_fts and " " in query:
+            # Multi-word queries ("surat gujarat") match when every token appears
+            # in the place's names, its admin1 region or its country
+            match = " ".join(f'"{token}"' for token in query.split())
+            row = conn.execute("""
+                SELECT p.latitude, p.longitude FROM place_fts f
+                JOIN places p ON p.id = f.rowid
+                WHERE place_fts MATCH ?
+                ORDER BY p.population DESC LIMIT 1
+            """, (match,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+
+def get_gazetteer():
+    """The configured gazetteer, or None when no gazetteer database exists"""
+    global _gazetteer
+    if _gazetteer is None and os.path.exists(GAZETTEER_PATH):
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer(GAZETTEER_PATH)
+    return _gazetteer
+
+
+def _load_region_names(path, key_column, name_column):
+    """{code: normalized name} from a GeoNames lookup file, or {} when it doesn't exist"""
+    if not os.path.exists(path):
+        logger.warning("[GEOCODE] %s not found, its names won't be searchable", path)
+        return {}
+    names = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) > max(key_column, name_column):
+                names[fields[key_column]] = normalize_query(fields[name_column])
+    return names
+
+
+def load_geonames(dump_path, gazetteer_path=GAZETTEER_PATH, min_population=0, admin1_path=None,
+                  countries_path=None):
+    """
+    Build a gazetteer database from a GeoNames dump (allCountries.txt,
+    cities500.txt, ...): tab-separated, one place per line. admin1_path and
+    countries_path default to admin1CodesASCII.txt and countryInfo.txt next
+    to the dump.
+    """
+    dump_dir = os.path.dirname(os.path.abspath(dump_path))
+    admin1_names = _load_region_names(admin1_path or os.path.join(dump_dir, "admin1CodesASCII.txt"), 0, 2)
+    country_names = _load_region_names(countries_path or os.path.join(dump_dir, "countryInfo.txt"), 0, 4)
+
+    tmp_path = gazetteer_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE places (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            country_code TEXT,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            population INTEGER NOT NULL DEFAULT 0,
+            region TEXT NOT NULL DEFAULT ''
+        );
+        CREATE TABLE place_names (name TEXT NOT NULL, place_id INTEGER NOT NULL);
+    """)
+
+    def rows():
+        with open(dump_path, encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 15:
+                    continue
+                population = int(fields[14] or 0)
+                if population < min_population:
+                    continue
+                yield fields, population
+
+    count = 0
+    for fields, population in rows():
+        place_id = int(fields[0])
+        # Searchable admin1 (state/province) and country names, e.g. "gujarat india"
+        admin1 = admin1_names.get(f"{fields[8]}.{fields[10]}")
+        region = " ".join(filter(None, (admin1, country_names.get(fields[8]))))
+        conn.execute(
+            "INSERT INTO places (id, name, country_code, latitude, longitude, population, region) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (place_id, fields[1], fields[8], float(fields[4]), float(fields[5]), population, region),
+        )
+        names = {normalize_query(fields[1]), normalize_query(fields[2])}
+        names.update(normalize_query(n) for n in fields[3].split(",") if n)
+        conn.executemany(
+            "INSERT INTO place_names (name, place_id) VALUES (?, ?)",
+            ((n, place_id) for n in names if n),
+        )
+        count += 1
+
+    conn.execute("CREATE INDEX idx_place_names_name ON place_names (name)")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE place_fts USING fts5(names, region, content='')")
+        conn.execute("""
+            INSERT INTO place_fts (rowid, names, region)
+            SELECT n.place_id, group_concat(n.name, ' '), p.region FROM place_names n
+            JOIN places p ON p.id = n.place_id
+            GROUP BY n.place_id
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning("[GEOCODE] FTS5 unavailable, multi-word lookups disabled: %s", e)
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(tmp_path, gazetteer_path)
+    return count
+
+
+# --------------------------
+# Remote geocoder
+# --------------------------
+def get_remote():
+    global _remote
+    if _remote is None:
+        from geopy.geocoders import Nominatim
+        _remote = Nominatim(user_agent=USER_AGENT)
+    return _remote
+
+
+def configure(remote=None, min_interval=None, gazetteer_path=None):
+    """Swap the remote geocoder, its rate limit or the gazetteer (load tests, scripts)"""
+    global _remote, REMOTE_MIN_INTERVAL, GAZETTEER_PATH, _gazetteer
+    if remote is not None:
+        _remote = remote
+    if min_interval is not None:
+        REMOTE_MIN_INTERVAL = min_interval
+    if gazetteer_path is not None:
+        GAZETTEER_PATH = gazetteer_path
+        _gazetteer = None
+
+
+def _remote_geocode(text):
+    """
+    Returns (lat, lon), None when the place doesn't exist, and raises
+    GeocoderUnavailable when every attempt failed.
+    """
+    from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
+
+    global _last_remote_call
+    for attempt in range(REMOTE_RETRIES):
+        if REMOTE_MIN_INTERVAL:
+            with _remote_lock:
+                wait = _last_remote_call + REMOTE_MIN_INTERVAL - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                _last_remote_call = time.monotonic()
+        try:
+            loc = get_remote().geocode(text, timeout=REMOTE_TIMEOUT)
+            return (loc.latitude, loc.longitude) if loc else None
+        except (GeocoderTimedOut, GeocoderUnavailable) as e:
+            logger.warning("[GEOCODE] Remote attempt %d for %r failed: %s", attempt + 1, text, e)
+            time.sleep(REMOTE_RETRY_DELAY)  # wait before retry
+    raise GeocoderUnavailable(f"Geocoding failed after {REMOTE_RETRIES} attempts")
+
+
+def geocode(text):
+    """
+    Resolve a place name to (lat, lon). Returns (None, None) when the place
+    is unknown or the remote geocoder is unavailable.
+    """
+    from geopy.exc import GeocoderServiceError
+
+    query = normalize_query(text)
+    if not query:
+        return None, None
+
+    cached = _cache_get(query)
+    if cached is not None:
+        return cached["latitude"], cached["longitude"]
+
+    gazetteer = get_gazetteer()
+    if gazetteer is not None:
+        hit = gazetteer.lookup(query)
+        if hit is not None:
+            _cache_put(query, hit[0], hit[1], "gazetteer")
+            return hit
+
+    try:
+        hit = _remote_geocode(text)
+    except GeocoderServiceError as e:
+        logger.error("[GEOCODE] Remote geocoder unavailable for %r: %s", text, e)
+        return None, None  # not cached, the next request retries
+
+    if hit is None:
+        _cache_put(query, None, None, "nominatim")
+        return None, None
+    _cache_put(query, hit[0], hit[1], "nominatim")
+    return hit
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocoding cache and gazetteer tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    load = sub.add_parser("load-geonames", help="build the local gazetteer from a GeoNames dump")
+    load.add_argument("dump", help="GeoNames tab-separated file (e.g. cities15000.txt)")
+    load.add_argument("--output", default=GAZETTEER_PATH, help="gazetteer database path")
+    load.add_argument("--min-population", type=int, default=0)
+    load.add_argument("--admin1", help="admin1CodesASCII.txt (default: next to the dump)")
+    load.add_argument("--countries", help="countryInfo.txt (default: next to the dump)")
+    lookup = sub.add_parser("lookup", help="geocode a place name through all tiers")
+    lookup.add_argument("name")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "load-geonames":
+        total = load_geonames(args.dump, args.output, args.min_population, args.admin1, args.countries)
+        print(f"[INFO] Loaded {total} places into {args.output}")
+    else:
+        print(geocode(args.name))
@@ -0,0 +1,63 @@
+"""
+Gunicorn configuration for production.
+
+    gunicorn -c gunicorn.conf.py app:app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi_app:app
+or:
+    python start_backend.py --prod
+
+The app and the CLIP model are loaded once in the master and shared
+copy-on-write by the forked workers (see prefork.py). Workers are recycled
+after a bounded number of requests; a replacement is a cheap fork of the
+master, not a fresh model load. Per-worker memory:
+
+    python prefork.py memory --pid $(cat gunicorn.pid)
+"""
+
+import multiprocessing
+import os
+
+import prefork
+
+bind = os.getenv("MANGROVE_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("MANGROVE_WORKERS", str(min(4, multiprocessing.cpu_count()))))
+worker_class = os.getenv("MANGROVE_WORKER_CLASS", "gthread")
+threads = int(os.getenv("MANGROVE_THREADS", "8"))  # requests mostly wait on Earth Engine/Nominatim
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app in the master so workers fork with it (and the model) loaded
+preload_app = True
+
+# Recycle workers to bound memory growth; jitter keeps them from restarting together
+max_requests = int(os.getenv("MANGROVE_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("MANGROVE_MAX_REQUESTS_JITTER", "100"))
+
+pidfile = os.getenv("MANGROVE_PIDFILE", "gunicorn.pid")
+accesslog = "-"
+loglevel = "info"
+
+
+def _app_module(server):
+    # "asgi_app" for asgi_app:app under UvicornWorker, "app" for the sync/gthread workers
+    return server.app.app_uri.partition(":")[0]
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before the first fork;
+    # warm up the app the workers actually serve
+    prefork.preload(_app_module(server))
+    prefork.log_memory("master")
+
+
+def post_fork(server, worker):
+    prefork.init_worker(server.cfg.workers)
+
+
+def post_worker_init(worker):
+    prefork.log_memory("worker")
+
+
+def worker_exit(server, worker):
+    prefork.log_memory("exiting")
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Polling vs webhook load test for the Telegram bot (bot_handler.py).
+
+Runs the real bot application and handlers against a local fake Bot API
+server, so nothing leaves the machine:
+  - the fake server answers getMe/getUpdates/sendMessage/... in a separate
+    process, adding --network-latency each way to every call as a real
+    round trip to Telegram would
+  - a sender emits text updates (coordinates spread over the Gulf of
+    Khambhat) at a fixed --rate, open loop; in polling mode they are
+    queued for getUpdates, in webhook mode POSTed to the bot's listener
+  - Earth Engine is replaced by the stand-in from stand_ins.py
+
+For every update it measures the time until the bot's acknowledgement
+("⏳ Processing...") and its result message reach the fake server, and
+reports p50/p95/p99 and throughput per mode.
+
+Examples (from backend/):
+    python loadtest/bot_loadtest.py
+    python loadtest/bot_loadtest.py --rate 200 --count 4000 --network-latency 0.05
+    python loadtest/bot_loadtest.py --mode webhook --ee-latency 0 --output bot_report.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import sys
+import os
+import time
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(LOADTEST_DIR)
+for path in (BACKEND_DIR, LOADTEST_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import stand_ins  # noqa: E402
+
+TOKEN = "123456:LOADTEST"
+SECRET = "loadtest-secret"
+ACK_PREFIX = "⏳"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+# --------------------------
+# Fake Bot API (separate process)
+# --------------------------
+class FakeBotAPI:
+    """Just enough of api.telegram.org for the bot, plus an update sender"""
+
+    def __init__(self, network_latency=0.0):
+        self.network_latency = network_latency
+        self.reset()
+
+    def reset(self):
+        self.updates = []  # pending for getUpdates
+        self.sent_at = {}  # chat id -> perf_counter when the update was sent
+        self.acks = {}  # chat id -> latency of the acknowledgement
+        self.results = {}  # chat id -> latency of the result message
+        self.last_result_at = None
+        self.requests = 0
+        self._message_id = 0
+        self._new_updates = asyncio.Event()
+        self._done = asyncio.Event()
+        self._expected = 0
+
+    # Bot API methods ---------------------------------------------------
+    async def _get_updates(self, params):
+        offset = int(params.get("offset", 0) or 0)
+        timeout = float(params.get("timeout", 0) or 0)
+        limit = int(params.get("limit", 100) or 100)
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:limit]
+
+    def _send_message(self, params):
+        now = time.perf_counter()
+        chat_id = int(params["chat_id"])
+        text = params.get("text", "")
+        sent_at = self.sent_at.get(chat_id)
+        if sent_at is not None:
+            if text.startswith(ACK_PREFIX):
+                self.acks[chat_id] = now - sent_at
+            elif chat_id not in self.results:
+                self.results[chat_id] = now - sent_at
+                self.last_result_at = now
+                if len(self.results) >= self._expected:
+                    self._done.set()
+        self._message_id += 1
+        return {"message_id": self._message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": text}
+
+    async def handle(self, request):
+        from starlette.responses import JSONResponse
+
+        method = request.path_params["method"]
+        params = dict(await request.form()) if request.method == "POST" else dict(request.query_params)
+        self.requests += 1
+        await asyncio.sleep(self.network_latency)  # request in flight
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Mangrove Watch", "username": "loadtest_bot"}
+        elif method == "getUpdates":
+            result = await self._get_updates(params)
+        elif method == "sendMessage":
+            result = self._send_message(params)
+        elif method in ("deleteWebhook", "setWebhook", "close", "logOut"):
+            result = True
+        else:
+            return JSONResponse({"ok": False, "error_code": 404, "description": f"{method} not faked"}, 404)
+        await asyncio.sleep(self.network_latency)  # response in flight
+        return JSONResponse({"ok": True, "result": result})
+
+    # Update sender -----------------------------------------------------
+    async def send_updates(self, count, rate, webhook_url=None, seed=1):
+        """
+        Emit `count` text updates at `rate` per second and wait until every
+        result arrived (or a timeout). Returns the latency figures.
+        """
+        import httpx
+
+        self.reset()
+        self._expected = count
+        rng = random.Random(seed)
+        client = httpx.AsyncClient(limits=httpx.Limits(max_connections=100)) if webhook_url else None
+        deliveries = []
+
+        async def deliver(update):
+            await asyncio.sleep(self.network_latency)
+            response = await client.post(
+                webhook_url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}
+            )
+            response.raise_for_status()
+
+        started = time.perf_counter()
+        for i in range(count):
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            chat_id = 10_000_000 + i
+            lat, lon = round(21.0 + rng.uniform(-1, 1), 5), round(72.6 + rng.uniform(-1, 1), 5)
+            update = {
+                "update_id": i + 1,
+                "message": {
+                    "message_id": i + 1,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+                    "text": f"{lat}, {lon}",
+                },
+            }
+            self.sent_at[chat_id] = time.perf_counter()
+            if webhook_url:
+                deliveries.append(asyncio.create_task(deliver(update)))
+            else:
+                self.updates.append(update)
+                self._new_updates.set()
+
+        failed = 0
+        if deliveries:
+            failed = sum(1 for r in await asyncio.gather(*deliveries, return_exceptions=True) if r is not None)
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout=60 + count / rate)
+        except asyncio.TimeoutError:
+            pass
+        if client is not None:
+            await client.aclose()
+
+        elapsed = (self.last_result_at - started) if self.last_result_at else None
+        return {
+            "acks": sorted(self.acks.values()),
+            "results": sorted(self.results.values()),
+            "elapsed": elapsed,
+            "delivery_failures": failed,
+            "bot_api_requests": self.requests,
+        }
+
+
+def _serve_fake_api(conn, port, network_latency):
+    """Child process: serve the fake Bot API and run sender commands from `conn`"""
+    import logging
+
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async def main():
+        api = FakeBotAPI(network_latency)
+        web = Starlette(routes=[Route("/bot{token}/{method}", api.handle, methods=["GET", "POST"])])
+        server = uvicorn.Server(uvicorn.Config(
+            web, host="127.0.0.1", port=port, log_level="warning", lifespan="off", backlog=4096,
+        ))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        conn.send("ready")
+        while True:
+            command = await asyncio.to_thread(conn.recv)
+            if command is None:
+                break
+            conn.send(await api.send_updates(*command))
+        server.should_exit = True
+        await serving
+
+    asyncio.run(main())
+
+
+class FakeBotAPIProcess:
+    """
+    Runs FakeBotAPI in its own process, so the fake's HTTP handling and the
+    update sender don't compete with the bot for the GIL and skew the
+    figures. Latencies are measured entirely inside that process.
+    """
+
+    def __init__(self, network_latency=0.0):
+        import multiprocessing
+
+        self.port = _free_port()
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve_fake_api, args=(child_conn, self.port, network_latency), daemon=True
+        )
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    def start(self):
+        self._process.start()
+        if not self._conn.poll(30) or self._conn.recv() != "ready":
+            raise RuntimeError("fake Bot API did not start")
+
+    async def send_updates(self, count, rate, webhook_url=None, seed=1):
+        self._conn.send((count, rate, webhook_url, seed))
+        return await asyncio.to_thread(self._conn.recv)
+
+    def stop(self):
+        self._conn.send(None)
+        self._process.join(10)
+        if self._process.is_alive():
+            self._process.terminate()
+
+
+# --------------------------
+# Bot under test
+# --------------------------
+class StandInPipeline:
+    """Pipeline.run_on_coordinates backed by the stand-in Earth Engine"""
+
+    def __init__(self, earth_engine):
+        self.earth_engine = earth_engine
+
+    def run_on_coordinates(self, lat, lon):
+        veg_change = self.earth_engine.get_vegetation_change(lat, lon)
+        return {"coordinates": (lat, lon), "latitude": lat, "longitude": lon, "satellite_vegetation_change": veg_change}
+
+
+async def _run_bot(mode, api, args):
+    import bot_analysis
+    import bot_handler
+    import bot_webhook
+
+    earth_engine = stand_ins.FakeEarthEngine(stand_ins.Latency(args.ee_latency, args.ee_jitter, seed=1))
+    bot_handler.analysis.shutdown()
+    bot_handler.analysis = bot_analysis.AnalysisService(
+        lambda: StandInPipeline(earth_engine),
+        workers=args.analysis_workers,
+        max_pending=10 ** 6,
+        rate_limiter=bot_analysis.RateLimiter(limit=10 ** 9),
+    )
+    application = bot_handler.build_application(TOKEN, webhook=(mode == "webhook"), base_url=api.base_url)
+
+    if mode == "polling":
+        async with application:
+            await application.updater.start_polling(poll_interval=0, timeout=10)
+            await application.start()
+            try:
+                figures = await api.send_updates(args.count, args.rate, None, args.seed)
+            finally:
+                await application.updater.stop()
+                await application.stop()
+    else:
+        port = _free_port()
+        ready = asyncio.Event()
+        servers = []
+
+        def on_ready(server):
+            servers.append(server)
+            ready.set()
+
+        serving = asyncio.create_task(bot_webhook.serve(
+            application, listen=f"127.0.0.1:{port}", secret_token=SECRET, server_ready=on_ready,
+        ))
+        await ready.wait()
+        try:
+            webhook_url = f"http://127.0.0.1:{port}{bot_webhook.WEBHOOK_PATH}"
+            figures = await api.send_updates(args.count, args.rate, webhook_url, args.seed)
+        finally:
+            servers[0].should_exit = True
+            await serving
+
+    bot_handler.analysis.shutdown()
+    figures["earth_engine_calls"] = earth_engine.calls
+    return figures
+
+
+def run_mode(mode, api, args):
+    figures = asyncio.run(_run_bot(mode, api, args))
+    acks, results, elapsed = figures["acks"], figures["results"], figures["elapsed"]
+
+    def ms(values, pct):
+        value = _percentile(values, pct)
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "mode": mode,
+        "updates": args.count,
+        "delivery_failures": figures["delivery_failures"],
+        "results": len(results),
+        "earth_engine_calls": figures["earth_engine_calls"],
+        "throughput_per_s": round(len(results) / elapsed, 2) if elapsed else None,
+        "bot_api_requests": figures["bot_api_requests"],
+        "ack_ms": {"p50": ms(acks, 50), "p95": ms(acks, 95), "p99": ms(acks, 99)},
+        "result_ms": {"p50": ms(results, 50), "p95": ms(results, 95), "p99": ms(results, 99),
+                      "max": round(results[-1] * 1000, 2) if results else None},
+    }
+
+
+def print_report(runs):
+    print(f"\n{'mode':<8} {'updates':>7} {'done':>6} {'upd/s':>8} {'API reqs':>9} "
+          f"{'ack p50':>8} {'ack p95':>8} {'ack p99':>8} {'res p50':>8} {'res p95':>8} {'res p99':>8}")
+    for r in runs:
+        print(
+            f"{r['mode']:<8} {r['updates']:>7} {r['results']:>6} {r['throughput_per_s']!s:>8} "
+            f"{r['bot_api_requests']:>9} {r['ack_ms']['p50']!s:>8} {r['ack_ms']['p95']!s:>8} "
+            f"{r['ack_ms']['p99']!s:>8} {r['result_ms']['p50']!s:>8} {r['result_ms']['p95']!s:>8} "
+            f"{r['result_ms']['p99']!s:>8}"
+        )
+    print("(latencies in ms from sending the update to the message reaching the Bot API)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the Telegram bot's polling and webhook modes")
+    parser.add_argument("--mode", choices=("polling", "webhook", "both"), default="both")
+    parser.add_argument("--count", type=int, default=1000, help="updates per mode")
+    parser.add_argument("--rate", type=float, default=100.0, help="updates per second (open loop)")
+    parser.add_argument("--network-latency", type=float, default=0.025,
+                        help="one-way latency between the bot and the fake Bot API (s)")
+    parser.add_argument("--ee-latency", type=float, default=0.3, help="stand-in Earth Engine latency (s)")
+    parser.add_argument("--ee-jitter", type=float, default=0.2, help="extra uniform Earth Engine jitter (s)")
+    parser.add_argument("--analysis-workers", type=int, default=64,
+                        help="AnalysisService threads (high, so transport rather than analysis is measured)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    import logging
+
+    import bot_handler  # noqa: F401  (configures logging on import)
+
+    logging.getLogger().setLevel(logging.WARNING)  # the bot logs every message at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    api = FakeBotAPIProcess(args.network_latency)
+    api.start()
+    modes = ["polling", "webhook"] if args.mode == "both" else [args.mode]
+    print(f"[LOADTEST] {args.count} updates at {args.rate}/s per mode, "
+          f"network latency {args.network_latency * 1000:.0f} ms each way, modes: {', '.join(modes)}")
+    try:
+        runs = [run_mode(mode, api, args) for mode in modes]
+    finally:
+        api.stop()
+
+    print_report(runs)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "runs": runs}, f, indent=2)
+        print(f"\n[LOADTEST] Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+End-to-end load generator for backend/app.py.
+
+Replays a weighted mix of realistic traffic (image uploads, coordinate
+pipeline runs, /check_location lookups and profile page fetches) from a
+pool of closed-loop clients and reports throughput and p50/p95/p99 latency
+per endpoint. By default the Flask app is served in-process on a threaded
+Werkzeug server with Earth Engine, Nominatim and CLIP replaced by local
+stand-ins, so the whole run is offline.
+
+Examples (from backend/):
+    python loadtest/run_loadtest.py --concurrency 8,16,32,64 --duration 20
+    python loadtest/run_loadtest.py --ee-latency 1.5 --ee-jitter 1.0 --mix upload=5,profile=5
+    python loadtest/run_loadtest.py --server asgi --concurrency 64,256 --mix coordinates=1
+    python loadtest/run_loadtest.py --target http://127.0.0.1:5000 --output report.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(LOADTEST_DIR)
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from common import make_gps_jpeg, seed_database  # noqa: E402  (benchmarks/common.py)
+
+DEFAULT_MIX = "upload=3,coordinates=2,check_location=2,profile=3"
+PLACE_NAMES = ["Surat", "Ahmedabad", "Mumbai", "Sundarbans", "Bhitarkanika", "Pichavaram"]
+
+
+# --------------------------
+# Traffic
+# --------------------------
+class Traffic:
+    """Builds requests for each scenario in the mix"""
+
+    def __init__(self, user_ids, images, seed=None):
+        self.user_ids = user_ids
+        self.images = images
+        self.rng = random.Random(seed)
+
+    def _coords(self):
+        return round(21.0 + self.rng.uniform(-1, 1), 5), round(72.6 + self.rng.uniform(-1, 1), 5)
+
+    def upload(self):
+        boundary = uuid.uuid4().hex
+        lat, lon = self._coords()
+        fields = {
+            "mode": "image",
+            "user_id": str(self.rng.choice(self.user_ids)),
+            "description": "load test upload",
+        }
+        # A third of uploads carry browser coordinates instead of relying on EXIF
+        if self.rng.random() < 0.33:
+            fields["latitude"], fields["longitude"] = str(lat), str(lon)
+
+        parts = []
+        for name, value in fields.items():
+            parts.append(
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode()
+            )
+        image = self.rng.choice(self.images)
+        parts.append(
+            (
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; "
+                f"filename=\"load_{uuid.uuid4().hex[:12]}.jpg\"\r\nContent-Type: image/jpeg\r\n\r\n"
+            ).encode()
+            + image
+            + b"\r\n"
+        )
+        parts.append(f"--{boundary}--\r\n".encode())
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        return "upload", "POST", "/run-pipeline", b"".join(parts), headers
+
+    def coordinates(self):
+        lat, lon = self._coords()
+        body = {"mode": "coordinates", "lat": lat, "lon": lon, "user_id": self.rng.choice(self.user_ids)}
+        return "coordinates", "POST", "/run-pipeline", json.dumps(body).encode(), {"Content-Type": "application/json"}
+
+    def check_location(self):
+        if self.rng.random() < 0.5:
+            lat, lon = self._coords()
+            location = f"{lat}, {lon}"
+        else:
+            location = self.rng.choice(PLACE_NAMES)
+        body = json.dumps({"location": location}).encode()
+        return "check_location", "POST", "/check_location", body, {"Content-Type": "application/json"}
+
+    def profile(self):
+        # The Profile page loads stats and reports together
+        user_id = self.rng.choice(self.user_ids)
+        if self.rng.random() < 0.5:
+            return "profile_stats", "GET", f"/user/stats?user_id={user_id}", None, {}
+        return "profile_reports", "GET", f"/user/reports?user_id={user_id}", None, {}
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ("upload", "coordinates", "check_location", "profile"):
+            raise ValueError(f"unknown scenario in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# --------------------------
+# Load generation
+# --------------------------
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency, ok):
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _worker(target, traffic_seed, user_ids, images, mix, deadline, recorder, timeout):
+    traffic = Traffic(user_ids, images, seed=traffic_seed)
+    scenarios = list(mix)
+    weights = [mix[s] for s in scenarios]
+    host, port = target.hostname, target.port or 80
+
+    while time.monotonic() < deadline:
+        scenario = traffic.rng.choices(scenarios, weights)[0]
+        endpoint, method, path, body, headers = getattr(traffic, scenario)()
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        start = time.perf_counter()
+        ok = False
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+            ok = response.status < 500 and b'"status":"error"' not in payload.replace(b" ", b"")
+        except (OSError, http.client.HTTPException):
+            ok = False
+        finally:
+            conn.close()
+        recorder.record(endpoint, time.perf_counter() - start, ok)
+
+
+def run_step(target, concurrency, duration, user_ids, images, mix, timeout, seed):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(target, seed * 1000 + i, user_ids, images, mix, deadline, recorder, timeout),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values.sort()
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": recorder.errors[endpoint],
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(_percentile(values, 50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 95) * 1000, 2),
+            "p99_ms": round(_percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 2),
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def print_step(step):
+    print(
+        f"\n== concurrency {step['concurrency']}: {step['requests']} requests, "
+        f"{step['throughput_rps']} req/s, {step['errors']} errors"
+    )
+    print(f"{'endpoint':<18} {'reqs':>6} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, e in step["endpoints"].items():
+        print(
+            f"{name:<18} {e['requests']:>6} {e['errors']:>5} {e['throughput_rps']:>8} "
+            f"{e['p50_ms']:>9} {e['p95_ms']:>9} {e['p99_ms']:>9}"
+        )
+
+
+# --------------------------
+# In-process server
+# --------------------------
+def start_local_server(args, workdir):
+    """Serve app.py with stand-ins on a threaded Werkzeug server; returns (url, stop)"""
+    from werkzeug.serving import make_server
+
+    import stand_ins
+
+    previous = os.getcwd()
+    os.chdir(BACKEND_DIR)
+    try:
+        import app as app_module
+    finally:
+        os.chdir(previous)
+
+    db_path = os.path.join(workdir, "loadtest.db")
+    seed_database(db_path, args.seed_rows, users=args.users)
+    app_module.db.configure(db_path)
+    app_module.app.config["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+    os.makedirs(app_module.app.config["UPLOAD_FOLDER"], exist_ok=True)
+
+    earth_engine = stand_ins.FakeEarthEngine(stand_ins.Latency(args.ee_latency, args.ee_jitter, seed=1))
+    geocoder_latency = stand_ins.Latency(args.geocoder_latency, args.geocoder_jitter, seed=2)
+    classifier = None
+    if args.classifier == "stub":
+        classifier = stand_ins.FakeClassifier(
+            app_module.get_validator().labels,
+            stand_ins.Latency(args.classifier_latency, args.classifier_jitter, seed=3),
+        )
+
+    patches = stand_ins.installed(app_module, earth_engine, geocoder_latency, classifier)
+    patches.__enter__()
+
+    if args.server == "asgi":
+        port, shutdown = _serve_asgi()
+    else:
+        server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port, shutdown = server.server_port, server.shutdown
+
+    def stop():
+        shutdown()
+        patches.__exit__(None, None, None)
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+def _serve_asgi():
+    """Run asgi_app on uvicorn in a background thread; returns (port, shutdown)"""
+    import socket
+
+    import uvicorn
+
+    import asgi_app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(asgi_app.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def shutdown():
+        server.should_exit = True
+        thread.join()
+
+    return port, shutdown
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Mangrove Watch backend")
+    parser.add_argument("--target", help="base URL of an already running server (default: in-process server with stand-ins)")
+    parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi", help="in-process server: threaded Flask or asgi_app on uvicorn")
+    parser.add_argument("--concurrency", default="4,16,64", help="comma separated client counts, run in sequence")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per concurrency step")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=50, help="user ids to spread requests over")
+    parser.add_argument("--seed-rows", type=int, default=10000, help="workflow_results rows to pre-seed (in-process mode)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client socket timeout in seconds")
+    parser.add_argument("--ee-latency", type=float, default=0.8, help="stand-in Earth Engine latency (s)")
+    parser.add_argument("--ee-jitter", type=float, default=0.4, help="extra uniform Earth Engine jitter (s)")
+    parser.add_argument("--geocoder-latency", type=float, default=0.3, help="stand-in Nominatim latency (s)")
+    parser.add_argument("--geocoder-jitter", type=float, default=0.2, help="extra uniform Nominatim jitter (s)")
+    parser.add_argument("--classifier", choices=("stub", "real"), default="stub", help="stand-in or real CLIP")
+    parser.add_argument("--classifier-latency", type=float, default=0.15, help="stand-in CLIP latency (s)")
+    parser.add_argument("--classifier-jitter", type=float, default=0.05, help="extra uniform CLIP jitter (s)")
+    parser.add_argument("--seed", type=int, default=1, help="traffic RNG seed")
+    parser.add_argument("--output", help="write the full report as JSON")
+    args = parser.parse_args(argv)
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    args.mix = parse_mix(args.mix)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    stop = None
+    try:
+        if args.target:
+            base_url = args.target
+        else:
+            base_url, stop = start_local_server(args, workdir)
+        target = urlsplit(base_url)
+        print(f"[LOADTEST] Target {base_url}, mix {args.mix}")
+
+        rng = random.Random(args.seed)
+        images = [
+            make_gps_jpeg(21.0 + rng.uniform(-1, 1), 72.6 + rng.uniform(-1, 1), size=(1024, 768), seed=i)
+            for i in range(8)
+        ]
+        user_ids = list(range(1, args.users + 1))
+
+        report = {"target": base_url, "mix": args.mix, "steps": []}
+        if not args.target:
+            report["stand_ins"] = {
+                "earth_engine": [args.ee_latency, args.ee_jitter],
+                "geocoder": [args.geocoder_latency, args.geocoder_jitter],
+                "classifier": args.classifier,
+            }
+        for concurrency in args.concurrency:
+            step = run_step(target, concurrency, args.duration, user_ids, images, args.mix, args.timeout, args.seed)
+            print_step(step)
+            report["steps"].append(step)
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\n[LOADTEST] Report written to {args.output}")
+    finally:
+        if stop is not None:
+            stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Local stand-ins for the remote services the backend calls.
+
+Each stand-in mimics the interface the backend uses and sleeps for a
+configurable latency (fixed + random jitter), so load tests exercise the
+real request handling and concurrency without network access:
+
+  - FakeEarthEngine   replaces satelite_check.get_vegetation_change
+  - FakeNominatim     replaces geopy's Nominatim geocoder
+  - FakeClassifier    replaces the CLIP forward pass in AIValidator
+"""
+
+import contextlib
+import random
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from utils import get_gps_coordinates
+
+
+class Latency:
+    """Fixed latency plus uniform jitter, in seconds"""
+
+    def __init__(self, base=0.0, jitter=0.0, seed=None):
+        self.base = base
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self):
+        with self._lock:
+            delay = self.base + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def __repr__(self):
+        return f"Latency(base={self.base}, jitter={self.jitter})"
+
+
+class FakeEarthEngine:
+    """Deterministic vegetation change per coordinate after a simulated GEE round trip"""
+
+    def __init__(self, latency=None, failure_rate=0.0):
+        self.latency = latency or Latency()
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_vegetation_change(self, latitude, longitude, use_enhanced=False):
+        with self._lock:
+            self.calls += 1
+        self.latency.sleep()
+        if self.failure_rate and random.random() < self.failure_rate:
+            return None
+        seed = zlib.crc32(f"{float(latitude):.4f},{float(longitude):.4f}".encode())
+        return round((seed % 4000) / 100.0 - 20.0, 2)
+
+
+_Location = namedtuple("_Location", ["address", "latitude", "longitude"])
+
+
+class FakeNominatim:
+    """
+    Drop-in for geopy.geocoders.Nominatim. Known place names resolve to
+    fixed coordinates; anything else resolves to a stable pseudo-random
+    point, except names starting with "nowhere" which are not found.
+    """
+
+    PLACES = {
+        "ahmedabad": (23.0225, 72.5714),
+        "surat": (21.1702, 72.8311),
+        "mumbai": (19.0760, 72.8777),
+        "sundarbans": (21.9497, 89.1833),
+        "bhitarkanika": (20.7231, 86.8980),
+        "pichavaram": (11.4290, 79.7750),
+    }
+
+    latency = Latency()
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, user_agent=None, **kwargs):
+        self.user_agent = user_agent
+
+    def geocode(self, query, timeout=None, **kwargs):
+        with FakeNominatim._lock:
+            FakeNominatim.calls += 1
+        FakeNominatim.latency.sleep()
+        key = query.strip().lower()
+        if key.startswith("nowhere"):
+            return None
+        if key in self.PLACES:
+            lat, lon = self.PLACES[key]
+        else:
+            seed = zlib.crc32(key.encode())
+            lat = 8.0 + (seed % 2400) / 100.0
+            lon = 68.0 + (seed // 2400 % 2900) / 100.0
+        return _Location(query, lat, lon)
+
+
+class FakeClassifier:
+    """Replaces AIValidator.analyze_photo/analyze_images with a fixed-cost classification"""
+
+    def __init__(self, labels, latency=None):
+        self.labels = labels
+        self.latency = latency or Latency()
+
+    def analyze_photo(self, image_path):
+        self.latency.sleep()
+        seed = zlib.crc32(image_path.encode())
+        return {
+            "label": self.labels[seed % len(self.labels)],
+            "confidence": 0.5 + (seed % 500) / 1000.0,
+            "coordinates": get_gps_coordinates(image_path),
+        }
+
+    def analyze_images(self, images):
+        # One simulated forward pass per batch
+        self.latency.sleep()
+        results = []
+        for image in images:
+            seed = zlib.crc32(image.tobytes()[:4096])
+            results.append({
+                "label": self.labels[seed % len(self.labels)],
+                "confidence": 0.5 + (seed % 500) / 1000.0,
+            })
+        return results
+
+
+@contextlib.contextmanager
+def installed(app_module, earth_engine=None, geocoder_latency=None, classifier=None):
+    """
+    Patch the stand-ins into an imported `app` module for the duration of
+    the block. Pass None for any service that should stay real.
+    """
+    import full_pipe
+    import geocoding
+    import satelite_check
+
+    patches = []
+
+    def patch(obj, name, value):
+        patches.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    if earth_engine is not None:
+        for module in (satelite_check, full_pipe, app_module):
+            patch(module, "get_vegetation_change", earth_engine.get_vegetation_change)
+    if geocoder_latency is not None:
+        FakeNominatim.latency = geocoder_latency
+        # Cache and gazetteer stay real; only the remote tier is replaced
+        patch(geocoding, "_remote", FakeNominatim(user_agent=geocoding.USER_AGENT))
+        patch(geocoding, "REMOTE_MIN_INTERVAL", 0)
+    if classifier is not None:
+        patch(app_module.get_validator(), "analyze_photo", classifier.analyze_photo)
+        patch(app_module.get_validator(), "analyze_images", classifier.analyze_images)
+
+    try:
+        yield
+    finally:
+        for obj, name, original in reversed(patches):
+            setattr(obj, name, original)
@@ -0,0 +1,167 @@
+"""
+Perceptual hashes for near-duplicate photo detection.
+
+Burst shots and re-encoded copies of the same photo differ byte for byte,
+so exact hashes never match them. The pHash here survives re-encoding,
+resizing and small exposure changes:
+  - the image is shrunk to 32x32 grayscale
+  - a 2D DCT is taken and its 8x8 lowest frequencies kept
+  - each of the 64 coefficients becomes one bit: above the median or not
+    (the DC term is left out of the median, it only tracks brightness)
+Near-duplicates have a small Hamming distance between their hashes (an
+unrelated pair is around 32 of 64 bits apart).
+
+HashIndex finds stored hashes within a Hamming distance without comparing
+against every entry (multi-index hashing): each hash is split into
+CHUNKS 16-bit chunks, each indexed in its own table. Two hashes at most
+d bits apart differ in at most d // CHUNKS bits in at least one chunk, so
+probing every chunk value within that many bit flips finds all
+candidates, and only those are compared in full.
+"""
+
+import itertools
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8  # 8x8 = 64 bit hashes
+SAMPLE_SIZE = 32
+CHUNKS = 4
+CHUNK_BITS = HASH_SIZE * HASH_SIZE // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def _dct_matrix(n, rows):
+    # Orthonormal DCT-II basis, first `rows` frequencies
+    k = np.arange(rows)[:, None]
+    x = np.arange(n)[None, :]
+    basis = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    basis[0] /= np.sqrt(2.0)
+    return basis
+
+
+_DCT = _dct_matrix(SAMPLE_SIZE, HASH_SIZE)
+_BIT_WEIGHTS = 1 << np.arange(HASH_SIZE * HASH_SIZE - 1, -1, -1, dtype=np.uint64)
+
+
+def compute(image):
+    """64-bit pHash of a PIL image, as an int"""
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    # reducing_gap box-reduces large images before the Lanczos pass
+    small = image.resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    pixels = np.asarray(small.convert("L"), dtype=np.float64)
+    low = _DCT @ pixels @ _DCT.T
+    coefficients = low.ravel()
+    bits = coefficients > np.median(coefficients[1:])
+    return int(_BIT_WEIGHTS[bits].sum())
+
+
+def compute_path(path):
+    """compute() for an image file, decoded at reduced size where the format allows"""
+    with Image.open(path) as image:
+        image.draft("L", (SAMPLE_SIZE * 4, SAMPLE_SIZE * 4))  # JPEG DCT scaling; a no-op elsewhere
+        return compute(image)
+
+
+def distance(a, b):
+    """Hamming distance between two hashes"""
+    return (a ^ b).bit_count()
+
+
+def to_hex(value):
+    return f"{value:016x}"
+
+
+def _flip_masks(radius):
+    # Every CHUNK_BITS-bit mask with at most `radius` bits set
+    masks = []
+    for flips in range(radius + 1):
+        for positions in itertools.combinations(range(CHUNK_BITS), flips):
+            masks.append(sum(1 << p for p in positions))
+    return masks
+
+
+class HashIndex:
+    """
+    Bounded, thread-safe map of pHash -> value supporting "nearest stored
+    hash within max_distance" lookups. Entries may carry a location; with
+    radius_m set, two located entries only match within that many metres
+    (an entry without a location matches on the hash alone). The oldest
+    entries are evicted past max_entries.
+    """
+
+    def __init__(self, max_distance=6, radius_m=None, max_entries=10000):
+        self.max_distance = max_distance
+        self.radius_m = radius_m
+        self.max_entries = max_entries
+        self._masks = _flip_masks(max_distance // CHUNKS)
+        self._entries = OrderedDict()  # key -> (hash, value, lat, lon)
+        self._tables = [{} for _ in range(CHUNKS)]  # chunk value -> set of keys
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _chunks(value):
+        return [(value >> (CHUNK_BITS * i)) & CHUNK_MASK for i in range(CHUNKS)]
+
+    def add(self, value_hash, value, lat=None, lon=None):
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = (value_hash, value, lat, lon)
+            for table, chunk in zip(self._tables, self._chunks(value_hash)):
+                table.setdefault(chunk, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, (old_hash, *_) = self._entries.popitem(last=False)
+                for table, chunk in zip(self._tables, self._chunks(old_hash)):
+                    keys = table[chunk]
+                    keys.discard(old_key)
+                    if not keys:
+                        del table[chunk]
+
+    def _near(self, lat, lon, other_lat, other_lon):
+        if self.radius_m is None or lat is None or other_lat is None:
+            return True
+        from db import haversine_m
+
+        return haversine_m(lat, lon, other_lat, other_lon) <= self.radius_m
+
+    def find(self, value_hash, lat=None, lon=None):
+        """(value, stored hash, distance) of the closest match, or None"""
+        with self._lock:
+            candidates = set()
+            for table, chunk in zip(self._tables, self._chunks(value_hash)):
+                for mask in self._masks:
+                    keys = table.get(chunk ^ mask)
+                    if keys:
+                        candidates.update(keys)
+            best = None
+            for key in candidates:
+                stored_hash, value, other_lat, other_lon = self._entries[key]
+                d = distance(value_hash, stored_hash)
+                if d <= self.max_distance and (best is None or d < best[2]) and self._near(lat, lon, other_lat, other_lon):
+                    best = (value, stored_hash, d)
+            return best
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Hashes for a folder's images and the near-duplicate pairs among them
+    folder = sys.argv[1] if len(sys.argv) > 1 else "Data"
+    max_distance = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    index = HashIndex(max_distance=max_distance)
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith((".jpg", ".jpeg", ".png")):
+            continue
+        value_hash = compute_path(os.path.join(folder, name))
+        match = index.find(value_hash)
+        print(f"{to_hex(value_hash)}  {name}" + (f"  ~ {match[0]} (distance {match[2]})" if match else ""))
+        index.add(value_hash, name)
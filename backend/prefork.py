@@ -0,0 +1,153 @@
+"""
+Helpers for the preforked production server (see gunicorn.conf.py).
+
+The master process imports the app and warms the CLIP model up before any
+worker is forked, so every worker starts with the weights and label
+embeddings already in memory and shares those pages copy-on-write instead
+of loading its own copy. The master's heap is then moved out of the
+garbage collector's reach (gc.freeze), so collections in the workers don't
+write to, and un-share, the inherited objects.
+
+Memory figures come from /proc/<pid>/smaps_rollup. RSS counts every shared
+page in full for each process; PSS divides shared pages between the
+processes mapping them, so the sum of PSS is the real footprint:
+
+    python prefork.py memory --pid <gunicorn master pid>
+"""
+
+import argparse
+import gc
+import importlib
+import logging
+import os
+import sys
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# MANGROVE_PRELOAD_MODEL=0 leaves the model to load lazily in each worker (for comparison)
+PRELOAD_MODEL = os.getenv("MANGROVE_PRELOAD_MODEL", "1") != "0"
+# Intra-op threads per worker; default splits the cores between the workers
+TORCH_THREADS = int(os.getenv("MANGROVE_TORCH_THREADS", "0"))
+
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def preload(app_module="app"):
+    """
+    Run in the master before forking: migrate the database, warm the model,
+    freeze the heap. app_module is the module the workers serve ("app", or
+    "asgi_app" under UvicornWorker); both share the Flask app's model.
+    """
+    importlib.import_module(app_module)
+    import app as flask_app
+
+    db.init_db()  # once here instead of racing in every worker
+    flask_app.get_pipeline()  # imported lazily by the app; workers should inherit it
+
+    if PRELOAD_MODEL:
+        try:
+            import torch
+            # Single-threaded in the master: an OpenMP pool started before
+            # fork() is not usable in the children
+            torch.set_num_threads(1)
+            flask_app.get_validator().warm_up()
+            logger.info("[PREFORK] Model and label embeddings loaded in master (pid %d)", os.getpid())
+        except Exception as e:
+            logger.warning("[PREFORK] Model preload failed, workers will load it lazily: %s", e)
+
+    gc.collect()
+    gc.freeze()
+
+
+def init_worker(worker_count):
+    """Run in each worker right after fork"""
+    db.reset_after_fork()
+    if "torch" in sys.modules:
+        import torch
+        threads = TORCH_THREADS or max(1, (os.cpu_count() or 1) // max(1, worker_count))
+        torch.set_num_threads(threads)
+
+
+# --------------------------
+# Memory reporting
+# --------------------------
+def read_memory(pid):
+    """Memory counters of a process in kB (Rss, Pss, Shared_*, Private_*, Swap)"""
+    totals = dict.fromkeys(MEMORY_FIELDS, 0)
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        path = f"/proc/{pid}/smaps"  # kernels before 4.14: sum every mapping
+    with open(path) as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in totals:
+                totals[key] += int(rest.split()[0])
+    return totals
+
+
+def child_pids(pid):
+    """Direct children of a process"""
+    children_file = f"/proc/{pid}/task/{pid}/children"
+    if os.path.exists(children_file):
+        with open(children_file) as f:
+            return [int(p) for p in f.read().split()]
+
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # ppid is the 2nd field after the parenthesised command name
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def format_memory(pid, role, memory):
+    mb = {k: v / 1024 for k, v in memory.items()}
+    return (
+        f"{role:<8} pid {pid:<7} RSS {mb['Rss']:8.1f} MB  PSS {mb['Pss']:8.1f} MB  "
+        f"shared {mb['Shared_Clean'] + mb['Shared_Dirty']:8.1f} MB  "
+        f"private {mb['Private_Clean'] + mb['Private_Dirty']:8.1f} MB"
+    )
+
+
+def log_memory(role, pid=None):
+    pid = pid or os.getpid()
+    try:
+        logger.info("[PREFORK] %s", format_memory(pid, role, read_memory(pid)))
+    except OSError as e:
+        logger.debug("[PREFORK] Memory figures unavailable: %s", e)
+
+
+def memory_report(master_pid):
+    """[(pid, role, memory)] for a gunicorn master and its workers"""
+    rows = [(master_pid, "master", read_memory(master_pid))]
+    for pid in child_pids(master_pid):
+        try:
+            rows.append((pid, "worker", read_memory(pid)))
+        except OSError:
+            pass  # exited (e.g. recycled) while we were reading
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preforked server tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    memory = sub.add_parser("memory", help="per-process RSS/PSS of a gunicorn master and its workers")
+    memory.add_argument("--pid", type=int, required=True, help="gunicorn master pid")
+    args = parser.parse_args()
+
+    rows = memory_report(args.pid)
+    for pid, role, mem in rows:
+        print(format_memory(pid, role, mem))
+    total_rss = sum(mem["Rss"] for _, _, mem in rows) / 1024
+    total_pss = sum(mem["Pss"] for _, _, mem in rows) / 1024
+    print(f"total    {len(rows)} processes   RSS {total_rss:8.1f} MB  PSS {total_pss:8.1f} MB  "
+          f"(PSS is the real footprint; RSS counts shared pages once per process)")
@@ -0,0 +1,294 @@
+"""
+On-demand CPU and memory profiling for individual Flask requests.
+
+Profiling is opt-in twice over: it must be enabled in the app config
+(PROFILING_ENABLED, or MANGROVE_PROFILING=1 in the environment) and the
+request itself must ask for it with an `X-Profile: 1` header or a
+`?__profile=1` query flag. Requests that don't ask only pay for one config
+lookup.
+
+A profiled request gets:
+  - a sampling CPU profile of the handling thread (collapsed stacks that
+    flamegraph.pl / speedscope understand, plus a top-functions table)
+  - the peak traced memory and the allocation sites that grew during the
+    request (a tracemalloc snapshot diffed against one taken at its start)
+
+tracemalloc traces the whole process, so the peak covers every thread that
+allocated while the request ran, and allocations made concurrently by other
+requests can show up among the top sites.
+
+Each profile is written as JSON to the profiles/ directory and can be listed
+and downloaded from /admin/profiles, which requires MANGROVE_ADMIN_TOKEN to
+be set and sent back in the X-Admin-Token header.
+"""
+
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import Blueprint, current_app, g, jsonify, request, Response
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILES_DIR = os.path.join(BASE_DIR, "profiles")
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_FLAG = "__profile"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+_PROFILE_NAME_RE = re.compile(r"^[\w.-]+\.json$")
+
+# tracemalloc is process-wide, so only one request is profiled at a time.
+# Requests that ask while another profile is running are served normally.
+_profile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """Samples the call stack of one thread at a fixed interval from a helper thread"""
+
+    def __init__(self, thread_id, interval=0.005, max_depth=64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Stacks in the collapsed `frame;frame;frame count` format"""
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+    def top_functions(self, limit=25):
+        """Functions ranked by samples where they were on top of the stack (self) and anywhere (total)"""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [
+            {"function": name, "self_samples": own[name], "total_samples": total[name]}
+            for name, _ in total.most_common(limit)
+        ]
+
+
+def _wants_profile():
+    flag = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_FLAG)
+    return flag is not None and flag.lower() in ("1", "true", "yes", "on")
+
+
+def _start_profile():
+    if not current_app.config.get("PROFILING_ENABLED") or not _wants_profile():
+        return
+    if not _profile_lock.acquire(blocking=False):
+        logger.info("[PROFILE] Another request is being profiled, skipping %s", request.path)
+        return
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(current_app.config["PROFILING_TRACEMALLOC_FRAMES"])
+    else:
+        tracemalloc.reset_peak()
+    # Allocations made before the request are diffed away in _finish_profile
+    baseline = tracemalloc.take_snapshot()
+
+    profiler = SamplingProfiler(threading.get_ident(), current_app.config["PROFILING_INTERVAL"])
+    profile_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    g._profile = {
+        "id": profile_id,
+        "profiler": profiler,
+        "started_tracing": started_tracing,
+        "baseline": baseline,
+        "start": time.perf_counter(),
+        "status": None,
+    }
+    profiler.start()
+
+
+def _tag_response(response):
+    profile = g.get("_profile")
+    if profile is not None:
+        profile["status"] = response.status_code
+        response.headers["X-Profile-Id"] = profile["id"]
+    return response
+
+
+def _finish_profile(exc=None):
+    profile = g.pop("_profile", None)
+    if profile is None:
+        return
+    try:
+        duration = time.perf_counter() - profile["start"]
+        profiler = profile["profiler"]
+        profiler.stop()
+
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if profile["started_tracing"]:
+            tracemalloc.stop()
+
+        # The baseline snapshot's own memory is attributed to tracemalloc, not the request
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        growth = [
+            stat
+            for stat in snapshot.filter_traces(ignore).compare_to(profile["baseline"].filter_traces(ignore), "lineno")
+            if stat.size_diff > 0
+        ]
+        growth.sort(key=lambda stat: stat.size_diff, reverse=True)
+        top_limit = current_app.config["PROFILING_TOP_ALLOCATIONS"]
+        allocations = [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_bytes": stat.size_diff,
+                "count": stat.count_diff,
+            }
+            for stat in growth[:top_limit]
+        ]
+
+        payload = {
+            "id": profile["id"],
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": profile["status"] if exc is None else 500,
+            "error": str(exc) if exc is not None else None,
+            "duration_seconds": round(duration, 6),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "cpu": {
+                "interval_seconds": profiler.interval,
+                "samples": profiler.samples,
+                "top_functions": profiler.top_functions(),
+                "collapsed": profiler.collapsed(),
+            },
+            "memory": {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                # current and peak count the whole process; top_allocations is this request's growth
+                "peak_scope": "process",
+                "top_allocations": allocations,
+            },
+        }
+
+        profiles_dir = current_app.config["PROFILES_DIR"]
+        os.makedirs(profiles_dir, exist_ok=True)
+        endpoint = re.sub(r"[^\w-]", "_", request.endpoint or "unknown")
+        path = os.path.join(profiles_dir, f"{profile['id']}_{request.method}_{endpoint}.json")
+        with open(path, "w") as f:
+            json.dump(payload, f, indent=2)
+        logger.info("[PROFILE] %s %s profiled in %.3fs -> %s", request.method, request.path, duration, path)
+    except Exception as e:
+        logger.error("[PROFILE] Failed to write profile: %s", e)
+    finally:
+        _profile_lock.release()
+
+
+# --------------------------
+# Admin endpoints
+# --------------------------
+admin_bp = Blueprint("profiling_admin", __name__, url_prefix="/admin/profiles")
+
+
+@admin_bp.before_request
+def _check_admin():
+    if not current_app.config.get("PROFILING_ENABLED"):
+        return jsonify({"status": "error", "message": "Profiling is disabled"}), 404
+    # Profiles expose stack frames and allocation sites, so no token means no access
+    token = current_app.config.get("PROFILING_ADMIN_TOKEN")
+    if not token:
+        return jsonify({"status": "error", "message": "Set MANGROVE_ADMIN_TOKEN to use the profile endpoints"}), 403
+    if not hmac.compare_digest(request.headers.get(ADMIN_TOKEN_HEADER, ""), token):
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+
+@admin_bp.route("", methods=["GET"])
+def list_profiles():
+    profiles_dir = current_app.config["PROFILES_DIR"]
+    if not os.path.isdir(profiles_dir):
+        return jsonify({"status": "success", "data": []})
+
+    profiles = []
+    for name in sorted(os.listdir(profiles_dir), reverse=True):
+        if not _PROFILE_NAME_RE.match(name):
+            continue
+        path = os.path.join(profiles_dir, name)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({
+            "name": name,
+            "method": data.get("method"),
+            "path": data.get("path"),
+            "status": data.get("status"),
+            "duration_seconds": data.get("duration_seconds"),
+            "cpu_samples": data.get("cpu", {}).get("samples"),
+            "peak_memory_bytes": data.get("memory", {}).get("peak_bytes"),
+            "created_at": data.get("created_at"),
+        })
+    return jsonify({"status": "success", "data": profiles})
+
+
+@admin_bp.route("/<name>", methods=["GET"])
+def get_profile(name):
+    if not _PROFILE_NAME_RE.match(name):
+        return jsonify({"status": "error", "message": "Invalid profile name"}), 400
+    path = os.path.join(current_app.config["PROFILES_DIR"], name)
+    if not os.path.exists(path):
+        return jsonify({"status": "error", "message": "Profile not found"}), 404
+
+    with open(path) as f:
+        data = json.load(f)
+
+    # ?format=folded returns the collapsed stacks for flamegraph tools
+    if request.args.get("format") == "folded":
+        return Response("\n".join(data["cpu"]["collapsed"]) + "\n", mimetype="text/plain")
+    return jsonify({"status": "success", "data": data})
+
+
+def init_profiling(app):
+    """Register the profiling hooks and admin endpoints on a Flask app"""
+    app.config.setdefault("PROFILING_ENABLED", os.getenv("MANGROVE_PROFILING", "0") == "1")
+    app.config.setdefault("PROFILES_DIR", os.getenv("MANGROVE_PROFILES_DIR", PROFILES_DIR))
+    app.config.setdefault("PROFILING_INTERVAL", float(os.getenv("MANGROVE_PROFILING_INTERVAL", "0.005")))
+    app.config.setdefault("PROFILING_TRACEMALLOC_FRAMES", 1)
+    app.config.setdefault("PROFILING_TOP_ALLOCATIONS", 25)
+    app.config.setdefault("PROFILING_ADMIN_TOKEN", os.getenv("MANGROVE_ADMIN_TOKEN"))
+
+    app.before_request(_start_profile)
+    app.after_request(_tag_response)
+    app.teardown_request(_finish_profile)
+    app.register_blueprint(admin_bp)
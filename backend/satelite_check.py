@@ -1,4 +1,3 @@
-import ee
 import datetime
 
 # 🔹 Your Google Cloud project ID
@@ -12,6 +11,7 @@ def _initialize_ee():
     global _ee_initialized
     if not _ee_initialized:
         try:
+            import ee  # deferred: the earthengine-api import alone takes ~0.5 s
             ee.Initialize(project=PROJECT_ID)
             print("[INFO] Google Earth Engine initialized successfully with project ✅")
             _ee_initialized = True
@@ -55,6 +55,8 @@ def get_vegetation_change(latitude, longitude, use_enhanced=False):
         print("[WARN] Google Earth Engine not available, returning None")
         return None
         
+    import ee
+
     try:
         point = ee.Geometry.Point(longitude, latitude)
         area_of_interest = point.buffer(200)  # ~200m buffer around point
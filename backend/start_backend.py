@@ -7,24 +7,54 @@ print("=" * 50)
 print("MANGROVE WATCH BACKEND STARTUP")
 print("=" * 50)
 
+# --asgi serves the same API through uvicorn (see asgi_app.py)
+USE_ASGI = "--asgi" in sys.argv[1:]
+# --prod runs preforked gunicorn workers sharing one model copy (see gunicorn.conf.py)
+USE_PROD = "--prod" in sys.argv[1:]
+
 try:
     print("1. Setting up environment...")
     os.environ.setdefault('FLASK_ENV', 'development')
     print("   ✓ Environment configured")
     
-    print("2. Importing Flask app...")
-    from app import app
-    print("   ✓ Flask app imported successfully")
-    
-    print("3. Starting Flask server...")
-    print("   Server will be available at: http://127.0.0.1:5000")
-    print("   Debug mode: ON")
-    print("   CORS configured for frontend")
-    print("=" * 50)
-    print("BACKEND SERVER IS RUNNING!")
-    print("=" * 50)
-    
-    app.run(host="127.0.0.1", port=5000, debug=True)
+    if USE_PROD:
+        print("2. Starting gunicorn (config: gunicorn.conf.py)...")
+        print("=" * 50)
+        args = ["gunicorn", "-c", "gunicorn.conf.py"]
+        if USE_ASGI:
+            args += ["-k", "uvicorn.workers.UvicornWorker", "asgi_app:app"]
+        else:
+            args.append("app:app")
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        os.execvp(args[0], args)
+    elif USE_ASGI:
+        print("2. Importing ASGI app...")
+        import uvicorn
+        from asgi_app import app
+        print("   ✓ ASGI app imported successfully")
+
+        print("3. Starting uvicorn server...")
+        print("   Server will be available at: http://127.0.0.1:5000")
+        print("   CORS configured for frontend")
+        print("=" * 50)
+        print("BACKEND SERVER IS RUNNING!")
+        print("=" * 50)
+
+        uvicorn.run(app, host="127.0.0.1", port=5000)
+    else:
+        print("2. Importing Flask app...")
+        from app import app
+        print("   ✓ Flask app imported successfully")
+        
+        print("3. Starting Flask server...")
+        print("   Server will be available at: http://127.0.0.1:5000")
+        print("   Debug mode: ON")
+        print("   CORS configured for frontend")
+        print("=" * 50)
+        print("BACKEND SERVER IS RUNNING!")
+        print("=" * 50)
+        
+        app.run(host="127.0.0.1", port=5000, debug=True)
     
 except Exception as e:
     print(f"   ✗ Error starting backend: {e}")
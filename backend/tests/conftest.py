@@ -0,0 +1,107 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(TESTS_DIR)
+
+# Tests import the backend modules the same way app.py does, and share the
+# benchmark suite's fixtures (seed_database, make_gps_jpeg)
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import common  # noqa: E402
+import db  # noqa: E402
+
+SEED_ROWS = 600
+SEED_USERS = 5
+
+
+@pytest.fixture
+def seeded_db(tmp_path):
+    """A database at the latest schema with seed_database's reports, used by the db module"""
+    path = str(tmp_path / "mangrove_watch.db")
+    common.seed_database(path, SEED_ROWS, users=SEED_USERS)
+    previous = db.DB_PATH
+    db.configure(path)
+    yield path
+    db.configure(previous)
+
+
+def mutate_reports(seed=11, rounds=200):
+    """
+    Random inserts, updates and deletes on workflow_results through the db
+    module, touching every column the aggregate triggers watch
+    """
+    rng = random.Random(seed)
+    with db.connection() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM workflow_results")]
+
+    for _ in range(rounds):
+        action = rng.random()
+        if action < 0.25:
+            result = {
+                "label": rng.choice(common.LABELS + [None]),
+                "confidence": rng.choice([rng.random(), None]),
+                "latitude": 21.0 + rng.uniform(-1, 1),
+                "longitude": 72.6 + rng.uniform(-1, 1),
+                "satellite_vegetation_change": rng.choice([round(rng.uniform(-40, 40), 2), None]),
+            }
+            if rng.random() < 0.2:
+                result["latitude"] = result["longitude"] = None
+            ids.append(db.save_result(rng.randint(1, SEED_USERS), result))
+            continue
+
+        report_id = rng.choice(ids)
+        with db.transaction() as conn:
+            if action < 0.4:
+                conn.execute("DELETE FROM workflow_results WHERE id = ?", (report_id,))
+                ids.remove(report_id)
+            elif action < 0.5:
+                conn.execute("UPDATE workflow_results SET user_id = ? WHERE id = ?",
+                             (rng.randint(1, SEED_USERS), report_id))
+            elif action < 0.6:
+                conn.execute("UPDATE workflow_results SET label = ? WHERE id = ?",
+                             (rng.choice(common.LABELS + [None]), report_id))
+            elif action < 0.7:
+                conn.execute("UPDATE workflow_results SET confidence = ? WHERE id = ?",
+                             (rng.choice([rng.random(), None]), report_id))
+            elif action < 0.8:
+                # Moves the report to another day and week
+                conn.execute("UPDATE workflow_results SET created_at = datetime(created_at, ?) WHERE id = ?",
+                             (f"{rng.randint(-20, 20)} days", report_id))
+            elif action < 0.9:
+                conn.execute("UPDATE workflow_results SET latitude = ?, longitude = ? WHERE id = ?",
+                             (21.0 + rng.uniform(-1, 1), 72.6 + rng.uniform(-1, 1), report_id))
+            else:
+                text, document = db.satellite_record(round(rng.uniform(-40, 40), 2))
+                conn.execute(
+                    "UPDATE workflow_results SET satellite_vegetation_change = ?, satellite_json = ? WHERE id = ?",
+                    (str(text), document, report_id),
+                )
+
+
+def report_rows():
+    """Every workflow_results row as a dict, with the vegetation_change generated column"""
+    with db.connection() as conn:
+        rows = conn.execute("""
+            SELECT id, user_id, label, confidence, latitude, longitude, created_at,
+                   vegetation_change, satellite_json
+            FROM workflow_results
+        """).fetchall()
+    reports = [dict(row) for row in rows]
+    for report in reports:
+        # The generated column and the stored document must agree
+        document = json.loads(report.pop("satellite_json")) if report["satellite_json"] else {}
+        assert report["vegetation_change"] == document.get("vegetation_change")
+    return reports
+
+
+@pytest.fixture
+def mutated_db(seeded_db):
+    mutate_reports()
+    return seeded_db
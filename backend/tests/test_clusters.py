@@ -0,0 +1,81 @@
+import sqlite3
+from collections import defaultdict
+
+import pytest
+
+import db
+from conftest import report_rows
+
+
+def expected_clusters():
+    """report_clusters recomputed from workflow_results: {(zoom, cell_lat, cell_lon, label): [count, lat, lon]}"""
+    cells = defaultdict(lambda: [0, 0.0, 0.0])
+    for report in report_rows():
+        lat, lon = report["latitude"], report["longitude"]
+        if lat is None or lon is None:
+            continue
+        for zoom in range(db.CLUSTER_MAX_ZOOM + 1):
+            size = db.cluster_cell_degrees(zoom)
+            cell = cells[zoom, int((lat + 90) / size), int((lon + 180) / size), report["label"] or ""]
+            cell[0] += 1
+            cell[1] += lat
+            cell[2] += lon
+    return cells
+
+
+def stored_clusters(conn):
+    return {
+        tuple(row[:4]): list(row[4:])
+        for row in conn.execute(
+            "SELECT zoom, cell_lat, cell_lon, label, report_count, latitude_sum, longitude_sum FROM report_clusters"
+        )
+    }
+
+
+def assert_clusters_match(stored, expected):
+    # Emptied cells are deleted, not left at zero
+    assert set(stored) == set(expected)
+    for key, (count, lat_sum, lon_sum) in expected.items():
+        row = stored[key]
+        assert row[0] == count, key
+        assert row[1] == pytest.approx(lat_sum, abs=1e-6), key
+        assert row[2] == pytest.approx(lon_sum, abs=1e-6), key
+
+
+def test_clusters_after_seeding(seeded_db):
+    with db.connection() as conn:
+        assert_clusters_match(stored_clusters(conn), expected_clusters())
+
+
+def test_clusters_after_inserts_updates_and_deletes(mutated_db):
+    with db.connection() as conn:
+        assert_clusters_match(stored_clusters(conn), expected_clusters())
+
+
+def test_cells_nest_across_zoom_levels(mutated_db):
+    with db.connection() as conn:
+        stored = stored_clusters(conn)
+    totals = defaultdict(int)
+    for (zoom, cell_lat, cell_lon, label), (count, _, _) in stored.items():
+        if zoom > 0:
+            totals[zoom - 1, cell_lat // 2, cell_lon // 2, label] += count
+    for key, count in totals.items():
+        assert stored[key][0] == count, key
+
+
+def test_migration_backfill_matches_triggers(mutated_db):
+    conn = sqlite3.connect(mutated_db, isolation_level=None)
+    try:
+        maintained = stored_clusters(conn)
+        conn.execute("DELETE FROM report_clusters")
+        db._migration_report_clusters(conn)
+        assert_clusters_match(stored_clusters(conn), maintained)
+    finally:
+        conn.close()
+
+
+def test_get_report_clusters_counts_every_located_report(mutated_db):
+    located = [r for r in report_rows() if r["latitude"] is not None and r["longitude"] is not None]
+    for zoom in (0, 6, db.CLUSTER_MAX_ZOOM):
+        clusters = db.get_report_clusters(-90, -180, 90, 180, zoom)["clusters"]
+        assert sum(cluster["count"] for cluster in clusters) == len(located), zoom
@@ -0,0 +1,171 @@
+import sqlite3
+from collections import Counter, defaultdict
+
+import pytest
+
+import common
+import db
+from conftest import SEED_ROWS, SEED_USERS, mutate_reports, report_rows
+
+
+# --------------------------
+# Migrations
+# --------------------------
+def test_init_db_reaches_latest_version_and_is_idempotent(tmp_path):
+    path = str(tmp_path / "fresh.db")
+    db.init_db(path)
+    db.init_db(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRATIONS)
+    conn.close()
+
+
+def test_migrations_backfill_existing_reports(tmp_path):
+    # Reports written under the base schema, then every later migration applied on top
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    db.MIGRATIONS[0](conn)
+    conn.execute("PRAGMA user_version = 1")
+    conn.execute("INSERT INTO users (id, username, password_hash, email) VALUES (1, 'a', 'x', 'a@example.com')")
+    conn.executemany(
+        "INSERT INTO workflow_results (user_id, confidence, latitude, longitude, label, "
+        "satellite_vegetation_change, status, created_at) VALUES (1, ?, 21.1, 72.6, ?, ?, 'completed', ?)",
+        [(0.5, "healthy mangrove", "-20.5", "2025-01-01 10:00:00"),
+         (None, "dumping/trash", None, "2025-01-02 10:00:00")],
+    )
+    conn.close()
+
+    db.init_db(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRATIONS)
+    assert conn.execute(
+        "SELECT total_reports, confidence_sum, confidence_count, last_report_at FROM user_stats WHERE user_id = 1"
+    ).fetchone() == (2, 0.5, 1, "2025-01-02 10:00:00")
+    assert conn.execute(
+        "SELECT alert_level, vegetation_change FROM workflow_results WHERE satellite_vegetation_change = '-20.5'"
+    ).fetchone() == ("warning", -20.5)
+    conn.close()
+
+
+# --------------------------
+# user_stats triggers
+# --------------------------
+def expected_user_stats():
+    stats = defaultdict(lambda: {"total_reports": 0, "confidence_sum": 0.0, "confidence_count": 0,
+                                 "last_report_at": None})
+    labels = Counter()
+    for report in report_rows():
+        entry = stats[report["user_id"]]
+        entry["total_reports"] += 1
+        if report["confidence"] is not None:
+            entry["confidence_sum"] += report["confidence"]
+            entry["confidence_count"] += 1
+        entry["last_report_at"] = max(entry["last_report_at"] or "", report["created_at"])
+        if report["label"] is not None:
+            labels[report["user_id"], report["label"]] += 1
+    return stats, labels
+
+
+def assert_user_stats_consistent():
+    stats, labels = expected_user_stats()
+    with db.connection() as conn:
+        stored = {row["user_id"]: dict(row) for row in conn.execute("SELECT * FROM user_stats")}
+        stored_labels = {
+            (row["user_id"], row["label"]): row["report_count"]
+            for row in conn.execute("SELECT * FROM user_label_counts WHERE report_count != 0")
+        }
+
+    for user_id in set(stats) | set(stored):
+        expected = stats.get(user_id, {"total_reports": 0, "confidence_sum": 0.0, "confidence_count": 0,
+                                       "last_report_at": None})
+        row = stored[user_id]
+        assert row["total_reports"] == expected["total_reports"], user_id
+        assert row["confidence_count"] == expected["confidence_count"], user_id
+        assert row["confidence_sum"] == pytest.approx(expected["confidence_sum"], abs=1e-9), user_id
+        assert row["last_report_at"] == expected["last_report_at"], user_id
+    assert stored_labels == dict(labels)
+
+
+def test_user_stats_after_seeding(seeded_db):
+    assert_user_stats_consistent()
+    assert db.get_user_stats_version(1) is not None
+
+
+def test_user_stats_after_inserts_updates_and_deletes(seeded_db):
+    with db.connection() as conn:
+        versions = {row[0]: row[1] for row in conn.execute("SELECT user_id, version FROM user_stats")}
+    mutate_reports()
+    assert_user_stats_consistent()
+    with db.connection() as conn:
+        for user_id, version in conn.execute("SELECT user_id, version FROM user_stats"):
+            assert version > versions.get(user_id, 0)
+
+
+def test_user_stats_after_deleting_every_report(seeded_db):
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM workflow_results")
+    with db.connection() as conn:
+        assert conn.execute(
+            "SELECT COUNT(*) FROM user_stats WHERE total_reports != 0 OR confidence_count != 0 "
+            "OR last_report_at IS NOT NULL"
+        ).fetchone()[0] == 0
+    assert_user_stats_consistent()
+
+
+# --------------------------
+# Keyset pagination
+# --------------------------
+def walk_pages(user_id, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        reports, cursor = db.get_user_reports(user_id, limit=limit, cursor=cursor, **filters)
+        assert len(reports) <= limit
+        ids.extend(report["id"] for report in reports)
+        if cursor is None:
+            return ids
+
+
+def expected_ids(user_id, where="", params=()):
+    with db.connection() as conn:
+        return [row[0] for row in conn.execute(
+            f"SELECT id FROM workflow_results WHERE user_id = ? {where} ORDER BY created_at DESC, id DESC",
+            (user_id, *params),
+        )]
+
+
+@pytest.mark.parametrize("limit", [1, 7, 50, SEED_ROWS])
+def test_pagination_visits_every_report_once(seeded_db, limit):
+    ids = walk_pages(1, limit)
+    assert len(ids) == len(set(ids))
+    assert ids == expected_ids(1)
+    assert len(ids) == SEED_ROWS // SEED_USERS
+
+
+def test_pagination_breaks_created_at_ties_by_id(seeded_db):
+    # Whole pages of reports sharing one timestamp, straddling page boundaries
+    with db.transaction() as conn:
+        conn.execute("UPDATE workflow_results SET created_at = '2025-01-01 12:00:00' WHERE user_id = 2 AND id % 3 = 0")
+    ids = walk_pages(2, 10)
+    assert len(ids) == len(set(ids))
+    assert ids == expected_ids(2)
+
+
+def test_pagination_with_filters_and_concurrent_inserts(seeded_db):
+    label = common.LABELS[0]
+    first, cursor = db.get_user_reports(3, limit=5, label=label)
+    # Reports added after the first page are newer and must not shift later pages
+    added = {
+        db.save_result(3, {"label": label, "confidence": 0.9, "latitude": None, "longitude": None})
+        for _ in range(3)
+    }
+    ids = [report["id"] for report in first]
+    while cursor is not None:
+        page, cursor = db.get_user_reports(3, limit=5, cursor=cursor, label=label)
+        ids.extend(report["id"] for report in page)
+    assert ids == [i for i in expected_ids(3, "AND label = ?", (label,)) if i not in added]
+    assert all(report["label"] == label for report in db.get_user_reports(3, limit=200, label=label)[0])
+
+
+def test_invalid_cursor_is_rejected(seeded_db):
+    with pytest.raises(ValueError):
+        db.get_user_reports(1, cursor="not-a-cursor")
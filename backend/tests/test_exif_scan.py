@@ -0,0 +1,191 @@
+import io
+import os
+import struct
+
+import pytest
+
+import common
+import exif_scan
+from utils import get_gps_coordinates
+
+EXIF_HEADER = b"Exif\x00\x00"
+
+
+def app1_span(jpeg):
+    """(start, end) of the Exif APP1 segment, marker included"""
+    start = jpeg.index(EXIF_HEADER) - 4
+    assert jpeg[start:start + 2] == b"\xff\xe1"
+    (length,) = struct.unpack(">H", jpeg[start + 2:start + 4])
+    return start, start + 2 + length
+
+
+def with_payload(jpeg, payload, length=None):
+    """`jpeg` with its Exif APP1 payload replaced; `length` overrides the segment's length field"""
+    start, end = app1_span(jpeg)
+    segment = EXIF_HEADER + payload
+    length = len(segment) + 2 if length is None else length
+    return jpeg[:start] + b"\xff\xe1" + struct.pack(">H", length) + segment + jpeg[end:]
+
+
+def tiff_payload(jpeg):
+    start, end = app1_span(jpeg)
+    return jpeg[start + 4 + len(EXIF_HEADER):end]
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def gps_jpeg():
+    return common.make_gps_jpeg(21.123456, 72.654321, size=(64, 48))
+
+
+# --------------------------
+# read_gps
+# --------------------------
+@pytest.mark.parametrize("lat, lon", [(21.123456, 72.654321), (-33.8688, 151.2093), (40.7128, -74.006), (0.0, 0.0)])
+def test_read_gps_matches_pil(tmp_path, lat, lon):
+    path = write(tmp_path, "photo.jpg", common.make_gps_jpeg(lat, lon, size=(64, 48)))
+    found_lat, found_lon, timestamp = exif_scan.read_gps(path)
+    assert found_lat == pytest.approx(lat, abs=1e-5)
+    assert found_lon == pytest.approx(lon, abs=1e-5)
+    assert (found_lat, found_lon) == pytest.approx(get_gps_coordinates(path), abs=1e-5)
+    assert timestamp is None
+
+
+def test_read_gps_without_exif(tmp_path):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(buffer, "JPEG")
+    assert exif_scan.read_gps(write(tmp_path, "plain.jpg", buffer.getvalue())) == (None, None, None)
+
+
+def test_read_gps_skips_non_exif_app1(tmp_path, gps_jpeg):
+    # An XMP APP1 segment ahead of the Exif one
+    xmp = b"http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta/>"
+    data = gps_jpeg[:2] + b"\xff\xe1" + struct.pack(">H", len(xmp) + 2) + xmp + gps_jpeg[2:]
+    lat, lon, _ = exif_scan.read_gps(write(tmp_path, "xmp.jpg", data))
+    assert (lat, lon) == pytest.approx((21.123456, 72.654321), abs=1e-5)
+
+
+def test_read_gps_timestamp(tmp_path):
+    from PIL import Image
+
+    exif = Image.Exif()
+    exif[0x0132] = "2024:05:06 07:08:09"
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(buffer, "JPEG", exif=exif)
+    assert exif_scan.read_gps(write(tmp_path, "dated.jpg", buffer.getvalue())) == (None, None, "2024-05-06 07:08:09")
+
+
+# --------------------------
+# Truncated and malformed APP1 segments
+# --------------------------
+def test_truncated_files_never_raise(tmp_path, gps_jpeg):
+    start, end = app1_span(gps_jpeg)
+    complete = exif_scan.read_gps(write(tmp_path, "whole.jpg", gps_jpeg))
+    results = set()
+    for cut in list(range(0, end + 2)) + [len(gps_jpeg) // 2]:
+        result = exif_scan.read_gps(write(tmp_path, "cut.jpg", gps_jpeg[:cut]))
+        # Cut before the GPS values: nothing; after them: the full result
+        assert result in ((None, None, None), complete), cut
+        results.add(result)
+    assert results == {(None, None, None), complete}
+
+
+def test_segment_length_past_end_of_file(tmp_path, gps_jpeg):
+    start, end = app1_span(gps_jpeg)
+    data = gps_jpeg[:end - 10]  # the declared length runs past the end of the file
+    assert exif_scan.read_gps(write(tmp_path, "short.jpg", data)) == (None, None, None)
+
+
+@pytest.mark.parametrize("length", [0, 1])
+def test_segment_length_below_minimum(tmp_path, gps_jpeg, length):
+    # The length field counts itself, so values below 2 are invalid
+    data = with_payload(gps_jpeg, tiff_payload(gps_jpeg), length=length)
+    assert exif_scan.read_gps(write(tmp_path, "length.jpg", data)) == (None, None, None)
+
+
+def test_bad_byte_order(tmp_path, gps_jpeg):
+    data = with_payload(gps_jpeg, b"XX" + tiff_payload(gps_jpeg)[2:])
+    assert exif_scan.read_gps(write(tmp_path, "order.jpg", data)) == (None, None, None)
+
+
+def test_first_ifd_offset_out_of_range(tmp_path, gps_jpeg):
+    payload = tiff_payload(gps_jpeg)
+    order = "<" if payload[:2] == b"II" else ">"
+    data = with_payload(gps_jpeg, payload[:4] + struct.pack(order + "I", 0xFFFFFFF0) + payload[8:])
+    assert exif_scan.read_gps(write(tmp_path, "ifd.jpg", data)) == (None, None, None)
+
+
+def test_ifd_entry_count_past_end(tmp_path, gps_jpeg):
+    payload = tiff_payload(gps_jpeg)
+    order = "<" if payload[:2] == b"II" else ">"
+    (first_ifd,) = struct.unpack_from(order + "I", payload, 4)
+    broken = payload[:first_ifd] + struct.pack(order + "H", 0xFFFF) + payload[first_ifd + 2:]
+    assert exif_scan.read_gps(write(tmp_path, "count.jpg", with_payload(gps_jpeg, broken))) == (None, None, None)
+
+
+def test_zero_denominator_coordinates(tmp_path):
+    from PIL import Image
+    from PIL.TiffImagePlugin import IFDRational
+
+    exif = Image.Exif()
+    exif[0x8825] = {1: "N", 2: (IFDRational(21, 0), IFDRational(0), IFDRational(0)), 3: "E",
+                    4: (IFDRational(72), IFDRational(0), IFDRational(0))}
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(buffer, "JPEG", exif=exif)
+    lat, lon, _ = exif_scan.read_gps(write(tmp_path, "zero.jpg", buffer.getvalue()))
+    assert (lat, lon) == (None, None)
+
+
+def test_random_payload_corruption_never_raises(tmp_path, gps_jpeg):
+    import random
+
+    rng = random.Random(3)
+    payload = bytearray(tiff_payload(gps_jpeg))
+    for _ in range(300):
+        corrupted = bytearray(payload)
+        for _ in range(rng.randint(1, 8)):
+            corrupted[rng.randrange(len(corrupted))] = rng.randrange(256)
+        result = exif_scan.read_gps(write(tmp_path, "noise.jpg", with_payload(gps_jpeg, bytes(corrupted))))
+        assert len(result) == 3
+
+
+# --------------------------
+# Folder index
+# --------------------------
+def test_build_index_keeps_its_cache_outside_the_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(exif_scan, "INDEX_DIR", str(tmp_path / "cache"))
+    photos = tmp_path / "photos"
+    (photos / "sub").mkdir(parents=True)
+    (photos / "a.jpg").write_bytes(common.make_gps_jpeg(10.5, 20.25, size=(32, 32)))
+    (photos / "sub" / "b.jpg").write_bytes(common.make_gps_jpeg(-10.5, -20.25, size=(32, 32)))
+    (photos / "notes.txt").write_text("not a photo")
+
+    flat = exif_scan.build_index(str(photos), recursive=False)
+    assert set(flat) == {"a.jpg"}
+    nested = exif_scan.build_index(str(photos))
+    assert set(nested) == {"a.jpg", os.path.join("sub", "b.jpg")}
+    assert nested[os.path.join("sub", "b.jpg")][:2] == pytest.approx((-10.5, -20.25), abs=1e-5)
+
+    assert sorted(os.listdir(photos)) == ["a.jpg", "notes.txt", "sub"]
+    assert len(os.listdir(tmp_path / "cache")) == 2  # one index per recursion mode
+
+    # Unchanged files come from the index without being read again
+    reads = []
+    monkeypatch.setattr(exif_scan, "read_gps", lambda path: reads.append(path) or (None, None, None))
+    assert exif_scan.build_index(str(photos)) == nested
+    assert reads == []
+    (photos / "c.jpg").write_bytes(common.make_gps_jpeg(1.0, 2.0, size=(32, 32)))
+    exif_scan.build_index(str(photos))
+    assert reads == [str(photos / "c.jpg")]
+
+
+def test_group_by_location():
+    index = {"b.jpg": (21.00001, 72.0, None), "a.jpg": (21.00002, 72.0, None), "c.jpg": (None, None, None)}
+    assert exif_scan.group_by_location(index) == {(21.0, 72.0): ["a.jpg", "b.jpg"], None: ["c.jpg"]}
@@ -0,0 +1,53 @@
+import geocoding
+
+# GeoNames columns: id, name, asciiname, alternatenames, lat, lon, ..., country (8), admin1 (10), population (14)
+PLACES = [
+    (1255364, "Surat", "Surat", "Surate", 21.19594, 72.83023, "IN", "09", 4591246),
+    (1279233, "Ahmedabad", "Ahmedabad", "Amdavad", 23.02579, 72.58727, "IN", "09", 3719710),
+    (1275339, "Mumbai", "Mumbai", "Bombay", 19.07283, 72.88261, "IN", "16", 12691836),
+    (1626381, "Surat Thani", "Surat Thani", "", 9.14011, 99.33311, "TH", "60", 127201),
+]
+
+
+def geonames_row(place_id, name, ascii_name, alternates, lat, lon, country, admin1, population):
+    fields = [""] * 19
+    fields[:6] = str(place_id), name, ascii_name, alternates, str(lat), str(lon)
+    fields[8], fields[10], fields[14] = country, admin1, str(population)
+    return "\t".join(fields)
+
+
+def build(tmp_path, with_regions=True):
+    dump = tmp_path / "cities.txt"
+    dump.write_text("\n".join(geonames_row(*place) for place in PLACES) + "\n", encoding="utf-8")
+    if with_regions:
+        (tmp_path / "admin1CodesASCII.txt").write_text(
+            "IN.09\tGujarat\tGujarat\t1270770\nIN.16\tMaharashtra\tMaharashtra\t1264418\n"
+            "TH.60\tSurat Thani\tSurat Thani\t1150514\n", encoding="utf-8")
+        (tmp_path / "countryInfo.txt").write_text(
+            "#ISO\tISO3\tISO-Numeric\tfips\tCountry\n"
+            "IN\tIND\t356\tIN\tIndia\nTH\tTHA\t764\tTH\tThailand\n", encoding="utf-8")
+    path = str(tmp_path / "gazetteer.db")
+    assert geocoding.load_geonames(str(dump), path) == len(PLACES)
+    return geocoding.Gazetteer(path)
+
+
+def test_exact_and_alternate_names(tmp_path):
+    gazetteer = build(tmp_path)
+    assert gazetteer.lookup("surat") == (21.19594, 72.83023)
+    assert gazetteer.lookup("bombay") == (19.07283, 72.88261)
+    assert gazetteer.lookup("atlantis") is None
+
+
+def test_multi_word_queries_match_region_and_country(tmp_path):
+    gazetteer = build(tmp_path)
+    assert gazetteer.has_fts
+    assert gazetteer.lookup(geocoding.normalize_query("Surat, Gujarat")) == (21.19594, 72.83023)
+    assert gazetteer.lookup("surat india") == (21.19594, 72.83023)
+    assert gazetteer.lookup("surat thailand") == (9.14011, 99.33311)
+    assert gazetteer.lookup("ahmedabad maharashtra") is None
+
+
+def test_region_files_are_optional(tmp_path):
+    gazetteer = build(tmp_path, with_regions=False)
+    assert gazetteer.lookup("surat") == (21.19594, 72.83023)
+    assert gazetteer.lookup("surat gujarat") is None
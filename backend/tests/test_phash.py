@@ -0,0 +1,121 @@
+import io
+import itertools
+import random
+
+import pytest
+
+import phash
+from phash import CHUNK_BITS, CHUNKS, HashIndex
+
+BASE = 0x0123_4567_89AB_CDEF
+
+
+def flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def chunk_boundary_bits():
+    """The last bit of each chunk and the first bit of the next, plus both ends of the hash"""
+    bits = {0, CHUNKS * CHUNK_BITS - 1}
+    for chunk in range(1, CHUNKS):
+        bits.update((chunk * CHUNK_BITS - 1, chunk * CHUNK_BITS))
+    return sorted(bits)
+
+
+def spread(distance, per_chunk):
+    """`distance` flipped bits laid out as `per_chunk` flips in each chunk, at the chunks' edges"""
+    bits = []
+    for chunk, count in enumerate(per_chunk):
+        low = chunk * CHUNK_BITS
+        # Outermost bits first: low, high, low + 1, high - 1, ...
+        edges = [low + (i // 2 if i % 2 == 0 else CHUNK_BITS - 1 - i // 2) for i in range(CHUNK_BITS)]
+        bits.extend(edges[:count])
+    assert len(bits) == distance
+    return bits
+
+
+@pytest.mark.parametrize("bits", [
+    list(combo) for size in (1, 2, 3) for combo in itertools.combinations(chunk_boundary_bits(), size)
+])
+def test_flips_at_chunk_boundaries_are_found(bits):
+    index = HashIndex(max_distance=6)
+    index.add(BASE, "stored")
+    assert index.find(flip(BASE, bits)) == ("stored", BASE, len(bits))
+
+
+@pytest.mark.parametrize("max_distance, per_chunk", [
+    (6, (2, 2, 1, 1)),
+    (6, (2, 2, 2, 0)),
+    (6, (6, 0, 0, 0)),
+    (7, (2, 2, 2, 1)),
+    (7, (1, 2, 2, 2)),
+    (8, (3, 3, 2, 0)),
+    (11, (3, 3, 3, 2)),
+])
+def test_worst_case_spreads_within_max_distance(max_distance, per_chunk):
+    # Every spread of max_distance flips leaves some chunk within max_distance // CHUNKS flips
+    distance = sum(per_chunk)
+    index = HashIndex(max_distance=max_distance)
+    index.add(BASE, "stored")
+    assert index.find(flip(BASE, spread(distance, per_chunk))) == ("stored", BASE, distance)
+
+
+@pytest.mark.parametrize("per_chunk", [(2, 2, 2, 1), (7, 0, 0, 0), (2, 2, 2, 2)])
+def test_beyond_max_distance_is_not_found(per_chunk):
+    index = HashIndex(max_distance=6)
+    index.add(BASE, "stored")
+    assert index.find(flip(BASE, spread(sum(per_chunk), per_chunk))) is None
+
+
+def test_matches_brute_force_search():
+    rng = random.Random(5)
+    index = HashIndex(max_distance=6)
+    stored = [rng.getrandbits(64) for _ in range(500)]
+    for i, value in enumerate(stored):
+        index.add(value, i)
+
+    for _ in range(2000):
+        base = rng.choice(stored)
+        query = flip(base, rng.sample(range(64), rng.randint(0, 9)))
+        best = min(phash.distance(query, value) for value in stored)
+        match = index.find(query)
+        if best <= 6:
+            assert match is not None and match[2] == best
+            assert phash.distance(query, match[1]) == best
+        else:
+            assert match is None
+
+
+def test_eviction_removes_old_entries_from_every_table():
+    index = HashIndex(max_distance=6, max_entries=3)
+    values = [BASE, BASE ^ (0xFFFF << 16), BASE ^ (0xFFFF << 32), BASE ^ (0xFFFF << 48)]
+    for i, value in enumerate(values):
+        index.add(value, i)
+    assert len(index) == 3
+    assert index.find(BASE) is None
+    assert index.find(values[-1]) == (3, values[-1], 0)
+    assert all(key in index._entries for table in index._tables for keys in table.values() for key in keys)
+
+
+def test_radius_limits_matches_between_located_entries():
+    index = HashIndex(max_distance=6, radius_m=100)
+    index.add(BASE, "here", 21.0, 72.0)
+    assert index.find(BASE, 21.0005, 72.0) == ("here", BASE, 0)  # about 55 m away
+    assert index.find(BASE, 21.01, 72.0) is None  # about 1.1 km away
+    assert index.find(BASE) == ("here", BASE, 0)  # no location: hash only
+
+
+def test_reencoded_photo_is_a_near_duplicate():
+    from PIL import Image
+
+    image = Image.effect_noise((256, 256), 40).convert("RGB").resize((512, 512))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=60)
+    reencoded = Image.open(io.BytesIO(buffer.getvalue()))
+    other = Image.effect_noise((256, 256), 40).convert("RGB").transpose(Image.Transpose.ROTATE_90)
+
+    value = phash.compute(image)
+    assert phash.distance(value, phash.compute(reencoded)) <= 6
+    assert phash.distance(value, phash.compute(other)) > 6
@@ -0,0 +1,90 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pytest
+
+import db
+from conftest import report_rows
+
+PERIODS = {
+    "report_rollup_day": lambda created_at: created_at[:10],
+    "report_rollup_week": lambda created_at: db._week_start(created_at[:10]),
+}
+
+
+def expected_rollups(table):
+    """The rollup table recomputed from workflow_results: {(period, cell_lat, cell_lon, label): sums}"""
+    buckets = defaultdict(lambda: [0, 0.0, 0, 0.0, 0])
+    for report in report_rows():
+        if report["latitude"] is None or report["longitude"] is None or report["created_at"] is None:
+            continue
+        key = (PERIODS[table](report["created_at"]), *db._rollup_cell(report["latitude"], report["longitude"]),
+               report["label"] or "")
+        bucket = buckets[key]
+        bucket[0] += 1
+        if report["confidence"] is not None:
+            bucket[1] += report["confidence"]
+            bucket[2] += 1
+        if report["vegetation_change"] is not None:
+            bucket[3] += report["vegetation_change"]
+            bucket[4] += 1
+    return buckets
+
+
+def assert_rollups_consistent():
+    for table in db.ROLLUP_PERIODS:
+        expected = expected_rollups(table)
+        with db.connection() as conn:
+            stored = {
+                tuple(row[:4]): list(row[4:])
+                for row in conn.execute(
+                    f"SELECT period, cell_lat, cell_lon, label, report_count, confidence_sum, confidence_count, "
+                    f"vegetation_sum, vegetation_count FROM {table}"
+                )
+            }
+        # Emptied buckets are deleted, not left at zero
+        assert set(stored) == set(expected), table
+        for key, (count, confidence_sum, confidence_count, vegetation_sum, vegetation_count) in expected.items():
+            row = stored[key]
+            assert (row[0], row[2], row[4]) == (count, confidence_count, vegetation_count), (table, key)
+            assert row[1] == pytest.approx(confidence_sum, abs=1e-9), (table, key)
+            assert row[3] == pytest.approx(vegetation_sum, abs=1e-9), (table, key)
+
+
+def test_rollups_after_seeding(seeded_db):
+    assert_rollups_consistent()
+
+
+def test_rollups_after_inserts_updates_and_deletes(mutated_db):
+    assert_rollups_consistent()
+
+
+def test_weekly_rollup_periods_start_on_monday(seeded_db):
+    with db.transaction() as conn:
+        # A Sunday and the Monday after it fall in different weeks
+        conn.execute("UPDATE workflow_results SET created_at = '2025-03-09 23:59:59' WHERE id = 1")
+        conn.execute("UPDATE workflow_results SET created_at = '2025-03-10 00:00:00' WHERE id = 2")
+    with db.connection() as conn:
+        periods = {row[0] for row in conn.execute("SELECT period FROM report_rollup_week")}
+    assert "2025-03-03" in periods and "2025-03-10" in periods
+    assert_rollups_consistent()
+
+
+def test_get_rollups_totals_match_reports(mutated_db):
+    located = [r for r in report_rows() if r["latitude"] is not None and r["longitude"] is not None]
+    since = min(r["created_at"] for r in located)[:10]
+    until = max(r["created_at"] for r in located)[:10]
+    confidences = [r["confidence"] for r in located if r["confidence"] is not None]
+    for bucket in db.ROLLUP_BUCKETS:
+        totals = db.get_rollups(since=since, until=until, bucket=bucket)["totals"]
+        assert totals["report_count"] == len(located), bucket
+        assert totals["mean_confidence"] == pytest.approx(sum(confidences) / len(confidences), abs=1e-4), bucket
+
+
+def test_get_rollups_rejects_overlong_ranges(seeded_db):
+    since = date(2020, 1, 1)
+    until = (since + timedelta(days=db.ROLLUP_MAX_RANGE_DAYS - 1)).isoformat()
+    assert db.get_rollups(since=since.isoformat(), until=until, bucket="week")["until"] <= until
+    for bucket in db.ROLLUP_BUCKETS:
+        with pytest.raises(ValueError):
+            db.get_rollups(since="0001-01-01", until="9999-12-31", bucket=bucket)
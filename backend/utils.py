@@ -24,11 +24,15 @@ def get_gps_coordinates(image_path):
         if not gps_info:
             return None
 
+        def to_float(x):
+            # Pillow >= 7 gives IFDRational; older versions (num, den) tuples
+            if isinstance(x, tuple):
+                return float(x[0]) / float(x[1])
+            return float(x)
+
         def convert_to_degrees(value):
             d, m, s = value
-            return float(d[0]) / float(d[1]) + \
-                   (float(m[0]) / float(m[1]) / 60.0) + \
-                   (float(s[0]) / float(s[1]) / 3600.0)
+            return to_float(d) + to_float(m) / 60.0 + to_float(s) / 3600.0
 
         lat = convert_to_degrees(gps_info["GPSLatitude"])
         if gps_info["GPSLatitudeRef"] != "N":
@@ -0,0 +1,177 @@
+"""
+Vegetation indices computed locally from an uploaded photo.
+
+Gives every photo report a vegetation signal straight away, without
+waiting for (or when there is no) Earth Engine comparison:
+  - multispectral images with a near-infrared band get NDVI,
+    (NIR - Red) / (NIR + Red)
+  - every image gets the RGB indices ExG (excess green on chromatic
+    coordinates, 2g - r - b) and VARI, (G - R) / (G + R - B)
+  - canopy cover is the fraction of pixels above a vegetation threshold
+    (NDVI when available, ExG otherwise)
+
+Pixels are processed CHUNK_ROWS rows at a time, so a large frame never
+has more than one strip converted to float32 at once. JPEGs are
+DCT-downscaled while decoding and any image is box-reduced to about
+ANALYSIS_SIDE pixels on its shorter side first: whole-frame averages and
+cover fractions don't need 12 MP.
+
+A NIR band is recognised in 4-band TIFFs whose fourth sample is declared
+"unspecified" rather than alpha (how multispectral cameras export
+R-G-B-NIR composites). Pillow drops that sample while decoding, so these
+files are read with tifffile (optional; without it they get the RGB
+indices). MANGROVE_NIR_CHANNEL forces a band index of what Pillow decodes
+instead.
+"""
+
+import logging
+import os
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 256
+ANALYSIS_SIDE = 512
+NDVI_CANOPY_THRESHOLD = 0.3
+EXG_CANOPY_THRESHOLD = 0.05
+NIR_CHANNEL = os.getenv("MANGROVE_NIR_CHANNEL", "")  # band index; empty = detect
+
+TIFF_SAMPLES_PER_PIXEL = 277
+TIFF_EXTRA_SAMPLES = 338
+EXTRA_SAMPLE_UNSPECIFIED = 0
+
+
+def _tiff_tag(image, tag):
+    value = image.tag_v2.get(tag) if hasattr(image, "tag_v2") else None
+    if isinstance(value, tuple):
+        value = value[0] if value else None
+    return value
+
+
+def is_multispectral_tiff(image):
+    """Whether an opened image is an R-G-B-NIR TIFF (fourth sample "unspecified", not alpha)"""
+    return (_tiff_tag(image, TIFF_SAMPLES_PER_PIXEL) == 4
+            and _tiff_tag(image, TIFF_EXTRA_SAMPLES) == EXTRA_SAMPLE_UNSPECIFIED)
+
+
+def read_bands(path):
+    """(height, width, bands) array of a TIFF's first image, or None without tifffile"""
+    try:
+        import tifffile
+    except ImportError:
+        logger.info("[VEGETATION] tifffile is not installed; NIR band of %s ignored", path)
+        return None
+    with tifffile.TiffFile(path) as tif:
+        page = tif.pages[0]
+        bands = page.asarray()
+        if page.axes.startswith("S"):  # planar: one plane per band
+            bands = np.moveaxis(bands, 0, -1)
+    return bands if bands.ndim == 3 else None
+
+
+def nir_channel(image):
+    """Index of a near-infrared band among the bands Pillow decodes (MANGROVE_NIR_CHANNEL), or None"""
+    if NIR_CHANNEL:
+        index = int(NIR_CHANNEL)
+        return index if 3 <= index < len(image.getbands()) else None
+    return None
+
+
+def compute(image, nir=None, chunk_rows=CHUNK_ROWS):
+    """
+    Indices for a PIL image, or a (height, width, bands) array; `nir` is
+    the index of its NIR band, if any. Returns {"method": "ndvi" | "rgb",
+    "ndvi", "exg", "vari", "canopy_cover", "pixels"} (means over valid
+    pixels, ndvi None for RGB), or None when the image has no usable pixels.
+    """
+    if isinstance(image, np.ndarray):
+        factor = -(-min(image.shape[:2]) // ANALYSIS_SIDE)
+        rows = image[::factor, ::factor] if factor > 1 else image
+        height, width = rows.shape[:2]
+        has_alpha = False
+
+        def strip(top):
+            return rows[top:top + chunk_rows].astype(np.float32)
+    else:
+        if nir is None and image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        factor = -(-min(image.size) // ANALYSIS_SIDE)
+        if factor > 1:
+            image = image.reduce(factor)
+        has_alpha = nir is None and image.mode == "RGBA"
+        width, height = image.size
+
+        def strip(top):
+            return np.asarray(image.crop((0, top, width, min(height, top + chunk_rows))), dtype=np.float32)
+
+    pixels = vari_pixels = ndvi_pixels = canopy = 0
+    exg_sum = vari_sum = ndvi_sum = 0.0
+    for top in range(0, height, chunk_rows):
+        chunk = strip(top)
+        r, g, b = chunk[..., 0], chunk[..., 1], chunk[..., 2]
+        total = r + g + b
+        valid = total > 0
+        if has_alpha:
+            valid &= chunk[..., 3] > 0
+        pixels += int(np.count_nonzero(valid))
+
+        exg = 2 * g
+        exg -= r
+        exg -= b
+        np.divide(exg, total, out=exg, where=valid)
+        exg_sum += float(exg.sum(where=valid))
+
+        vari_den = g + r
+        vari_den -= b
+        vari_valid = valid & (np.abs(vari_den) > 1e-6)
+        vari = g - r
+        np.divide(vari, vari_den, out=vari, where=vari_valid)
+        np.clip(vari, -1, 1, out=vari)
+        vari_pixels += int(np.count_nonzero(vari_valid))
+        vari_sum += float(vari.sum(where=vari_valid))
+
+        if nir is not None:
+            n = chunk[..., nir]
+            ndvi_den = n + r
+            ndvi_valid = valid & (ndvi_den > 0)
+            ndvi = n - r
+            np.divide(ndvi, ndvi_den, out=ndvi, where=ndvi_valid)
+            ndvi_pixels += int(np.count_nonzero(ndvi_valid))
+            ndvi_sum += float(ndvi.sum(where=ndvi_valid))
+            canopy += int(np.count_nonzero(ndvi_valid & (ndvi > NDVI_CANOPY_THRESHOLD)))
+        else:
+            canopy += int(np.count_nonzero(valid & (exg > EXG_CANOPY_THRESHOLD)))
+
+    if not pixels:
+        return None
+    return {
+        "method": "ndvi" if nir is not None else "rgb",
+        "ndvi": round(ndvi_sum / ndvi_pixels, 4) if ndvi_pixels else None,
+        "exg": round(exg_sum / pixels, 4),
+        "vari": round(vari_sum / vari_pixels, 4) if vari_pixels else None,
+        "canopy_cover": round(canopy / pixels, 4),
+        "pixels": pixels,
+    }
+
+
+def analyze_path(path):
+    """compute() for an image file, using its NIR band when it has one"""
+    with Image.open(path) as image:
+        if is_multispectral_tiff(image) and not NIR_CHANNEL:
+            bands = read_bands(path)
+            if bands is not None and bands.shape[2] >= 4:
+                return compute(bands, nir=3)
+        nir = nir_channel(image)
+        if nir is None:
+            image.draft("RGB", (ANALYSIS_SIDE, ANALYSIS_SIDE))  # no-op for formats without reduced decoding
+        return compute(image, nir)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    for path in sys.argv[1:]:
+        print(path, json.dumps(analyze_path(path)))
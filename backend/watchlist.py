@@ -0,0 +1,443 @@
+"""
+Watchlist of monitored mangrove sites with a scene-aware scheduler.
+
+Sites are points (with a buffer radius) or polygons. Checking one costs a
+single Earth Engine metadata query listing the Sentinel-2 scenes over the
+site; the NDVI change is recomputed only when that list changed since the
+last evaluation, i.e. when a new acquisition arrived (or a late one was
+ingested). The before/after windows are anchored at the newest scene
+rather than at "now", so the same scenes always give the same result and
+a site with no new data needs no recomputation.
+
+Every recomputation is stored in watch_evaluations; a change of
+alert_level (same thresholds as enhanced_vegetation_analysis's short-term
+change) is recorded in watch_alerts.
+
+Sites are claimed with a lease before they are evaluated, so several
+scheduler processes can share the table:
+
+    python watchlist.py add --name "Surat creek" --lat 21.17 --lon 72.83 --radius 300
+    python watchlist.py add --name "Olpad block" --polygon "72.70,21.30;72.75,21.30;72.75,21.34"
+    python watchlist.py run                  # scheduler loop
+    python watchlist.py run --once           # evaluate what is due and exit
+    python watchlist.py history 1
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RADIUS_M = 200.0  # same buffer as satelite_check
+DEFAULT_INTERVAL_HOURS = 24.0
+WINDOW_DAYS = 30  # before and after windows, as in satelite_check
+LOOKBACK_DAYS = 120  # how far back the newest scene is searched for
+MAX_CLOUD_PERCENT = 50
+WORKERS = int(os.getenv("MANGROVE_WATCHLIST_WORKERS", "4"))
+POLL_SECONDS = float(os.getenv("MANGROVE_WATCHLIST_POLL_SECONDS", "60"))
+LEASE_MINUTES = 30  # a claimed site is skipped by other schedulers this long
+RETRY_MINUTES = 60  # after a failed check
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class WatchlistError(ValueError):
+    """Invalid site definition"""
+
+
+class SceneSourceError(RuntimeError):
+    """The scene catalogue could not be queried"""
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _format(moment):
+    return moment.strftime(TIME_FORMAT) if moment else None
+
+
+def alert_level_for(change):
+    """Alert level of a short-term NDVI change in percent, None when there is no change"""
+    return None if change is None else db.vegetation_alert_level(change)
+
+
+# --------------------------
+# Scene source
+# --------------------------
+class EarthEngineScenes:
+    """Sentinel-2 scene catalogue and NDVI for watch sites"""
+
+    COLLECTION = "COPERNICUS/S2_SR_HARMONIZED"
+
+    def _ee(self):
+        from satelite_check import _initialize_ee
+
+        if not _initialize_ee():
+            raise SceneSourceError("Google Earth Engine not available")
+        import ee
+        return ee
+
+    def _region(self, ee, site):
+        if site["polygon"]:
+            return ee.Geometry.Polygon([json.loads(site["polygon"])])
+        return ee.Geometry.Point(site["longitude"], site["latitude"]).buffer(site["radius_m"] or DEFAULT_RADIUS_M)
+
+    def _collection(self, ee, region, start, end):
+        return (
+            ee.ImageCollection(self.COLLECTION)
+            .filterBounds(region)
+            .filterDate(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+            .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", MAX_CLOUD_PERCENT))
+        )
+
+    def list_scenes(self, site, start, end):
+        """[(scene id, acquired at)] between start and end; metadata only, no pixels are read"""
+        ee = self._ee()
+        collection = self._collection(ee, self._region(ee, site), start, end)
+        info = ee.Dictionary({
+            "ids": collection.aggregate_array("system:index"),
+            "times": collection.aggregate_array("system:time_start"),
+        }).getInfo()
+        return [
+            (scene_id, datetime.datetime.fromtimestamp(ms / 1000, datetime.timezone.utc).replace(tzinfo=None))
+            for scene_id, ms in zip(info["ids"], info["times"])
+        ]
+
+    def ndvi_pair(self, site, before, after):
+        """Mean NDVI over the site for the before and after (start, end) windows, in one round trip"""
+        ee = self._ee()
+        region = self._region(ee, site)
+
+        def mean_ndvi(window):
+            image = self._collection(ee, region, *window).median()
+            return image.normalizedDifference(["B8", "B4"]).rename("NDVI").reduceRegion(
+                reducer=ee.Reducer.mean(), geometry=region, scale=10, maxPixels=1e9
+            ).get("NDVI")
+
+        info = ee.Dictionary({"before": mean_ndvi(before), "after": mean_ndvi(after)}).getInfo()
+        return info.get("before"), info.get("after")
+
+
+_source = None
+
+
+def get_source():
+    global _source
+    if _source is None:
+        _source = EarthEngineScenes()
+    return _source
+
+
+def configure(source=None):
+    """Swap the scene source (stand-ins in tests and load tests)"""
+    global _source
+    _source = source
+
+
+# --------------------------
+# Sites
+# --------------------------
+INSERT_SITE_SQL = """
+    INSERT INTO watch_sites (name, latitude, longitude, radius_m, polygon, check_interval_hours)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SELECT_SITES_SQL = "SELECT * FROM watch_sites WHERE active = 1 ORDER BY id"
+SELECT_SITE_SQL = "SELECT * FROM watch_sites WHERE id = ?"
+SELECT_DUE_SQL = """
+    SELECT * FROM watch_sites
+    WHERE active = 1 AND next_check_at <= ?
+    ORDER BY next_check_at
+    LIMIT ?
+"""
+LEASE_SITE_SQL = "UPDATE watch_sites SET next_check_at = ? WHERE id = ?"
+TOUCH_SITE_SQL = "UPDATE watch_sites SET last_checked_at = ?, next_check_at = ? WHERE id = ?"
+UPDATE_EVALUATED_SITE_SQL = """
+    UPDATE watch_sites
+    SET scene_fingerprint = ?, latest_scene_at = ?, alert_level = COALESCE(?, alert_level),
+        last_checked_at = ?, next_check_at = ?
+    WHERE id = ?
+"""
+INSERT_EVALUATION_SQL = """
+    INSERT INTO watch_evaluations (site_id, scene_fingerprint, scene_count, latest_scene_at,
+                                   ndvi_before, ndvi_after, vegetation_change, alert_level)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_ALERT_SQL = """
+    INSERT INTO watch_alerts (site_id, evaluation_id, previous_level, alert_level, vegetation_change)
+    VALUES (?, ?, ?, ?, ?)
+"""
+SELECT_HISTORY_SQL = """
+    SELECT id, scene_count, latest_scene_at, ndvi_before, ndvi_after, vegetation_change, alert_level, created_at
+    FROM watch_evaluations WHERE site_id = ? ORDER BY id DESC LIMIT ?
+"""
+SELECT_ALERTS_SQL = """
+    SELECT a.id, a.site_id, s.name AS site_name, a.previous_level, a.alert_level,
+           a.vegetation_change, a.acknowledged, a.created_at
+    FROM watch_alerts a JOIN watch_sites s ON s.id = a.site_id
+    WHERE (? = 0 OR a.acknowledged = 0)
+    ORDER BY a.id DESC LIMIT ?
+"""
+
+
+def add_site(name, lat=None, lon=None, radius_m=None, polygon=None, interval_hours=DEFAULT_INTERVAL_HOURS):
+    """
+    Add a point site (lat, lon, optional radius_m) or a polygon site
+    (polygon: [[lon, lat], ...], at least 3 vertices). Returns the site id;
+    the first check is due immediately.
+    """
+    name = (name or "").strip()
+    if not name:
+        raise WatchlistError("name is required")
+    if not interval_hours or interval_hours <= 0:
+        raise WatchlistError("interval_hours must be positive")
+
+    if polygon is not None:
+        try:
+            vertices = [(float(v[0]), float(v[1])) for v in polygon]
+        except (TypeError, ValueError, IndexError):
+            raise WatchlistError("polygon must be a list of [lon, lat] pairs")
+        if len(vertices) < 3:
+            raise WatchlistError("polygon needs at least 3 vertices")
+        if not all(-180 <= x <= 180 and -90 <= y <= 90 for x, y in vertices):
+            raise WatchlistError("polygon vertices must be valid [lon, lat] pairs")
+        # Centroid of the vertices: where the site shows on the map
+        lon = sum(x for x, _ in vertices) / len(vertices)
+        lat = sum(y for _, y in vertices) / len(vertices)
+        polygon_json, radius_m = json.dumps([list(v) for v in vertices]), None
+    else:
+        if lat is None or lon is None:
+            raise WatchlistError("lat and lon (or polygon) are required")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise WatchlistError("lat/lon out of range")
+        radius_m = float(radius_m) if radius_m else DEFAULT_RADIUS_M
+        if not 10 <= radius_m <= 10000:
+            raise WatchlistError("radius_m must be between 10 and 10000")
+        polygon_json = None
+
+    with db.transaction() as conn:
+        return conn.execute(
+            INSERT_SITE_SQL, (name, lat, lon, radius_m, polygon_json, float(interval_hours))
+        ).lastrowid
+
+
+def _site_dict(row):
+    site = dict(row)
+    site["polygon"] = json.loads(site["polygon"]) if site["polygon"] else None
+    site.pop("scene_fingerprint", None)
+    return site
+
+
+def list_sites():
+    with db.connection() as conn:
+        return [_site_dict(row) for row in conn.execute(SELECT_SITES_SQL)]
+
+
+def get_site(site_id):
+    with db.connection() as conn:
+        row = conn.execute(SELECT_SITE_SQL, (site_id,)).fetchone()
+    return _site_dict(row) if row else None
+
+
+def remove_site(site_id):
+    """Delete a site with its history and alerts; returns whether it existed"""
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM watch_alerts WHERE site_id = ?", (site_id,))
+        conn.execute("DELETE FROM watch_evaluations WHERE site_id = ?", (site_id,))
+        return conn.execute("DELETE FROM watch_sites WHERE id = ?", (site_id,)).rowcount > 0
+
+
+def schedule_now(site_id):
+    """Make a site due at the scheduler's next pass; returns whether it exists"""
+    with db.transaction() as conn:
+        return conn.execute(
+            "UPDATE watch_sites SET next_check_at = ? WHERE id = ? AND active = 1", (_format(utcnow()), site_id)
+        ).rowcount > 0
+
+
+def get_history(site_id, limit=50):
+    with db.connection() as conn:
+        return [dict(row) for row in conn.execute(SELECT_HISTORY_SQL, (site_id, limit))]
+
+
+def get_alerts(unacknowledged=False, limit=100):
+    with db.connection() as conn:
+        return [dict(row) for row in conn.execute(SELECT_ALERTS_SQL, (1 if unacknowledged else 0, limit))]
+
+
+def acknowledge_alert(alert_id):
+    with db.transaction() as conn:
+        return conn.execute("UPDATE watch_alerts SET acknowledged = 1 WHERE id = ?", (alert_id,)).rowcount > 0
+
+
+# --------------------------
+# Evaluation
+# --------------------------
+def scene_fingerprint(scenes):
+    return hashlib.sha1("\n".join(sorted(scene_id for scene_id, _ in scenes)).encode()).hexdigest()[:16]
+
+
+def evaluate_site(site, source=None, now=None):
+    """
+    Check one site (a watch_sites row). Returns "evaluated", "unchanged"
+    (no new scenes, nothing recomputed) or "no_scenes".
+    """
+    source = source or get_source()
+    now = now or utcnow()
+    next_check = _format(now + datetime.timedelta(hours=site["check_interval_hours"]))
+
+    scenes = source.list_scenes(site, now - datetime.timedelta(days=LOOKBACK_DAYS), now + datetime.timedelta(days=1))
+    if not scenes:
+        with db.transaction() as conn:
+            conn.execute(TOUCH_SITE_SQL, (_format(now), next_check, site["id"]))
+        return "no_scenes"
+
+    newest = max(acquired for _, acquired in scenes)
+    window = datetime.timedelta(days=WINDOW_DAYS)
+    used = [(scene_id, acquired) for scene_id, acquired in scenes if acquired > newest - 2 * window]
+    fingerprint = scene_fingerprint(used)
+    if fingerprint == site["scene_fingerprint"]:
+        with db.transaction() as conn:
+            conn.execute(TOUCH_SITE_SQL, (_format(now), next_check, site["id"]))
+        return "unchanged"
+
+    # filterDate ends are exclusive: +1 day keeps the newest scene in
+    end = newest + datetime.timedelta(days=1)
+    ndvi_before, ndvi_after = source.ndvi_pair(site, (end - 2 * window, end - window), (end - window, end))
+    change = None
+    if ndvi_before and ndvi_after is not None:
+        change = round((ndvi_after - ndvi_before) / ndvi_before * 100, 2)
+    level = alert_level_for(change)
+
+    with db.transaction() as conn:
+        evaluation_id = conn.execute(INSERT_EVALUATION_SQL, (
+            site["id"], fingerprint, len(used), _format(newest), ndvi_before, ndvi_after, change, level,
+        )).lastrowid
+        previous = site["alert_level"]
+        if level is not None and level != previous and (previous is not None or level != "normal"):
+            conn.execute(INSERT_ALERT_SQL, (site["id"], evaluation_id, previous, level, change))
+            logger.warning(f"[WATCH] Site {site['id']} ({site['name']}): alert level {previous} -> {level} ({change}%)")
+        conn.execute(UPDATE_EVALUATED_SITE_SQL, (
+            fingerprint, _format(newest), level, _format(now), next_check, site["id"],
+        ))
+    return "evaluated"
+
+
+def claim_due_sites(limit=100, now=None):
+    """Due sites, leased for LEASE_MINUTES so concurrent schedulers don't pick them up too"""
+    now = now or utcnow()
+    lease = _format(now + datetime.timedelta(minutes=LEASE_MINUTES))
+    with db.transaction() as conn:
+        rows = conn.execute(SELECT_DUE_SQL, (_format(now), limit)).fetchall()
+        conn.executemany(LEASE_SITE_SQL, [(lease, row["id"]) for row in rows])
+    return [dict(row) for row in rows]
+
+
+def run_due(source=None, limit=100, workers=WORKERS, now=None):
+    """Evaluate every due site; returns counts per outcome"""
+    sites = claim_due_sites(limit, now)
+    counts = {"evaluated": 0, "unchanged": 0, "no_scenes": 0, "failed": 0}
+    if not sites:
+        return counts
+
+    def check(site):
+        try:
+            return evaluate_site(site, source, now)
+        except Exception as e:
+            logger.warning(f"[WATCH] Check of site {site['id']} failed: {e}")
+            retry = (now or utcnow()) + datetime.timedelta(minutes=RETRY_MINUTES)
+            with db.transaction() as conn:
+                conn.execute(LEASE_SITE_SQL, (_format(retry), site["id"]))
+            return "failed"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sites)))) as executor:
+        for outcome in executor.map(check, sites):
+            counts[outcome] += 1
+    logger.info(f"[WATCH] Checked {len(sites)} sites: {counts}")
+    return counts
+
+
+def run_forever(poll_seconds=POLL_SECONDS, source=None):
+    logger.info(f"[WATCH] Scheduler started (poll every {poll_seconds:.0f}s)")
+    while True:
+        try:
+            counts = run_due(source)
+        except Exception:
+            logger.exception("[WATCH] Scheduler pass failed")
+            counts = {}
+        if sum(counts.values()) == 0:
+            time.sleep(poll_seconds)
+
+
+def _parse_polygon(text):
+    try:
+        return [[float(v) for v in vertex.split(",")] for vertex in text.split(";") if vertex.strip()]
+    except ValueError:
+        raise WatchlistError("--polygon must be 'lon,lat;lon,lat;...'")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Mangrove Watch site watchlist")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="add a point or polygon site")
+    add.add_argument("--name", required=True)
+    add.add_argument("--lat", type=float)
+    add.add_argument("--lon", type=float)
+    add.add_argument("--radius", type=float, help=f"point buffer in metres (default {DEFAULT_RADIUS_M:.0f})")
+    add.add_argument("--polygon", help="'lon,lat;lon,lat;...' instead of --lat/--lon")
+    add.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_HOURS, help="hours between checks")
+    sub.add_parser("list", help="list sites")
+    remove = sub.add_parser("remove", help="delete a site and its history")
+    remove.add_argument("site_id", type=int)
+    history = sub.add_parser("history", help="evaluations of a site")
+    history.add_argument("site_id", type=int)
+    history.add_argument("--limit", type=int, default=20)
+    alerts = sub.add_parser("alerts", help="alert-level transitions")
+    alerts.add_argument("--open", action="store_true", help="unacknowledged only")
+    run = sub.add_parser("run", help="run the scheduler")
+    run.add_argument("--once", action="store_true", help="evaluate due sites once and exit")
+    run.add_argument("--poll", type=float, default=POLL_SECONDS, help="seconds between passes")
+    args = parser.parse_args()
+
+    db.init_db()
+    try:
+        if args.command == "add":
+            polygon = _parse_polygon(args.polygon) if args.polygon else None
+            site_id = add_site(args.name, args.lat, args.lon, args.radius, polygon, args.interval)
+            print(f"[INFO] Added site {site_id}")
+        elif args.command == "list":
+            for site in list_sites():
+                shape = f"polygon ({len(site['polygon'])} vertices)" if site["polygon"] else f"r={site['radius_m']:.0f} m"
+                print(f"{site['id']:>4}  {site['name']:<28} {site['latitude']:.5f},{site['longitude']:.5f}  {shape:<22} "
+                      f"{site['alert_level'] or '-':<9} latest scene {site['latest_scene_at'] or '-'}")
+        elif args.command == "remove":
+            print("[INFO] Removed" if remove_site(args.site_id) else "[WARN] No such site")
+        elif args.command == "history":
+            for row in get_history(args.site_id, args.limit):
+                print(f"{row['created_at']}  scene {row['latest_scene_at']}  {row['scene_count']:>3} scenes  "
+                      f"change {row['vegetation_change']}%  {row['alert_level']}")
+        elif args.command == "alerts":
+            for row in get_alerts(args.open):
+                print(f"{row['created_at']}  #{row['site_id']} {row['site_name']}: "
+                      f"{row['previous_level']} -> {row['alert_level']} ({row['vegetation_change']}%)"
+                      f"{'' if row['acknowledged'] else '  [open]'}")
+        elif args.command == "run":
+            if args.once:
+                print(run_due())
+            else:
+                run_forever(args.poll)
+    except WatchlistError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass